@@ -2,18 +2,32 @@ import os
 import json
 import re
 import random
-import requests
 import html
+import hmac
+import logging
+import time
+import socket
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, redirect, url_for, flash
+from flask import Flask, render_template, request, redirect, url_for, flash, Response, stream_with_context, g
 from markupsafe import Markup
 from dotenv import load_dotenv
 from anthropic import Anthropic
 from dateutil.parser import parse
 from flask_sqlalchemy import SQLAlchemy
+from utils.sentiment import SentimentEngine
+from utils.cache import SQLiteCache, acquire_lease
+from utils.http_client import HttpClient
+from utils.newsapi import NewsAPIPaginator
+from utils.upstream_cache import UpstreamCache
+from utils.topics import extract_topics
+from utils.logs import configure_logging
+from utils.metrics import (REGISTRY, CONTENT_TYPE, STAGE_SECONDS, REQUEST_SECONDS, LLM_ERRORS,
+                           record_llm_usage, cache_collector, http_client_collector)
 
 load_dotenv()
+configure_logging()
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "your_secret_key_here")
@@ -41,24 +55,83 @@ class WaitingList(db.Model):
 with app.app_context():
     db.create_all()
 
+# API keys and configuration
+NEWS_API_KEY = os.environ.get("NEWS_API_KEY")
+ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY")
+
+# Debug logging for API keys
+app.logger.info("NEWS_API_KEY is %s", 'set' if NEWS_API_KEY else 'NOT SET')
+app.logger.info("ANTHROPIC_API_KEY is %s", 'set' if ANTHROPIC_API_KEY else 'NOT SET')
+
+anthropic = Anthropic(api_key=ANTHROPIC_API_KEY)
+
+# Pooled, timeout-aware client for every outbound upstream call
+http_client = HttpClient(
+    timeout=(float(os.environ.get("HTTP_CONNECT_TIMEOUT", 3.05)), float(os.environ.get("HTTP_READ_TIMEOUT", 12))),
+    retries=int(os.environ.get("HTTP_RETRIES", 2)),
+    per_host_limit=int(os.environ.get("HTTP_PER_HOST_LIMIT", 8))
+)
+
+# Multi-page NewsAPI fetching up to a per-query article budget
+news_api_paginator = NewsAPIPaginator(
+    http_client,
+    max_articles=int(os.environ.get("NEWS_API_ARTICLE_BUDGET", 200)),
+    max_workers=int(os.environ.get("NEWS_API_PAGE_WORKERS", 4))
+)
+
+# Persistent cache shared by every worker; sentiment scores are keyed by article content
+CACHE_DB_PATH = os.environ.get("CACHE_DB_PATH", os.path.join(app.instance_path, "cache.db"))
+sentiment_cache = SQLiteCache(
+    CACHE_DB_PATH,
+    namespace="sentiment",
+    ttl=int(os.environ.get("SENTIMENT_CACHE_TTL", 30 * 24 * 3600)),
+    max_entries=int(os.environ.get("SENTIMENT_CACHE_MAX_ENTRIES", 50000))
+)
+sentiment_engine = SentimentEngine(anthropic, cache=sentiment_cache)
+
+# Claude narrative analyses for single and comparative searches
+analysis_cache = SQLiteCache(
+    CACHE_DB_PATH,
+    namespace="narrative",
+    ttl=int(os.environ.get("ANALYSIS_CACHE_TTL", 3600)),
+    max_entries=int(os.environ.get("ANALYSIS_CACHE_MAX_ENTRIES", 2000))
+)
+
+# NewsAPI responses keyed by normalized query and window, served stale-while-revalidate
+upstream_cache = UpstreamCache(
+    SQLiteCache(CACHE_DB_PATH, namespace="upstream", max_entries=int(os.environ.get("UPSTREAM_CACHE_MAX_ENTRIES", 2000))),
+    live_ttl=int(os.environ.get("UPSTREAM_CACHE_LIVE_TTL", 600)),
+    historical_ttl=int(os.environ.get("UPSTREAM_CACHE_HISTORICAL_TTL", 86400))
+)
+
+# Shared pool for running the query1/query2 pipelines side by side
+pipeline_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("PIPELINE_MAX_WORKERS", 8)))
+
+# Stage timers, token counters and upstream stats are scraped from /metrics
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+REGISTRY.register_collector(cache_collector([sentiment_cache, analysis_cache, upstream_cache.cache]))
+REGISTRY.register_collector(http_client_collector(http_client))
+
+# Send searches to the progressively rendered results page; set to 0 for the single-response page
+RESULTS_STREAMING = os.environ.get("RESULTS_STREAMING", "1") != "0"
+
 # Initialize cache cleanup
+CACHE_SWEEP_INTERVAL = int(os.environ.get("CACHE_SWEEP_INTERVAL", 600))
+
 def cleanup_cache():
-    """Remove old cache entries (older than 1 hour)"""
-    # Check if the cache exists in app.config using dictionary access
-    if 'analysis_cache' in app.config:
-        current_time = datetime.now()
-        # Log the cache cleanup operation
-        print(f"Cleaning up cache at {current_time}. Before cleanup: {len(app.config.get('cache_times', {}))} entries")
-        
-        # Update cache_times dictionary, removing entries older than 1 hour
-        app.config['cache_times'] = {k: v for k, v in app.config.get('cache_times', {}).items()
-                                   if (current_time - v).total_seconds() < 3600}
-        
-        # Update analysis_cache to only include entries that still exist in cache_times
-        app.config['analysis_cache'] = {k: v for k, v in app.config['analysis_cache'].items()
-                                      if k in app.config['cache_times']}
-        
-        print(f"After cleanup: {len(app.config['cache_times'])} entries remaining")
+    """Remove expired and over-capacity entries from the shared caches.
+
+    Every gunicorn worker schedules this job, but only the worker holding the
+    sweeper lease does the work.
+    """
+    sweeper_id = f"{socket.gethostname()}:{os.getpid()}"
+    if not acquire_lease(CACHE_DB_PATH, "cache_sweeper", sweeper_id, CACHE_SWEEP_INTERVAL * 2):
+        return
+    for cache in (sentiment_cache, analysis_cache, upstream_cache.cache):
+        removed = cache.sweep()
+        stats = cache.stats()
+        app.logger.info("Cache sweep (%s): removed %d, %d entries remaining, hit rate %.0f%%, %d evictions total",
+                        cache.namespace, removed, stats['entries'], stats['hit_rate'] * 100, stats['evictions'])
 
 # Initialize APScheduler
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -66,95 +139,36 @@ import atexit
 
 # Create scheduler with proper shutdown
 scheduler = BackgroundScheduler()
-scheduler.add_job(func=cleanup_cache, trigger="interval", hours=1)
+scheduler.add_job(func=cleanup_cache, trigger="interval", seconds=CACHE_SWEEP_INTERVAL)
 scheduler.start()
 
 # Register the scheduler shutdown function to be called when the application exits
 @atexit.register
 def shutdown_scheduler():
-    print("Shutting down scheduler...")
+    app.logger.info("Shutting down scheduler...")
     scheduler.shutdown()
-    print("Scheduler shut down successfully")
-
-# API keys and configuration
-NEWS_API_KEY = os.environ.get("NEWS_API_KEY")
-ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY")
-
-# Debug logging for API keys
-print(f"NEWS_API_KEY is {'set' if NEWS_API_KEY else 'NOT SET'}")
-print(f"ANTHROPIC_API_KEY is {'set' if ANTHROPIC_API_KEY else 'NOT SET'}")
-
-anthropic = Anthropic(api_key=ANTHROPIC_API_KEY)
+    app.logger.info("Scheduler shut down successfully")
 
 def analyze_articles(articles, query):
     """Extract key metrics and patterns from articles."""
-    # Batch sentiment analysis for all articles
-    texts = [f"{article['title']} {article['description'] or ''}" for article in articles]
-    
-    # Create a numbered list for Claude to reference
-    numbered_texts = "\n\n".join(f"Text {i+1}:\n{text}" for i, text in enumerate(texts))
-    
-    response = anthropic.messages.create(
-        model="claude-3-haiku-20240307",
-        max_tokens=1000,
-        messages=[{
-            "role": "user",
-            "content": f"""Analyze the sentiment of each numbered text and respond with a JSON array of sentiment scores between -1 (most negative) and 1 (most positive).
-
-For each text:
-- Consider the overall tone, word choice, and context
-- Score negative news/criticism closer to -1
-- Score positive news/achievements closer to +1
-- Score neutral/factual content closer to 0
-
-IMPORTANT: Your response must begin with a valid JSON array containing only numbers, like this:
-[-0.8, 0.5, 0.2, -0.4, 0.1]
-
-Do not include any explanations before the array. You can add explanations after the array if needed.
-
-Here are the texts to analyze:
-
-{numbered_texts}"""
-        }]
-    )
-    
+    # Chunked, parallel sentiment scoring so every article gets a real score
     try:
-        # Extract the array from Claude's response by finding text between [ and ]
-        sentiment_text = response.content[0].text
-        print("Anthropic API Response:", sentiment_text)  # Log the response for debugging
-        array_match = re.search(r'\[(.*?)\]', sentiment_text, re.DOTALL)
-        if array_match:
-            # Parse the comma-separated values into floats
-            # Extract numbers using regex with a more robust pattern to handle various number formats
-            sentiment_values = re.findall(r'-?\d+(?:\.\d+)?', array_match.group(1))
-            sentiments = []
-            for value in sentiment_values:
-                try:
-                    parsed_value = float(value)
-                    print(f"Successfully parsed value: {parsed_value}")  # Debug log
-                    sentiments.append(parsed_value)
-                except ValueError as e:
-                    print(f"Failed to parse value: '{value}'")  # Debug log
-            print(f"Found {len(sentiments)} sentiments for {len(articles)} articles")
-            # Use available sentiments, pad with 0 if needed
-            for i, article in enumerate(articles):
-                if i < len(sentiments):
-                    sentiment = max(-1, min(1, sentiments[i]))
-                    article['sentiment'] = sentiment
-                    print(f"Assigned sentiment {sentiment} to article: {article['title'][:50]}...")
-                else:
-                    article['sentiment'] = 0
-                    print(f"Using neutral sentiment for article: {article['title'][:50]}...")
-        else:
-            # If no array found, use neutral sentiment
-            for article in articles:
-                article['sentiment'] = 0
-    except (ValueError, TypeError, IndexError, AttributeError) as e:
-        print("Error parsing sentiment response:", e)  # Log parsing errors
-        # Default to neutral if parsing fails
+        with STAGE_SECONDS.timer(stage="sentiment"):
+            sentiment_engine.score_articles(articles)
+    except Exception as e:
+        app.logger.warning("Error scoring article sentiment: %s", e)
+        # Default to neutral if scoring fails
         for article in articles:
             article['sentiment'] = 0
+    return summarize_coverage(articles, query)
+
+@STAGE_SECONDS.timer(stage="parse")
+def summarize_coverage(articles, query):
+    """Timeline, sources, topics and sentiment totals for a list of articles.
     
+    Articles not yet scored count as neutral, so the streaming results page
+    can show volume, sources and topics before sentiment is back.
+    """
     # Publication timeline with articles
     dates = {}
     articles_by_date = {}
@@ -169,7 +183,7 @@ Here are the texts to analyze:
             'title': article['title'],
             'source': article['source']['name'],
             'url': article['url'],
-            'sentiment': article['sentiment']
+            'sentiment': article.get('sentiment', 0)
         })
     
     # Create timeline with articles
@@ -192,7 +206,7 @@ Here are the texts to analyze:
             source_name = html.unescape(article['source']['name']) if article['source']['name'] else ""
             sources[source_name] += 1
         except Exception as e:
-            print(f"Error decoding source name: {e}")
+            app.logger.warning("Error decoding source name: %s", e)
             source_name = article['source']['name'] if article['source']['name'] else ""
             sources[source_name] += 1
     
@@ -202,102 +216,17 @@ Here are the texts to analyze:
             decoded_name = html.unescape(name) if name else ""
             top_sources.append({'name': decoded_name, 'count': count})
         except Exception as e:
-            print(f"Error decoding source name in most_common: {e}")
+            app.logger.warning("Error decoding source name in most_common: %s", e)
             top_sources.append({'name': name, 'count': count})
     
-    # Extended stop words list
-    stop_words = {
-        'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 
-        'for', 'of', 'with', 'by', 'from', 'up', 'about', 'into', 'over',
-        'after', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
-        'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would',
-        'should', 'can', 'could', 'may', 'might', 'must', 'it', 'its',
-        'during', 'while', 'before', 'after', 'under', 'over',
-        # Additional common words that should be filtered out
-        'this', 'that', 'these', 'those', 'they', 'them', 'their', 'theirs',
-        'he', 'him', 'his', 'she', 'her', 'hers', 'we', 'us', 'our', 'ours',
-        'you', 'your', 'yours', 'i', 'me', 'my', 'mine', 'who', 'whom', 'whose',
-        'which', 'what', 'where', 'when', 'why', 'how', 'all', 'any', 'both',
-        'each', 'few', 'more', 'most', 'some', 'such', 'no', 'nor', 'not',
-        'only', 'own', 'same', 'so', 'than', 'too', 'very', 'just', 'one',
-        'even', 'here', 'there', 'now', 'then', 'also', 'get', 'got', 'gets',
-        'say', 'says', 'said', 'see', 'sees', 'seen', 'like', 'well', 'back',
-        'much', 'many', 'make', 'makes', 'made', 'take', 'takes', 'took', 'taken',
-        # Additional prepositions, adverbs, and common verbs
-        'off', 'out', 'down', 'away', 'through', 'across', 'between', 'among',
-        'around', 'along', 'behind', 'beyond', 'near', 'within', 'without',
-        'above', 'below', 'beside', 'against', 'despite', 'except', 'until',
-        'upon', 'via', 'toward', 'towards', 'onto', 'inside', 'outside',
-        'ago', 'yet', 'still', 'ever', 'never', 'always', 'often', 'sometimes',
-        'rarely', 'usually', 'already', 'soon', 'later', 'early', 'late',
-        'again', 'once', 'twice', 'thrice', 'further', 'rather', 'quite',
-        'almost', 'nearly', 'hardly', 'scarcely', 'barely', 'merely',
-        'else', 'otherwise', 'instead', 'anyway', 'anyhow', 'however',
-        'thus', 'therefore', 'hence', 'consequently', 'accordingly',
-        'meanwhile', 'moreover', 'furthermore', 'additionally', 'besides',
-        'come', 'comes', 'coming', 'came', 'go', 'goes', 'going', 'went', 'gone',
-        'give', 'gives', 'giving', 'gave', 'given', 'put', 'puts', 'putting',
-        'set', 'sets', 'setting', 'let', 'lets', 'letting', 'run', 'runs', 'running',
-        'ran', 'use', 'uses', 'using', 'used', 'try', 'tries', 'trying', 'tried',
-        'seem', 'seems', 'seeming', 'seemed', 'appear', 'appears', 'appearing',
-        'appeared', 'look', 'looks', 'looking', 'looked', 'think', 'thinks',
-        'thinking', 'thought', 'know', 'knows', 'knowing', 'knew', 'known',
-        'want', 'wants', 'wanting', 'wanted', 'need', 'needs', 'needing', 'needed',
-        'find', 'finds', 'finding', 'found', 'show', 'shows', 'showing', 'showed',
-        'shown', 'tell', 'tells', 'telling', 'told', 'ask', 'asks', 'asking', 'asked',
-        'work', 'works', 'working', 'worked', 'call', 'calls', 'calling', 'called',
-        'turn', 'turns', 'turning', 'turned', 'help', 'helps', 'helping', 'helped',
-        'talk', 'talks', 'talking', 'talked', 'move', 'moves', 'moving', 'moved',
-        'live', 'lives', 'living', 'lived', 'play', 'plays', 'playing', 'played',
-        'feel', 'feels', 'feeling', 'felt', 'become', 'becomes', 'becoming', 'became',
-        'leave', 'leaves', 'leaving', 'left', 'stay', 'stays', 'staying', 'stayed',
-        'start', 'starts', 'starting', 'started', 'end', 'ends', 'ending', 'ended',
-        'keep', 'keeps', 'keeping', 'kept', 'hold', 'holds', 'holding', 'held',
-        'bring', 'brings', 'bringing', 'brought', 'carry', 'carries', 'carrying',
-        'carried', 'continue', 'continues', 'continuing', 'continued',
-        'change', 'changes', 'changing', 'changed', 'lead', 'leads', 'leading', 'led',
-        'stand', 'stands', 'standing', 'stood', 'follow', 'follows', 'following',
-        'followed', 'stop', 'stops', 'stopping', 'stopped', 'create', 'creates',
-        'creating', 'created', 'speak', 'speaks', 'speaking', 'spoke', 'spoken',
-        'read', 'reads', 'reading', 'wrote', 'written', 'write', 'writes', 'writing',
-        'lose', 'loses', 'losing', 'lost', 'pay', 'pays', 'paying', 'paid',
-        'hear', 'hears', 'hearing', 'heard', 'meet', 'meets', 'meeting', 'met',
-        'include', 'includes', 'including', 'included', 'allow', 'allows', 'allowing',
-        'allowed', 'add', 'adds', 'adding', 'added', 'spend', 'spends', 'spending',
-        'spent', 'grow', 'grows', 'growing', 'grew', 'grown', 'open', 'opens',
-        'opening', 'opened', 'walk', 'walks', 'walking', 'walked', 'win', 'wins',
-        'winning', 'won', 'offer', 'offers', 'offering', 'offered', 'remember',
-        'remembers', 'remembering', 'remembered', 'consider', 'considers',
-        'considering', 'considered', 'expect', 'expects', 'expecting', 'expected',
-        'suggest', 'suggests', 'suggesting', 'suggested', 'report', 'reports',
-        'reporting', 'reported'
-    }
-    
-    # Add search terms to stop words
-    search_terms = set(query.lower().split())
-    stop_words.update(search_terms)
-    
-    # Topic extraction with better filtering
-    text = ' '.join(article['title'] + ' ' + (article['description'] or '')
-                   for article in articles).lower()
-    words = re.findall(r'\b\w+\b', text)
-    topics = Counter(word for word in words 
-                    if word not in stop_words 
-                    and len(word) > 2 
-                    and not word.isnumeric()
-                    and not any(char.isdigit() for char in word))
-    
-    top_topics = [{'topic': topic, 'count': count} 
-                  for topic, count in topics.most_common(30)
-                  if count > 2]  # Only include topics mentioned more than twice
+    # Topic extraction with a precompiled tokenizer and frozen stop-word vocabulary
+    top_topics = extract_topics(articles, query)
 
     # Calculate average sentiment
-    sentiments = [article['sentiment'] for article in articles]
-    print(f"All sentiment values: {sentiments}")
+    sentiments = [article.get('sentiment', 0) for article in articles]
     total_sentiment = sum(sentiments)
-    print(f"Total sentiment: {total_sentiment}")
     avg_sentiment = total_sentiment / len(articles) if articles else 0
-    print(f"Average sentiment: {avg_sentiment}")
+    app.logger.debug("Sentiment for %r: %d articles, total %s, average %s", query, len(sentiments), total_sentiment, avg_sentiment)
 
     return {
         'timeline': timeline,
@@ -314,21 +243,21 @@ Here are the texts to analyze:
 def validate_date_range(from_date, to_date):
     """Validate the date range."""
     try:
-        print(f"Validating date range: from_date={from_date}, to_date={to_date}")
+        app.logger.debug("Validating date range: from_date=%s, to_date=%s", from_date, to_date)
         start_date = datetime.strptime(from_date, "%Y-%m-%d")
         end_date = datetime.strptime(to_date, "%Y-%m-%d")
         
-        print(f"Parsed dates: start_date={start_date}, end_date={end_date}")
+        app.logger.debug("Parsed dates: start_date=%s, end_date=%s", start_date, end_date)
         
         if start_date > end_date:
             raise ValueError("Start date must be before end date")
             
         return True, start_date, end_date
     except ValueError as e:
-        print(f"Date validation error: {str(e)}")
+        app.logger.info("Date validation error: %s", e)
         raise ValueError(str(e))
     except Exception as e:
-        print(f"Unexpected date validation error: {str(e)}")
+        app.logger.warning("Unexpected date validation error: %s", e)
         raise ValueError("Invalid date format")
 
 # List of major news sources and their variations
@@ -404,9 +333,11 @@ def enhance_query_with_ai(query):
             }]
         )
         
+        record_llm_usage("query_enhancement", getattr(response, "usage", None))
+        
         # Extract JSON from Claude's response
         response_text = response.content[0].text
-        print(f"Claude query enhancement response: {response_text}")
+        app.logger.debug("Claude query enhancement response: %s", response_text)
         
         # Find JSON in the response
         import json
@@ -416,7 +347,7 @@ def enhance_query_with_ai(query):
         if json_match:
             try:
                 enhancement_data = json.loads(json_match.group(0))
-                print(f"Enhanced query: {enhancement_data.get('enhanced_query', query)}")
+                app.logger.debug("Enhanced query: %s", enhancement_data.get('enhanced_query', query))
                 
                 # Ensure all required fields are present
                 if 'enhanced_query' not in enhancement_data:
@@ -428,11 +359,12 @@ def enhance_query_with_ai(query):
                     
                 return enhancement_data
             except json.JSONDecodeError:
-                print("Failed to parse JSON from Claude's response")
+                app.logger.warning("Failed to parse JSON from Claude's response")
         
         return default_enhancement  # Return default if parsing fails
     except Exception as e:
-        print(f"Error enhancing query with AI: {e}")
+        LLM_ERRORS.inc(purpose="query_enhancement")
+        app.logger.warning("Error enhancing query with AI: %s", e)
         return default_enhancement  # Return default if any error occurs
 
 def parse_boolean_query(query):
@@ -511,13 +443,13 @@ def parse_boolean_query(query):
     if not (re.search(r'\bAND\b|\bOR\b', processed_query, re.IGNORECASE) and '"' in processed_query):
         processed_query = process_operators(processed_query)
     
-    print(f"Boolean search query: Original='{query}' → Processed='{processed_query}'")
+    app.logger.debug("Boolean search query: Original='%s' → Processed='%s'", query, processed_query)
     return processed_query
 
 
 def generate_mock_news(keywords, from_date, to_date, language="en", source=None):
     """Generate mock news articles when the API fails."""
-    print(f"Generating mock news for query: {keywords}")
+    app.logger.info("Generating mock news for query: %s", keywords)
     
     # Parse dates
     start_date = datetime.strptime(from_date, "%Y-%m-%d")
@@ -605,80 +537,84 @@ def generate_mock_news(keywords, from_date, to_date, language="en", source=None)
         
         mock_articles.append(article)
     
-    print(f"Generated {len(mock_articles)} mock articles")
+    app.logger.debug("Generated %d mock articles", len(mock_articles))
     return mock_articles
 
 def fetch_news_api(keywords, from_date=None, to_date=None, language="en", source=None):
+    """Fetch news articles from News API, served from the upstream response cache when possible."""
+    cache_key = upstream_cache.make_key(
+        "newsapi",
+        query=parse_boolean_query(keywords),
+        language=language,
+        sources=source or "",
+        from_date=from_date or "",
+        to_date=to_date or "",
+        budget=news_api_paginator.max_articles
+    )
+    
+    def load():
+        articles, api_success = fetch_news_api_uncached(keywords, from_date, to_date, language, source)
+        return {"articles": articles, "ok": api_success}
+    
+    # Only successful, non-empty responses are cached
+    result = upstream_cache.fetch(cache_key, load, to_date_str=to_date,
+                                  cacheable=lambda r: bool(r["ok"] and r["articles"]))
+    return result["articles"], result["ok"]
+
+def fetch_news_api_uncached(keywords, from_date=None, to_date=None, language="en", source=None):
     """Fetch news articles from News API based on search parameters."""
     articles = []
     
     # Parse the boolean query
     processed_query = parse_boolean_query(keywords)
-    print(f"News API - Original query: '{keywords}' → Processed query: '{processed_query}'")
+    app.logger.debug("News API - Original query: '%s' → Processed query: '%s'", keywords, processed_query)
     
-    # Use the everything endpoint
-    url = "https://newsapi.org/v2/everything"
+    # Use the everything endpoint; the paginator adds page and pageSize
     params = {
         "q": processed_query,
         "language": language,
         "sortBy": "relevancy",
-        "apiKey": NEWS_API_KEY,
-        "pageSize": 100  # Maximum allowed by the API
+        "apiKey": NEWS_API_KEY
     }
     
     # Add date parameters if provided
     if from_date:
-        print(f"News API - Adding from_date parameter: {from_date}")
+        app.logger.debug("News API - Adding from_date parameter: %s", from_date)
         params["from"] = from_date
     if to_date:
         # Add one day to include the end date in results
         try:
-            print(f"News API - Processing to_date parameter: {to_date}")
             end_date = datetime.strptime(to_date, "%Y-%m-%d") + timedelta(days=1)
             params["to"] = end_date.strftime("%Y-%m-%d")
-            print(f"News API - Added to_date parameter: {params['to']}")
+            app.logger.debug("News API - Added to_date parameter: %s", params['to'])
         except Exception as e:
-            print(f"News API - Error processing to_date: {str(e)}")
             # Use the original to_date if there's an error
             params["to"] = to_date
-            print(f"News API - Using original to_date: {to_date}")
+            app.logger.warning("News API - Error processing to_date %s, using it as is: %s", to_date, e)
     
     # Add source parameter if provided
     if source:
         params["sources"] = source
     
-    api_success = False
     try:
-        print(f"Fetching news from News API with params: {params}")  # Debug log
-        response = requests.get(url, params=params)
-        print(f"News API response status: {response.status_code}")  # Debug log
+        news_api_articles, info = news_api_paginator.fetch(params, window_start=from_date)
+        app.logger.info("News API '%s': %d total results; retrieved %d articles from %d pages using %d upstream calls "
+                        "(stopped: %s)", processed_query, info['total_results'], len(news_api_articles),
+                        info['pages'], info['upstream_calls'], info['stopped'])
         
-        if response.status_code == 200:
-            response_data = response.json()
-            print(f"News API response status: {response_data.get('status')}")
-            print(f"News API total results: {response_data.get('totalResults')}")
-            
-            # Add API source to each article
-            news_api_articles = response_data.get("articles", [])
-            for article in news_api_articles:
-                article["api_source"] = "News API"
-            
-            articles.extend(news_api_articles)
-            print(f"Retrieved {len(articles)} articles from News API")
-            api_success = True
-        else:
-            response_text = response.text
-            print(f"News API Error response: {response_text}")
-            try:
-                response_data = response.json()
-                print(f"Error from News API: {response_data.get('message', 'Unknown error')}")
-            except:
-                print(f"Could not parse News API error response as JSON: {response_text}")
+        # Add API source to each article
+        for article in news_api_articles:
+            article["api_source"] = "News API"
+        
+        articles.extend(news_api_articles)
+        api_success = info["ok"]
     except Exception as e:
-        print(f"Error fetching articles from News API: {e}")
+        app.logger.warning("Error fetching articles from News API: %s", e)
+        api_success = False
     
     return articles, api_success
 
+@STAGE_SECONDS.timer(stage="fetch")
 def fetch_news(keywords, from_date=None, to_date=None, language="en", source=None):
     """Fetch news articles from News API based on search parameters."""
     all_articles = []
@@ -690,7 +626,7 @@ def fetch_news(keywords, from_date=None, to_date=None, language="en", source=Non
     if news_api_success:
         all_articles.extend(news_api_articles)
     else:
-        print("News API request failed")
+        app.logger.warning("News API request failed for '%s'", keywords)
         return []  # Return empty list if API request failed
     
     # Remove duplicates based on URL
@@ -701,7 +637,7 @@ def fetch_news(keywords, from_date=None, to_date=None, language="en", source=Non
             seen_urls.add(article['url'])
             unique_articles.append(article)
     
-    print(f"Returning {len(unique_articles)} unique articles from News API")
+    app.logger.debug("Returning %d unique articles from News API", len(unique_articles))
     return unique_articles
 
 # Path for contact form submissions log file
@@ -742,8 +678,9 @@ def premium_waitlist():
         )
         
         # Save to database
-        db.session.add(entry)
-        db.session.commit()
+        with STAGE_SECONDS.timer(stage="db_write"):
+            db.session.add(entry)
+            db.session.commit()
         
         # Format form data for notifications
         form_data_text = f"""
@@ -767,7 +704,7 @@ def premium_waitlist():
         """
         
         # Log the submission to the console
-        print(form_data_text)
+        app.logger.info(form_data_text)
         
         # Write submission to log file for easy access
         try:
@@ -776,9 +713,9 @@ def premium_waitlist():
                 log_file.write(form_data_text)
                 log_file.write(f"\nSMS sent to: +1374211614\n")
                 log_file.write(f"{'='*50}\n")
-            print(f"Contact form submission logged to {CONTACT_LOG_FILE}")
+            app.logger.info("Contact form submission logged to %s", CONTACT_LOG_FILE)
         except Exception as e:
-            print(f"Error writing to log file: {e}")
+            app.logger.warning("Error writing to log file: %s", e)
         
         # Show success message
         flash("Thank you! We'll contact you soon.")
@@ -793,292 +730,124 @@ def media_analysis():
 @app.route("/", methods=["GET", "POST"])
 def index():
     if request.method == "POST":
-        # Get and log form data
-        form_data = request.form.to_dict()
-        print("Received form data:", form_data)
-        
-        # Extract basic search parameters
-        query1 = form_data.get("query1", "").strip()
-        query2 = form_data.get("query2", "").strip()
-        from_date1 = form_data.get("from_date1", "").strip()
-        to_date1 = form_data.get("to_date1", "").strip()
-        from_date2 = form_data.get("from_date2", "").strip()
-        to_date2 = form_data.get("to_date2", "").strip()
-        
-        # Extract advanced filter parameters for first query
-        language1 = form_data.get("language1", "en")
-        source1 = form_data.get("source1", "").strip()
-        
-        # Extract advanced filter parameters for second query
-        language2 = form_data.get("language2", "en")
-        source2 = form_data.get("source2", "").strip()
-        
-        print(f"Parsed form values: query1={query1}, from_date1={from_date1}, to_date1={to_date1}")
-        print(f"Advanced filters 1: language={language1}, source={source1}")
-        if query2:
-            print(f"Advanced filters 2: language={language2}, source={source2}")
-        
-        # Validate inputs
-        errors = []
-        if not query1:
-            errors.append("Please enter at least one search term")
-        if not from_date1 or not to_date1:
-            errors.append("Please select a date range for the first query")
-        if query2 and (not from_date2 or not to_date2):
-            errors.append("Please select a date range for the second query")
-            
-        if errors:
-            for error in errors:
-                flash(error)
-            return redirect(url_for("index"))
+        app.logger.debug("Received form data: %s", request.form.to_dict())
+        search_params = results_search_params(request.form)
+        query2 = search_params["query2"]
         
         try:
-            # Validate date ranges
-            valid, start_date1, end_date1 = validate_date_range(from_date1, to_date1)
-            
-            # Check if date range is more than 30 days (free tier limit)
-            delta1 = end_date1 - start_date1
-            if delta1.days > 30:
-                flash("Free tier is limited to 30 days of historical data. Please join our premium waiting list for extended access.")
-                return redirect(url_for("premium_waitlist"))
-            
-            if query2 and (from_date2 and to_date2):
-                valid, start_date2, end_date2 = validate_date_range(from_date2, to_date2)
-                
-                # Check if date range is more than 30 days (free tier limit)
-                delta2 = end_date2 - start_date2
-                if delta2.days > 30:
-                    flash("Free tier is limited to 30 days of historical data. Please join our premium waiting list for extended access.")
-                    return redirect(url_for("premium_waitlist"))
-            
-            # Process boolean queries
-            processed_query1 = {"enhanced_query": parse_boolean_query(query1), "entity_type": "", "reasoning": "Boolean search query"}
-            processed_query2 = {"enhanced_query": parse_boolean_query(query2), "entity_type": "", "reasoning": "Boolean search query"} if query2 else None
-            
-            # Fetch and analyze articles for the first query
-            articles1 = fetch_news(
-                keywords=query1,
-                from_date=from_date1,
-                to_date=to_date1,
-                language=language1,
-                source=source1
-            )
-            analysis1 = analyze_articles(articles1, query1)
-            
-            # Initialize variables for second query
-            articles2 = []
-            analysis2 = None
-            analysis_text = None
-            
-            # Fetch and analyze articles for the second query if provided
-            if query2:
-                articles2 = fetch_news(
-                    keywords=query2,
-                    from_date=from_date2 if from_date2 else from_date1,
-                    to_date=to_date2 if to_date2 else to_date1,
-                    language=language2,
-                    source=source2
-                )
-                analysis2 = analyze_articles(articles2, query2)
-            
-            # Create a form-like object with the request parameters
-            form_data = {}
-            for key, value in request.form.items():
-                form_data[key] = value
-            
-            # Redirect to results page with query parameters
-            return redirect(url_for("results", 
-                query1=query1,
-                from_date1=from_date1,
-                to_date1=to_date1,
-                language1=language1,
-                source1=source1,
-                query2=query2 if query2 else None,
-                from_date2=from_date2 if from_date2 else None,
-                to_date2=to_date2 if to_date2 else None,
-                language2=language2 if query2 else None,
-                source2=source2 if query2 else None
-            ))
-            
+            problem = check_search_params(search_params)
         except Exception as e:
             flash(f"Error: {str(e)}")
             return redirect(url_for("index"))
+        if problem:
+            messages, endpoint = problem
+            for message in messages:
+                flash(message)
+            return redirect(url_for(endpoint))
+        
+        # results() does the fetching and analysis: with RESULTS_STREAMING it sends the
+        # page shell and fills it in from /results/stream, otherwise it renders in one response
+        return redirect(url_for("results",
+            stream=1 if RESULTS_STREAMING else None,
+            query1=search_params["query1"],
+            from_date1=search_params["from_date1"],
+            to_date1=search_params["to_date1"],
+            language1=search_params["language1"],
+            source1=search_params["source1"],
+            query2=query2 if query2 else None,
+            from_date2=search_params["from_date2"] if query2 else None,
+            to_date2=search_params["to_date2"] if query2 else None,
+            language2=search_params["language2"] if query2 else None,
+            source2=search_params["source2"] if query2 else None
+        ))
             
     return render_template("index.html")
 
-@app.route("/results", methods=["GET"])
-def results():
-    # Get parameters from URL
-    query1 = request.args.get("query1", "").strip()
-    query2 = request.args.get("query2", "").strip()
-    from_date1 = request.args.get("from_date1", "").strip()
-    to_date1 = request.args.get("to_date1", "").strip()
-    from_date2 = request.args.get("from_date2", "").strip()
-    to_date2 = request.args.get("to_date2", "").strip()
-    language1 = request.args.get("language1", "en")
-    source1 = request.args.get("source1", "").strip()
-    language2 = request.args.get("language2", "en")
-    source2 = request.args.get("source2", "").strip()
+def results_search_params(args):
+    """Search parameters from the search form or the /results and /results/stream query string."""
+    return {
+        "query1": args.get("query1", "").strip(),
+        "query2": args.get("query2", "").strip(),
+        "from_date1": args.get("from_date1", "").strip(),
+        "to_date1": args.get("to_date1", "").strip(),
+        "from_date2": args.get("from_date2", "").strip(),
+        "to_date2": args.get("to_date2", "").strip(),
+        "language1": args.get("language1", "en"),
+        "source1": args.get("source1", "").strip(),
+        "language2": args.get("language2", "en"),
+        "source2": args.get("source2", "").strip()
+    }
+
+def check_search_params(params):
+    """Problems with a results request as (messages to flash, endpoint to redirect to), or None.
     
-    # Validate inputs
+    Raises ValueError for malformed or reversed dates.
+    """
     errors = []
-    if not query1:
+    if not params["query1"]:
         errors.append("Please enter at least one search term")
-    if not from_date1 or not to_date1:
+    if not params["from_date1"] or not params["to_date1"]:
         errors.append("Please select a date range for the first query")
-    if query2 and (not from_date2 or not to_date2):
+    if params["query2"] and (not params["from_date2"] or not params["to_date2"]):
         errors.append("Please select a date range for the second query")
-        
     if errors:
-        for error in errors:
-            flash(error)
-        return redirect(url_for("index"))
+        return errors, "index"
     
-    try:
-        # Validate date ranges
-        valid, start_date1, end_date1 = validate_date_range(from_date1, to_date1)
-        
-        # Check if date range is more than 30 days (free tier limit)
-        delta1 = end_date1 - start_date1
-        if delta1.days > 30:
-            flash("Free tier is limited to 30 days of historical data. Please join our premium waiting list for extended access.")
-            return redirect(url_for("premium_waitlist"))
-        
-        if query2 and (from_date2 and to_date2):
-            valid, start_date2, end_date2 = validate_date_range(from_date2, to_date2)
-            
-            # Check if date range is more than 30 days (free tier limit)
-            delta2 = end_date2 - start_date2
-            if delta2.days > 30:
-                flash("Free tier is limited to 30 days of historical data. Please join our premium waiting list for extended access.")
-                return redirect(url_for("premium_waitlist"))
-        
-        # Process boolean queries
-        processed_query1 = {"enhanced_query": parse_boolean_query(query1), "entity_type": "", "reasoning": "Boolean search query"}
-        processed_query2 = {"enhanced_query": parse_boolean_query(query2), "entity_type": "", "reasoning": "Boolean search query"} if query2 else None
-        
-        # Fetch and analyze articles for the first query
-        articles1 = fetch_news(
-            keywords=query1,
-            from_date=from_date1,
-            to_date=to_date1,
-            language=language1,
-            source=source1
-        )
-        analysis1 = analyze_articles(articles1, query1)
-        
-        # Helper function to summarize articles for Claude
-        def summarize_articles(articles):
-            return [{
-                'title': article['title'],
-                'description': article['description'],
-                'publishedAt': article['publishedAt']
-            } for article in articles]
-        
-        # Helper function to format Claude's response
-        def format_claude_response(text):
-            # Pre-process the text to fix common formatting issues
-            
-            # Fix date ranges that might be split across lines with hyphens
-            # This pattern looks for date-like patterns split across lines
-            formatted_text = re.sub(r'(\d{4})-(\d{2})-(\d{2})\s*\n\s*-\s*\n\s*(\d{4})-(\d{2})-(\d{2})', r'\1-\2-\3 to \4-\5-\6', text)
-            
-            # Fix any remaining hyphenated line breaks that might be part of date ranges
-            formatted_text = re.sub(r'(\d+)\s*\n\s*-\s*\n\s*(\d+)', r'\1-\2', formatted_text)
-            
-            # Process section headers (lines that end with a colon)
-            formatted_text = re.sub(r'^([^:\n]+:)$', r'<p><strong>\1</strong></p>', formatted_text, flags=re.MULTILINE)
-            
-            # Process subheads (lines that have a colon in the middle)
-            formatted_text = re.sub(r'^([^:\n]+:[^:\n]*)$', r'<em>\1</em>', formatted_text, flags=re.MULTILINE)
-            
-            # Process numbered items (e.g., "1. Some text") to ensure they're on separate lines
-            # This regex matches numbered items that might span multiple sentences
-            formatted_text = re.sub(r'(\d+\.\s*[^0-9\n]+?)(?=\s*\d+\.\s*|\s*$)', r'<p>\1</p>', formatted_text)
-            
-            # Also handle bullet points with dashes or asterisks
-            formatted_text = re.sub(r'([-*•]\s*[^-*•\n]+?)(?=\s*[-*•]\s*|\s*$)', r'<p>\1</p>', formatted_text)
-            
-            # Convert the formatted text to Markup to ensure HTML is rendered
-            return Markup(formatted_text)
-        
-        # Initialize variables for second query
-        articles2 = []
-        analysis2 = None
-        analysis_text = None
-        
-        # Prepare summarized articles for the first query
-        summarized_articles1 = summarize_articles(articles1)
-        
-        # Generate analysis for single search term
-        if not query2:
-            # Check cache with all parameters for single search
-            cache_key = f"single_{query1}_{from_date1}_{to_date1}_{language1}_{source1}"
-            cached_response = app.config.get('analysis_cache', {}).get(cache_key)
-            
-            if cached_response:
-                analysis_text = cached_response
-            else:
-                # Prepare the analysis prompt for single search term
-                analysis_prompt = f"""Analyze news coverage for {query1} ({from_date1} to {to_date1}).
+    # Check if date range is more than 30 days (free tier limit)
+    free_tier_message = "Free tier is limited to 30 days of historical data. Please join our premium waiting list for extended access."
+    valid, start_date1, end_date1 = validate_date_range(params["from_date1"], params["to_date1"])
+    if (end_date1 - start_date1).days > 30:
+        return [free_tier_message], "premium_waitlist"
+    if params["query2"] and (params["from_date2"] and params["to_date2"]):
+        valid, start_date2, end_date2 = validate_date_range(params["from_date2"], params["to_date2"])
+        if (end_date2 - start_date2).days > 30:
+            return [free_tier_message], "premium_waitlist"
+    return None
 
-IMPORTANT: Format your response carefully with these guidelines:
-- Keep the date range on a single line (don't split dates with hyphens across lines)
-- Use clear section headers for each main point
-- Format numbered lists consistently
-- Use paragraph breaks between sections
+def summarize_articles(articles):
+    """The article fields Claude needs for the narrative prompt."""
+    return [{
+        'title': article['title'],
+        'description': article['description'],
+        'publishedAt': article['publishedAt']
+    } for article in articles]
 
-Key points to address:
-1. Major Coverage Differences: Identify the main themes, tones, and focus areas in the coverage
-2. Key Trends: Analyze patterns in coverage volume, sentiment evolution, and source diversity
-3. Business Implications: Discuss market perception, competitive positioning, and strategic opportunities
-                
-Articles: {json.dumps(summarized_articles1)}"""
-                
-                # Get analysis from Claude
-                response = anthropic.messages.create(
-                    model="claude-3-haiku-20240307",
-                    max_tokens=1000,
-                    messages=[{
-                        "role": "user",
-                        "content": analysis_prompt
-                    }]
-                )
-                
-                # Format the response
-                analysis_text = format_claude_response(response.content[0].text)
-                
-                # Cache the response with timestamp
-                if not hasattr(app.config, 'analysis_cache'):
-                    app.config['analysis_cache'] = {}
-                    app.config['cache_times'] = {}
-                app.config['analysis_cache'][cache_key] = analysis_text
-                app.config['cache_times'][cache_key] = datetime.now()
-        else:
-            # Fetch and analyze articles for the second query
-            articles2 = fetch_news(
-                keywords=query2,
-                from_date=from_date2 if from_date2 else from_date1,
-                to_date=to_date2 if to_date2 else to_date1,
-                language=language2,
-                source=source2
-            )
-            analysis2 = analyze_articles(articles2, query2)
-            
-            # Prepare summarized articles for the second query
-            summarized_articles2 = summarize_articles(articles2)
-            
-            # Check cache with all parameters for comparative search
-            cache_key = f"comparative_{query1}_{query2}_{from_date1}_{to_date1}_{from_date2}_{to_date2}_{language1}_{source1}_{language2}_{source2}"
-            cached_response = app.config.get('analysis_cache', {}).get(cache_key)
-            
-            if cached_response:
-                analysis_text = cached_response
-            else:
-                # Prepare the analysis prompt for comparative search
-                analysis_prompt = f"""Compare news coverage between {query1} ({from_date1} to {to_date1}) and {query2} ({from_date2 if from_date2 else from_date1} to {to_date2 if to_date2 else to_date1}).
+def format_claude_response(text):
+    """Turn Claude's plain-text narrative into HTML paragraphs and headings."""
+    # Pre-process the text to fix common formatting issues
+    
+    # Fix date ranges that might be split across lines with hyphens
+    # This pattern looks for date-like patterns split across lines
+    formatted_text = re.sub(r'(\d{4})-(\d{2})-(\d{2})\s*\n\s*-\s*\n\s*(\d{4})-(\d{2})-(\d{2})', r'\1-\2-\3 to \4-\5-\6', text)
+    
+    # Fix any remaining hyphenated line breaks that might be part of date ranges
+    formatted_text = re.sub(r'(\d+)\s*\n\s*-\s*\n\s*(\d+)', r'\1-\2', formatted_text)
+    
+    # Process section headers (lines that end with a colon)
+    formatted_text = re.sub(r'^([^:\n]+:)$', r'<p><strong>\1</strong></p>', formatted_text, flags=re.MULTILINE)
+    
+    # Process subheads (lines that have a colon in the middle)
+    formatted_text = re.sub(r'^([^:\n]+:[^:\n]*)$', r'<em>\1</em>', formatted_text, flags=re.MULTILINE)
+    
+    # Process numbered items (e.g., "1. Some text") to ensure they're on separate lines
+    # This regex matches numbered items that might span multiple sentences
+    formatted_text = re.sub(r'(\d+\.\s*[^0-9\n]+?)(?=\s*\d+\.\s*|\s*$)', r'<p>\1</p>', formatted_text)
+    
+    # Also handle bullet points with dashes or asterisks
+    formatted_text = re.sub(r'([-*•]\s*[^-*•\n]+?)(?=\s*[-*•]\s*|\s*$)', r'<p>\1</p>', formatted_text)
+    
+    # Convert the formatted text to Markup to ensure HTML is rendered
+    return Markup(formatted_text)
+
+NARRATIVE_MODEL = "claude-3-haiku-20240307"
+NARRATIVE_MAX_TOKENS = 1000
 
-IMPORTANT: Format your response carefully with these guidelines:
+def narrative_request(params, summarized_articles1, summarized_articles2):
+    """(cache key, prompt) for the Claude coverage narrative of a search."""
+    query1, query2 = params["query1"], params["query2"]
+    from_date1, to_date1 = params["from_date1"], params["to_date1"]
+    from_date2, to_date2 = params["from_date2"], params["to_date2"]
+    guidelines = """IMPORTANT: Format your response carefully with these guidelines:
 - Keep the date range on a single line (don't split dates with hyphens across lines)
 - Use clear section headers for each main point
 - Format numbered lists consistently
@@ -1088,34 +857,147 @@ Key points to address:
 1. Major Coverage Differences: Identify the main themes, tones, and focus areas in the coverage
 2. Key Trends: Analyze patterns in coverage volume, sentiment evolution, and source diversity
 3. Business Implications: Discuss market perception, competitive positioning, and strategic opportunities
-                
+                """
+    
+    # Generate analysis for single search term
+    if not query2:
+        # Cache key with all parameters for single search
+        cache_key = f"single_{query1}_{from_date1}_{to_date1}_{params['language1']}_{params['source1']}"
+        prompt = f"""Analyze news coverage for {query1} ({from_date1} to {to_date1}).
+
+{guidelines}
+Articles: {json.dumps(summarized_articles1)}"""
+        return cache_key, prompt
+    
+    # Cache key with all parameters for comparative search
+    cache_key = (f"comparative_{query1}_{query2}_{from_date1}_{to_date1}_{from_date2}_{to_date2}_"
+                 f"{params['language1']}_{params['source1']}_{params['language2']}_{params['source2']}")
+    prompt = f"""Compare news coverage between {query1} ({from_date1} to {to_date1}) and {query2} ({from_date2 if from_date2 else from_date1} to {to_date2 if to_date2 else to_date1}).
+
+{guidelines}
 {query1} articles: {json.dumps(summarized_articles1)}
 {query2} articles: {json.dumps(summarized_articles2)}"""
-                
-                # Get analysis from Claude
-                response = anthropic.messages.create(
-                    model="claude-3-haiku-20240307",
-                    max_tokens=1000,
-                    messages=[{
-                        "role": "user",
-                        "content": analysis_prompt
-                    }]
-                )
-                
-                # Format the response
-                analysis_text = format_claude_response(response.content[0].text)
-                
-                # Cache the response with timestamp
-                if not hasattr(app.config, 'analysis_cache'):
-                    app.config['analysis_cache'] = {}
-                    app.config['cache_times'] = {}
-                app.config['analysis_cache'][cache_key] = analysis_text
-                app.config['cache_times'][cache_key] = datetime.now()
+    return cache_key, prompt
+
+def fetch_search_articles(params):
+    """Fetch both queries' articles concurrently; returns (articles1, articles2)."""
+    fetch1 = pipeline_executor.submit(
+        fetch_news,
+        keywords=params["query1"],
+        from_date=params["from_date1"],
+        to_date=params["to_date1"],
+        language=params["language1"],
+        source=params["source1"]
+    )
+    fetch2 = pipeline_executor.submit(
+        fetch_news,
+        keywords=params["query2"],
+        from_date=params["from_date2"] if params["from_date2"] else params["from_date1"],
+        to_date=params["to_date2"] if params["to_date2"] else params["to_date1"],
+        language=params["language2"],
+        source=params["source2"]
+    ) if params["query2"] else None
+    return fetch1.result(), (fetch2.result() if fetch2 else [])
+
+def result_template_context(params, form_data):
+    """Template variables shared by every part of the results page."""
+    query1, query2 = params["query1"], params["query2"]
+    return {
+        "query1": query1,
+        "query2": query2,
+        # Process boolean queries
+        "enhanced_query1": {"enhanced_query": parse_boolean_query(query1), "entity_type": "", "reasoning": "Boolean search query"},
+        "enhanced_query2": {"enhanced_query": parse_boolean_query(query2), "entity_type": "", "reasoning": "Boolean search query"} if query2 else None,
+        # A form-like object with the request parameters to maintain compatibility with the template
+        "request": type('obj', (object,), {'form': form_data})
+    }
+
+def render_timed(template_name, **context):
+    """render_template, timed as the "render" stage."""
+    with STAGE_SECONDS.timer(stage="render"):
+        return render_template(template_name, **context)
+
+@app.route("/results", methods=["GET"])
+def results():
+    # Get parameters from URL
+    search_params = results_search_params(request.args)
+    query1 = search_params["query1"]
+    query2 = search_params["query2"]
+    
+    try:
+        # Validate inputs and date ranges
+        problem = check_search_params(search_params)
+        if problem:
+            messages, endpoint = problem
+            for message in messages:
+                flash(message)
+            return redirect(url_for(endpoint))
+        
+        context = result_template_context(search_params, request.args.to_dict())
+        
+        # Streaming mode: send the page shell now and fill it in from /results/stream
+        if request.args.get("stream") == "1":
+            stream_args = request.args.to_dict()
+            stream_args.pop("stream")
+            placeholder1 = {"date_range": {"start": search_params["from_date1"], "end": search_params["to_date1"]}}
+            placeholder2 = {"date_range": {"start": search_params["from_date2"] or search_params["from_date1"],
+                                           "end": search_params["to_date2"] or search_params["to_date1"]}}
+            return render_timed(
+                "result_stream.html",
+                analysis1=placeholder1,
+                analysis2=placeholder2 if query2 else None,
+                stream_url=url_for("results_stream", **stream_args),
+                static_url=url_for("results", **stream_args),
+                **context
+            )
+        
+        # Fetch both article sets concurrently
+        articles1, articles2 = fetch_search_articles(search_params)
+        analysis2 = None
+        
+        analysis_text = None
+        
+        # Summarize articles for the narrative prompt before sentiment scoring starts writing to them
+        summarized_articles1 = summarize_articles(articles1)
+        summarized_articles2 = summarize_articles(articles2) if query2 else []
+        
+        # Score sentiment in the background while the narrative prompt runs
+        analysis1_future = pipeline_executor.submit(analyze_articles, articles1, query1)
+        analysis2_future = pipeline_executor.submit(analyze_articles, articles2, query2) if query2 else None
+        
+        # Check cache with all parameters before asking Claude
+        cache_key, analysis_prompt = narrative_request(search_params, summarized_articles1, summarized_articles2)
+        cached_response = analysis_cache.get(cache_key)
+        
+        if cached_response:
+            analysis_text = Markup(cached_response)
+        else:
+            # Get analysis from Claude
+            try:
+                with STAGE_SECONDS.timer(stage="narrative"):
+                    response = anthropic.messages.create(
+                        model=NARRATIVE_MODEL,
+                        max_tokens=NARRATIVE_MAX_TOKENS,
+                        messages=[{
+                            "role": "user",
+                            "content": analysis_prompt
+                        }]
+                    )
+            except Exception:
+                LLM_ERRORS.inc(purpose="narrative")
+                raise
+            record_llm_usage("narrative", getattr(response, "usage", None))
+            
+            # Format the response
+            analysis_text = format_claude_response(response.content[0].text)
+            
+            # Cache the response for every worker
+            analysis_cache.set(cache_key, str(analysis_text))
         
-        # Create a form-like object with the request parameters to maintain compatibility with the template
-        form_data = {}
-        for key, value in request.args.items():
-            form_data[key] = value
+        # Collect the sentiment analyses
+        analysis1 = analysis1_future.result()
+        if analysis2_future:
+            analysis2 = analysis2_future.result()
         
         # Helper function to format sources
         def format_sources(sources):
@@ -1125,35 +1007,183 @@ Key points to address:
             return ', '.join(result)
         
         # Debug logging for comparative analysis
-        if query2:
-            print(f"DEBUG - Comparative Analysis:")
-            print(f"  Query1: {query1}, Articles: {len(articles1)}, Sources: {len(analysis1['sources']) if 'sources' in analysis1 else 0}")
-            print(f"  Query2: {query2}, Articles: {len(articles2)}, Sources: {len(analysis2['sources']) if 'sources' in analysis2 else 0}")
+        if query2 and app.logger.isEnabledFor(logging.DEBUG):
+            app.logger.debug("Comparative Analysis:")
+            app.logger.debug("  Query1: %s, Articles: %d, Sources: %d", query1, len(articles1), len(analysis1.get('sources', [])))
+            app.logger.debug("  Query2: %s, Articles: %d, Sources: %d", query2, len(articles2), len(analysis2.get('sources', [])))
             
             # Log top sources for both queries
-            if 'sources' in analysis1 and analysis1['sources']:
-                print(f"  Top sources for {query1}: {format_sources(analysis1['sources'])}")
-            if 'sources' in analysis2 and analysis2['sources']:
-                print(f"  Top sources for {query2}: {format_sources(analysis2['sources'])}")
+            if analysis1.get('sources'):
+                app.logger.debug("  Top sources for %s: %s", query1, format_sources(analysis1['sources']))
+            if analysis2.get('sources'):
+                app.logger.debug("  Top sources for %s: %s", query2, format_sources(analysis2['sources']))
         
-        return render_template(
+        return render_timed(
             "result.html",
-            query1=query1,
-            query2=query2,
-            enhanced_query1=processed_query1,
-            enhanced_query2=processed_query2,
             textual_analysis=analysis_text,
             analysis1=analysis1,
             analysis2=analysis2,
             articles1=articles1,
             articles2=articles2,
-            request=type('obj', (object,), {'form': form_data})  # Create a mock request object with form attribute
+            **context
         )
         
     except Exception as e:
         flash(f"Error: {str(e)}")
         return redirect(url_for("index"))
 
+# Seconds between keep-alive comments while the stream waits on sentiment scoring
+RESULTS_STREAM_HEARTBEAT = 15
+
+def sse_event(event, data):
+    """One server-sent event; data is JSON on a single line."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.route("/results/stream")
+def results_stream():
+    """Server-sent events that fill in the streaming results page.
+    
+    Events, in order: "coverage" (header, volume/source/topic preview and the
+    article list, as soon as articles are fetched), "narrative" (Claude's
+    text as it streams), "analysis" (the full metrics and charts section plus
+    chart data, once sentiment is scored), "narrative_done" (the formatted
+    narrative) and "done". "failed" carries an error and where to redirect.
+    """
+    search_params = results_search_params(request.args)
+    query1 = search_params["query1"]
+    query2 = search_params["query2"]
+    form_data = request.args.to_dict()
+
+    def generate():
+        try:
+            problem = check_search_params(search_params)
+        except Exception as e:
+            problem = [f"Error: {str(e)}"], "index"
+        if problem:
+            messages, endpoint = problem
+            yield sse_event("failed", {"messages": messages, "redirect": url_for(endpoint)})
+            return
+        
+        try:
+            context = result_template_context(search_params, form_data)
+            articles1, articles2 = fetch_search_articles(search_params)
+            analysis1 = analysis2 = None
+            context.update(articles1=articles1, articles2=articles2)
+            
+            if not articles1:
+                # Nothing to score or narrate; the analysis section renders the no-results card
+                yield sse_event("analysis", {
+                    "html": render_timed("result_analysis.html", analysis1=summarize_coverage([], query1),
+                                            analysis2=None, **context),
+                    "data": None
+                })
+                yield sse_event("done", {})
+                return
+            
+            # Summarize articles for the narrative prompt before sentiment scoring starts writing to them
+            summarized_articles1 = summarize_articles(articles1)
+            summarized_articles2 = summarize_articles(articles2) if query2 else []
+            
+            # Start sentiment scoring first; the preview below treats unscored articles as neutral
+            futures = {1: pipeline_executor.submit(analyze_articles, articles1, query1)}
+            if query2:
+                futures[2] = pipeline_executor.submit(analyze_articles, articles2, query2)
+            
+            preview1 = summarize_coverage(articles1, query1)
+            preview2 = summarize_coverage(articles2, query2) if query2 else None
+            yield sse_event("coverage", {
+                "header": render_timed("result_header.html", analysis1=preview1, analysis2=preview2, **context),
+                "preview": render_timed("result_preview.html", analysis1=preview1, analysis2=preview2,
+                                           narrative_pending=True, **context),
+                "articles": render_timed("result_articles.html", **context)
+            })
+            
+            cache_key, analysis_prompt = narrative_request(search_params, summarized_articles1, summarized_articles2)
+            cached_response = analysis_cache.get(cache_key)
+            textual_analysis = Markup(cached_response) if cached_response else None
+            narrative_pending = textual_analysis is None
+            analysis_sent = False
+            
+            def analysis_event():
+                nonlocal analysis1, analysis2
+                if 1 in futures:
+                    analysis1 = futures[1].result()
+                if 2 in futures:
+                    analysis2 = futures[2].result()
+                return sse_event("analysis", {
+                    "html": render_timed("result_analysis.html", analysis1=analysis1, analysis2=analysis2,
+                                            textual_analysis=textual_analysis, narrative_pending=narrative_pending, **context),
+                    "data": {"articles1": articles1, "articles2": articles2 if query2 else None,
+                             "analysis1": analysis1, "analysis2": analysis2}
+                })
+            
+            def sentiment_ready():
+                return all(future.done() for future in futures.values())
+            
+            if narrative_pending:
+                # Stream the narrative, pushing the analysis section in between chunks when sentiment lands
+                chunks = []
+                try:
+                    with STAGE_SECONDS.timer(stage="narrative"), anthropic.messages.stream(
+                        model=NARRATIVE_MODEL,
+                        max_tokens=NARRATIVE_MAX_TOKENS,
+                        messages=[{"role": "user", "content": analysis_prompt}]
+                    ) as stream:
+                        for event in stream:
+                            if event.type == "content_block_delta" and getattr(event.delta, "text", None):
+                                chunks.append(event.delta.text)
+                                yield sse_event("narrative", {"text": event.delta.text})
+                            if not analysis_sent and sentiment_ready():
+                                yield analysis_event()
+                                analysis_sent = True
+                        record_llm_usage("narrative", stream.get_final_message().usage)
+                    textual_analysis = format_claude_response("".join(chunks))
+                    analysis_cache.set(cache_key, str(textual_analysis))
+                except Exception as e:
+                    # The template's own write-up stands in for Claude's
+                    LLM_ERRORS.inc(purpose="narrative")
+                    app.logger.warning("Error streaming narrative: %s", e)
+                narrative_pending = False
+                if analysis_sent or textual_analysis is not None:
+                    yield sse_event("narrative_done", {
+                        "html": render_timed("result_narrative.html", textual_analysis=textual_analysis,
+                                                analysis1=analysis1, analysis2=analysis2, **context)
+                    })
+            
+            while not sentiment_ready():
+                wait(futures.values(), timeout=RESULTS_STREAM_HEARTBEAT)
+                if not sentiment_ready():
+                    yield ": keep-alive\n\n"
+            if not analysis_sent:
+                yield analysis_event()
+            yield sse_event("done", {})
+        except Exception as e:
+            app.logger.error("Error streaming results: %s", e)
+            yield sse_event("failed", {"messages": [f"Error: {str(e)}"], "redirect": url_for("index")})
+    
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    # Streamed responses are timed to their headers; their stages are timed separately
+    started = g.pop("request_started", None)
+    if started is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=request.endpoint or "unmatched",
+                                method=request.method, status=response.status_code)
+    return response
+
+@app.route("/metrics")
+def metrics():
+    """Prometheus scrape endpoint; set METRICS_TOKEN to require it as a bearer token."""
+    if METRICS_TOKEN and not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {METRICS_TOKEN}"):
+        return Response("Unauthorized\n", status=401, mimetype="text/plain")
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
 if __name__ == "__main__":
     # Get port from environment variable or default to 5008
     port = int(os.environ.get("PORT", 5009))
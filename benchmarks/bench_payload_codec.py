@@ -0,0 +1,124 @@
+"""Stored bytes and encode/decode time per shared result, plain JSON vs utils.payload_codec.
+
+"legacy" is the old single json.dumps(payload) row; the codec rows store the
+whole payload as one encoded blob, as the app does. "per-article" is the
+earlier layout of one blob for the payload without articles plus one per
+article, kept for comparison.
+
+Run from the repository root:
+
+    python benchmarks/bench_payload_codec.py
+"""
+import json
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "news-analyzer"))
+
+from utils import payload_codec  # noqa: E402
+from utils.payload_codec import CODEC_NAMES, decode_payload, encode_payload  # noqa: E402
+
+WORDS = (
+    "apple iphone launch revenue quarter growth analysts shares market tariffs "
+    "china supply chain earnings record services developers regulators antitrust "
+    "vision pro sales decline investors ceo announces partnership ai features "
+    "the a of to in and for on with says after amid new report"
+).split()
+SOURCES = ["Reuters", "Bloomberg", "The Verge", "CNBC", "Financial Times", "TechCrunch", "BBC News", "Wired"]
+
+
+def make_article(rng, day):
+    source = rng.choice(SOURCES)
+    title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 14))).capitalize()
+    return {
+        "title": title,
+        "description": " ".join(rng.choice(WORDS) for _ in range(rng.randint(25, 45))).capitalize() + ".",
+        "url": f"https://www.{source.lower().replace(' ', '')}.com/2025/01/{day:02d}/{title.lower().replace(' ', '-')[:60]}",
+        "publishedAt": f"2025-01-{day:02d}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00Z",
+        "source": {"id": None, "name": source},
+        "sentiment": round(rng.uniform(-1, 1), 4),
+    }
+
+
+def make_analysis(articles, rng):
+    days = sorted({a["publishedAt"][:10] for a in articles})
+    return {
+        "timeline": [{"date": d, "count": rng.randint(1, 9), "peak_article": {
+            "title": a["title"], "source": a["source"]["name"], "url": a["url"], "sentiment": a["sentiment"]}}
+            for d, a in zip(days, articles)],
+        "sources": [{"name": s, "count": rng.randint(1, 20)} for s in SOURCES],
+        "topics": [{"topic": w, "count": rng.randint(3, 40)} for w in WORDS[:30]],
+        "total_articles": len(articles),
+        "date_range": {"start": days[0], "end": days[-1]},
+        "avg_sentiment": sum(a["sentiment"] for a in articles) / len(articles),
+    }
+
+
+def make_payload(per_side=60, seed=42):
+    rng = random.Random(seed)
+    articles1 = [make_article(rng, rng.randint(1, 28)) for _ in range(per_side)]
+    articles2 = [make_article(rng, rng.randint(1, 28)) for _ in range(per_side)]
+    narrative = "".join(f"<p>{' '.join(rng.choice(WORDS) for _ in range(60)).capitalize()}.</p>" for _ in range(8))
+    return {
+        "query1": "Apple", "query2": "Google",
+        "analysis1": make_analysis(articles1, rng), "analysis2": make_analysis(articles2, rng),
+        "articles1": articles1, "articles2": articles2,
+        "textual_analysis": narrative,
+        "form_data": {"query1": "Apple", "query2": "Google", "from_date": "2025-01-01", "to_date": "2025-01-28"},
+    }
+
+
+def legacy_rows(payload):
+    return [json.dumps(payload, default=str)]
+
+
+def codec_rows(payload, codec):
+    return [encode_payload(payload, codec)]
+
+
+def per_article_rows(payload, codec):
+    body = {k: v for k, v in payload.items() if k not in ("articles1", "articles2")}
+    return [encode_payload(body, codec)] + [encode_payload(a, codec)
+                                            for key in ("articles1", "articles2") for a in payload[key]]
+
+
+def bench(func, repeat=5, number=50):
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+
+
+def main():
+    payload = make_payload()
+    variants = [("legacy json", lambda: legacy_rows(payload), lambda rows: [json.loads(r) for r in rows])]
+    for name in ("none", "zlib", "zstd"):
+        if name == "zstd" and payload_codec.zstandard is None:
+            print("zstandard not installed; skipping zstd")
+            continue
+        codec = CODEC_NAMES[name]
+        variants.append((f"codec {name}", lambda codec=codec: codec_rows(payload, codec),
+                         lambda rows: [decode_payload(r) for r in rows]))
+    best = CODEC_NAMES["zstd" if payload_codec.zstandard else "zlib"]
+    variants.append(("per-article", lambda: per_article_rows(payload, best),
+                     lambda rows: [decode_payload(r) for r in rows]))
+
+    print(f"{'encoding':>12} {'rows':>5} {'bytes/result':>13} {'ratio':>6} {'encode us':>10} {'decode us':>10}")
+    baseline = None
+    for name, encode, decode in variants:
+        rows = encode()
+        stored = sum(len(r.encode("utf-8") if isinstance(r, str) else r) for r in rows)
+        baseline = baseline or stored
+        decoded = decode(rows)
+        if name == "per-article":
+            body, articles = decoded[0], decoded[1:]
+            assert articles == payload["articles1"] + payload["articles2"]
+            assert body["analysis1"] == payload["analysis1"]
+        elif name != "legacy json":
+            assert decoded == [payload]
+        print(f"{name:>12} {len(rows):>5} {stored:>13,} {stored / baseline:>6.2f} "
+              f"{bench(encode):>10.0f} {bench(lambda: decode(rows)):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
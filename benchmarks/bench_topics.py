@@ -0,0 +1,68 @@
+"""Per-article cost of topic extraction, old inline version vs utils.topics.
+
+Run from the repository root:
+
+    python benchmarks/bench_topics.py
+"""
+import os
+import random
+import re
+import sys
+import timeit
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.topics import STOP_WORDS, extract_topics  # noqa: E402
+
+WORDS = (
+    "apple iphone launch revenue quarter growth analysts shares market tariffs "
+    "china supply chain earnings record services developers regulators antitrust "
+    "vision pro sales decline investors ceo announces partnership ai features "
+    "2025 q3 m4 chips battery recall lawsuit settlement europe fine app store"
+).split() + sorted(STOP_WORDS)[:80]
+
+
+def make_articles(n, seed=42):
+    rng = random.Random(seed)
+    return [{
+        'title': " ".join(rng.choice(WORDS) for _ in range(12)).capitalize(),
+        'description': " ".join(rng.choice(WORDS) for _ in range(30)) + ".",
+    } for _ in range(n)]
+
+
+def legacy_topics(articles, query):
+    """The previous analyze_articles implementation, rebuilding its stop-word set per call."""
+    stop_words = set(STOP_WORDS)
+    stop_words.update(set(query.lower().split()))
+    text = ' '.join(article['title'] + ' ' + (article['description'] or '')
+                    for article in articles).lower()
+    words = re.findall(r'\b\w+\b', text)
+    topics = Counter(word for word in words
+                     if word not in stop_words
+                     and len(word) > 2
+                     and not word.isnumeric()
+                     and not any(char.isdigit() for char in word))
+    return [{'topic': topic, 'count': count}
+            for topic, count in topics.most_common(30)
+            if count > 2]
+
+
+def bench(func, articles, repeat=5):
+    number = max(1, 20000 // len(articles))
+    best = min(timeit.repeat(lambda: func(articles, "Apple"), number=number, repeat=repeat))
+    return best / number / len(articles) * 1e6
+
+
+def main():
+    print(f"{'articles':>9} {'legacy us/article':>18} {'extract_topics us/article':>26} {'speedup':>8}")
+    for n in (100, 1000, 10000):
+        articles = make_articles(n)
+        assert legacy_topics(articles, "Apple") == extract_topics(articles, "Apple")
+        legacy = bench(legacy_topics, articles)
+        current = bench(extract_topics, articles)
+        print(f"{n:>9} {legacy:>18.2f} {current:>26.2f} {legacy / current:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
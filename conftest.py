@@ -0,0 +1,2 @@
+# archive/ holds old one-off scripts (test_simple.py calls live APIs at import), not tests
+collect_ignore = ["archive"]
@@ -1,24 +1,43 @@
 import os
 import json
+import hashlib
 import re
 import random
-import requests
 import html
+import hmac
+import time
 import uuid
 import io
+import atexit
 from PIL import Image, ImageDraw, ImageFont
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, g
 from markupsafe import Markup
 from dotenv import load_dotenv
 from anthropic import Anthropic
+from apscheduler.schedulers.background import BackgroundScheduler
 from dateutil.parser import parse
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.utils import secure_filename
-from utils.simple_file_processor import SimpleMediaFileProcessor
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import defer
+from utils.simple_file_processor import SimpleMediaFileProcessor, buffer_upload
+from utils.upload_pipeline import UploadPipeline
+from utils.sentiment import SentimentEngine
+from utils.cache import SQLiteCache
+from utils.http_client import HttpClient
+from utils.newsapi import NewsAPIPaginator
+from utils.upstream_cache import UpstreamCache
+from utils.topics import BASIC_STOP_WORDS, extract_topics
+from utils.payload_codec import encode_payload, decode_payload
+from utils.outbox import Outbox
+from utils.logs import configure_logging
+from utils.metrics import (REGISTRY, CONTENT_TYPE, STAGE_SECONDS, REQUEST_SECONDS, LLM_ERRORS,
+                           record_llm_usage, cache_collector, http_client_collector)
 
 load_dotenv()
+configure_logging()
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "your_secret_key_here")
@@ -34,6 +53,13 @@ app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 # Initialize file processor
 file_processor = SimpleMediaFileProcessor(os.environ.get("ANTHROPIC_API_KEY"))
 
+# Files in one upload are parsed in worker processes and extracted in threads, side by side
+upload_pipeline = UploadPipeline(
+    file_processor,
+    parse_workers=int(os.environ.get("UPLOAD_PARSE_WORKERS", min(4, os.cpu_count() or 1))),
+    extract_workers=int(os.environ.get("UPLOAD_EXTRACT_WORKERS", 4))
+)
+
 # Initialize SQLAlchemy
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///waitlist.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
@@ -57,7 +83,26 @@ class SharedResult(db.Model):
     __tablename__ = 'shared_results'
     id = db.Column(db.Integer, primary_key=True)
     slug = db.Column(db.String(32), unique=True, index=True, nullable=False)
-    payload = db.Column(db.Text, nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # legacy plain JSON; empty once payload_data is set
+    payload_data = db.Column(db.LargeBinary, nullable=True)  # utils.payload_codec-encoded payload
+    # Summary metrics so cards, OG images and emails never parse the payload
+    query1 = db.Column(db.String(255), nullable=True)
+    query2 = db.Column(db.String(255), nullable=True)
+    total_articles1 = db.Column(db.Integer, nullable=True)  # NULL until a legacy row is backfilled
+    avg_sentiment1 = db.Column(db.Float, nullable=True)
+    total_articles2 = db.Column(db.Integer, nullable=True)
+    avg_sentiment2 = db.Column(db.Float, nullable=True)
+    date_start = db.Column(db.String(32), nullable=True)
+    date_end = db.Column(db.String(32), nullable=True)
+    top_topics = db.Column(db.Text, nullable=True)  # JSON list of query1's top topic names
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+class OgImage(db.Model):
+    __tablename__ = 'og_images'
+    slug = db.Column(db.String(32), primary_key=True)
+    version = db.Column(db.Integer, nullable=False)  # OG_IMAGE_VERSION it was rendered with
+    etag = db.Column(db.String(64), nullable=False)
+    png = db.Column(db.LargeBinary, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
 class LeadCapture(db.Model):
@@ -69,9 +114,65 @@ class LeadCapture(db.Model):
     extra = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
-# Create the database tables
-with app.app_context():
-    db.create_all()
+class OutboxMessage(db.Model):
+    __tablename__ = 'outbox_messages'
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(32), nullable=False)  # key into the outbox handlers: email, webhook
+    payload = db.Column(db.Text, nullable=False)  # JSON handler argument
+    status = db.Column(db.String(16), nullable=False, default='pending')  # pending, sending, sent, dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    __table_args__ = (db.Index('ix_outbox_messages_due', 'status', 'next_attempt_at'),)
+
+class UploadJob(db.Model):
+    __tablename__ = 'upload_jobs'
+    id = db.Column(db.String(32), primary_key=True)
+    status = db.Column(db.String(16), nullable=False, default='queued')  # queued, running, done, failed
+    stage = db.Column(db.String(32), nullable=False, default='queued')
+    files_total = db.Column(db.Integer, nullable=False, default=0)
+    files_done = db.Column(db.Integer, nullable=False, default=0)
+    progress = db.Column(db.Text, nullable=True)  # JSON: per-file results and messages
+    slug = db.Column(db.String(32), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+# Columns added to shared_results after it first shipped; create_all() won't add them to an existing table
+SHARED_RESULT_MIGRATIONS = [
+    ("query1", db.String(255)),
+    ("query2", db.String(255)),
+    ("total_articles1", db.Integer()),
+    ("avg_sentiment1", db.Float()),
+    ("total_articles2", db.Integer()),
+    ("avg_sentiment2", db.Float()),
+    ("date_start", db.String(32)),
+    ("date_end", db.String(32)),
+    ("top_topics", db.Text()),
+    ("payload_data", db.LargeBinary()),
+]
+
+def migrate_shared_results():
+    """Add missing columns and indexes to an existing shared_results table."""
+    existing = {column["name"] for column in inspect(db.engine).get_columns("shared_results")}
+    for name, column_type in SHARED_RESULT_MIGRATIONS:
+        if name in existing:
+            continue
+        try:
+            with db.engine.begin() as conn:
+                column_sql = column_type.compile(dialect=db.engine.dialect)
+                conn.execute(text(f"ALTER TABLE shared_results ADD COLUMN {name} {column_sql}"))
+            app.logger.info("Added shared_results.%s", name)
+        except Exception as e:
+            # Another worker may have added it first
+            app.logger.warning("Could not add shared_results.%s: %s", name, e)
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_shared_results_created_at ON shared_results (created_at)"))
+    except Exception as e:
+        app.logger.warning("Could not index shared_results.created_at: %s", e)
 
 # API keys and configuration
 NEWS_API_KEY = os.environ.get("NEWS_API_KEY")
@@ -79,81 +180,152 @@ ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY")
 GA_MEASUREMENT_ID = os.environ.get("GA_MEASUREMENT_ID")
 
 # Debug logging for API keys
-print(f"NEWS_API_KEY is {'set' if NEWS_API_KEY else 'NOT SET'}")
-print(f"ANTHROPIC_API_KEY is {'set' if ANTHROPIC_API_KEY else 'NOT SET'}")
-print(f"GA_MEASUREMENT_ID is {'set' if GA_MEASUREMENT_ID else 'NOT SET'}")
+app.logger.info("NEWS_API_KEY is %s", 'set' if NEWS_API_KEY else 'NOT SET')
+app.logger.info("ANTHROPIC_API_KEY is %s", 'set' if ANTHROPIC_API_KEY else 'NOT SET')
+app.logger.info("GA_MEASUREMENT_ID is %s", 'set' if GA_MEASUREMENT_ID else 'NOT SET')
 
 anthropic = Anthropic(api_key=ANTHROPIC_API_KEY)
 
+# Pooled, timeout-aware client for every outbound upstream call
+http_client = HttpClient(
+    timeout=(float(os.environ.get("HTTP_CONNECT_TIMEOUT", 3.05)), float(os.environ.get("HTTP_READ_TIMEOUT", 12))),
+    retries=int(os.environ.get("HTTP_RETRIES", 2)),
+    per_host_limit=int(os.environ.get("HTTP_PER_HOST_LIMIT", 8))
+)
+
+# Multi-page NewsAPI fetching up to a per-query article budget
+NEWS_API_ARTICLE_BUDGET = int(os.environ.get("NEWS_API_ARTICLE_BUDGET", 60))
+news_api_paginator = NewsAPIPaginator(
+    http_client,
+    max_articles=NEWS_API_ARTICLE_BUDGET,
+    max_workers=int(os.environ.get("NEWS_API_PAGE_WORKERS", 4))
+)
+
+# Persistent cache shared by every worker; sentiment scores are keyed by article content
+CACHE_DB_PATH = os.environ.get("CACHE_DB_PATH", os.path.join(app.instance_path, "cache.db"))
+sentiment_cache = SQLiteCache(
+    CACHE_DB_PATH,
+    namespace="sentiment",
+    ttl=int(os.environ.get("SENTIMENT_CACHE_TTL", 30 * 24 * 3600)),
+    max_entries=int(os.environ.get("SENTIMENT_CACHE_MAX_ENTRIES", 50000))
+)
+sentiment_engine = SentimentEngine(anthropic, cache=sentiment_cache)
+
+# NewsAPI and RSS responses keyed by normalized query and window, served stale-while-revalidate
+upstream_cache = UpstreamCache(
+    SQLiteCache(CACHE_DB_PATH, namespace="upstream", max_entries=int(os.environ.get("UPSTREAM_CACHE_MAX_ENTRIES", 2000))),
+    live_ttl=int(os.environ.get("UPSTREAM_CACHE_LIVE_TTL", 600)),
+    historical_ttl=int(os.environ.get("UPSTREAM_CACHE_HISTORICAL_TTL", 86400))
+)
+
+# Stage timers, token counters and upstream stats are scraped from /metrics
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+REGISTRY.register_collector(cache_collector([sentiment_cache, upstream_cache.cache]))
+REGISTRY.register_collector(http_client_collector(http_client))
+
+# Upload jobs run here, off the request thread; status lives in the upload_jobs table
+upload_job_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("UPLOAD_JOB_WORKERS", 2)))
+UPLOAD_JOB_TIMEOUT = int(os.environ.get("UPLOAD_JOB_TIMEOUT", 900))
+
+# Shared pool for running the query1/query2 pipelines side by side
+pipeline_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("PIPELINE_MAX_WORKERS", 8)))
+
+def send_summary_email(message):
+    """Outbox handler: send a result summary email through SendGrid."""
+    sg_key = os.environ.get("SENDGRID_API_KEY")
+    if not sg_key:
+        raise RuntimeError("SENDGRID_API_KEY not set")
+    from sendgrid import SendGridAPIClient
+    from sendgrid.helpers.mail import Mail
+    mail = Mail(
+        from_email=("no-reply@innatec3.com", "innate c3"),
+        to_emails=[message["to"]],
+        subject=message["subject"],
+        plain_text_content=message["text"],
+        html_content="<pre style='font-family:monospace'>" + html.escape(message["text"]) + "</pre>"
+    )
+    resp = SendGridAPIClient(sg_key).send(mail)
+    app.logger.info("SendGrid response: %s", resp.status_code)
+    if resp.status_code >= 400:
+        raise RuntimeError(f"SendGrid returned {resp.status_code}")
+
+def post_lead_webhook(message):
+    """Outbox handler: forward a lead to the configured webhook (Sheets/Airtable bridge)."""
+    resp = http_client.post(message["url"], json=message["body"], timeout=(3.05, 5))
+    resp.raise_for_status()
+
+# Emails and webhooks are committed with the lead row and delivered in the background
+outbox = Outbox(
+    db, OutboxMessage,
+    handlers={"email": send_summary_email, "webhook": post_lead_webhook},
+    batch_size=int(os.environ.get("OUTBOX_BATCH_SIZE", 20)),
+    max_attempts=int(os.environ.get("OUTBOX_MAX_ATTEMPTS", 6)),
+    backoff=float(os.environ.get("OUTBOX_BACKOFF", 30)),
+    max_backoff=float(os.environ.get("OUTBOX_MAX_BACKOFF", 3600))
+)
+OUTBOX_POLL_INTERVAL = float(os.environ.get("OUTBOX_POLL_INTERVAL", 3))
+OUTBOX_RETENTION = int(os.environ.get("OUTBOX_RETENTION", 7 * 24 * 3600))
+
+def dispatch_outbox():
+    with app.app_context():
+        try:
+            outbox.dispatch()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error("Outbox dispatch error: %s", e)
+
+def purge_outbox():
+    with app.app_context():
+        try:
+            removed = outbox.purge(OUTBOX_RETENTION)
+            if removed:
+                app.logger.info("Outbox purge: removed %d sent messages", removed)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error("Outbox purge error: %s", e)
+
+scheduler = BackgroundScheduler()
+
+def start_services():
+    """Create and migrate the tables, then start the outbox jobs; once per server process."""
+    with app.app_context():
+        db.create_all()
+        migrate_shared_results()
+
+    # Set OUTBOX_DISPATCH=0 on processes that shouldn't deliver (e.g. when a separate worker does)
+    if os.environ.get("OUTBOX_DISPATCH", "1") != "0":
+        scheduler.add_job(func=dispatch_outbox, trigger="interval", seconds=OUTBOX_POLL_INTERVAL,
+                          max_instances=1, coalesce=True)
+        scheduler.add_job(func=purge_outbox, trigger="interval", hours=1, max_instances=1, coalesce=True)
+        scheduler.start()
+        atexit.register(scheduler.shutdown, wait=False)
+
+# multiprocessing children that re-import the main script load it as __mp_main__;
+# only the server process (or each gunicorn worker) migrates and runs the outbox
+if __name__ != "__mp_main__":
+    start_services()
+
 def analyze_articles(articles, query):
     """Extract key metrics and patterns from articles."""
-    # Batch sentiment analysis for all articles
-    texts = [f"{article['title']} {article['description'] or ''}" for article in articles]
-    
-    # Create a numbered list for Claude to reference
-    numbered_texts = "\n\n".join(f"Text {i+1}:\n{text}" for i, text in enumerate(texts))
-    
     # If no Anthropic key, default sentiments to neutral to allow demo flows
     if not ANTHROPIC_API_KEY:
         for article in articles:
             article['sentiment'] = 0
     else:
+        # Chunked, parallel sentiment scoring so every article gets a real score
         try:
-            response = anthropic.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=1000,
-                messages=[{
-                    "role": "user",
-                    "content": f"""Analyze the sentiment of each numbered text and respond with a JSON array of sentiment scores between -1 (most negative) and 1 (most positive).
-
-For each text:
-- Consider the overall tone, word choice, and context
-- Score negative news/criticism closer to -1
-- Score positive news/achievements closer to +1
-- Score neutral/factual content closer to 0
-
-IMPORTANT: Your response must begin with a valid JSON array containing only numbers, like this:
-[-0.8, 0.5, 0.2, -0.4, 0.1]
-
-Do not include any explanations before the array. You can add explanations after the array if needed.
-
-Here are the texts to analyze:
-
-{numbered_texts}"""
-                }]
-            )
-            
-            # Extract the array from Claude's response by finding text between [ and ]
-            sentiment_text = response.content[0].text
-            print("Anthropic API Response:", sentiment_text)  # Log the response for debugging
-            array_match = re.search(r'\[(.*?)\]', sentiment_text, re.DOTALL)
-            if array_match:
-                # Parse the comma-separated values into floats
-                sentiment_values = re.findall(r'-?\d+(?:\.\d+)?', array_match.group(1))
-                sentiments = []
-                for value in sentiment_values:
-                    try:
-                        parsed_value = float(value)
-                        sentiments.append(parsed_value)
-                    except ValueError:
-                        pass
-                # Use available sentiments, pad with 0 if needed
-                for i, article in enumerate(articles):
-                    if i < len(sentiments):
-                        sentiment = max(-1, min(1, sentiments[i]))
-                        article['sentiment'] = sentiment
-                    else:
-                        article['sentiment'] = 0
-            else:
-                # If no array found, use neutral sentiment
-                for article in articles:
-                    article['sentiment'] = 0
+            with STAGE_SECONDS.timer(stage="sentiment"):
+                sentiment_engine.score_articles(articles)
         except Exception as e:
-            print("Error calling or parsing Anthropic sentiment response:", e)
+            app.logger.warning("Error calling or parsing Anthropic sentiment response: %s", e)
             # Default to neutral if API call or parsing fails
             for article in articles:
                 article['sentiment'] = 0
-    
+    return summarize_coverage(articles, query)
+
+@STAGE_SECONDS.timer(stage="parse")
+def summarize_coverage(articles, query):
+    """Timeline, sources, topics and sentiment totals for scored articles."""
     # Publication timeline with articles
     dates = {}
     articles_by_date = {}
@@ -189,32 +361,8 @@ Here are the texts to analyze:
     top_sources = [{'name': name, 'count': count} 
                    for name, count in sources.most_common(10)]
     
-    # Topic extraction
-    stop_words = {
-        'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 
-        'for', 'of', 'with', 'by', 'from', 'up', 'about', 'into', 'over',
-        'after', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
-        'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would',
-        'should', 'can', 'could', 'may', 'might', 'must', 'it', 'its'
-    }
-    
-    # Add search terms to stop words
-    search_terms = set(query.lower().split())
-    stop_words.update(search_terms)
-    
-    # Topic extraction with better filtering
-    text = ' '.join(article['title'] + ' ' + (article['description'] or '')
-                   for article in articles).lower()
-    words = re.findall(r'\b\w+\b', text)
-    topics = Counter(word for word in words 
-                    if word not in stop_words 
-                    and len(word) > 2 
-                    and not word.isnumeric()
-                    and not any(char.isdigit() for char in word))
-    
-    top_topics = [{'topic': topic, 'count': count} 
-                  for topic, count in topics.most_common(30)
-                  if count > 2]
+    # Topic extraction with a precompiled tokenizer and frozen stop-word vocabulary
+    top_topics = extract_topics(articles, query, stop_words=BASIC_STOP_WORDS)
 
     # Calculate average sentiment
     sentiments = [article['sentiment'] for article in articles]
@@ -232,11 +380,33 @@ Here are the texts to analyze:
         'avg_sentiment': avg_sentiment
     }
 
+def normalize_query(query):
+    """Collapse whitespace so trivially different spellings share upstream cache entries."""
+    return " ".join((query or "").split())
+
+@STAGE_SECONDS.timer(stage="fetch")
 def fetch_rss_articles(query, from_date_str=None, to_date_str=None, max_items=50):
+    """Google News RSS fetch, served from the upstream response cache when possible."""
+    if not query:
+        return []
+    cache_key = upstream_cache.make_key(
+        "google_news_rss",
+        query=normalize_query(query),
+        from_date=from_date_str or "",
+        to_date=to_date_str or "",
+        max_items=max_items
+    )
+    return upstream_cache.fetch(
+        cache_key,
+        lambda: fetch_rss_articles_uncached(query, from_date_str, to_date_str, max_items=max_items),
+        to_date_str=to_date_str
+    )
+
+def fetch_rss_articles_uncached(query, from_date_str=None, to_date_str=None, max_items=50):
     """
     Fallback: fetch recent articles from Google News RSS without requiring NEWS_API_KEY.
-    Tries a few query variants (quoted, with when:Xd) and returns a list of article dicts
-    compatible with analyze_articles().
+    Fetches a few query variants (quoted, with when:Xd) concurrently, parses each feed
+    incrementally and returns a list of article dicts compatible with analyze_articles().
     """
     import urllib.parse
     import xml.etree.ElementTree as ET
@@ -286,75 +456,118 @@ def fetch_rss_articles(query, from_date_str=None, to_date_str=None, max_items=50
             seen.add(v)
             query_variants.append(v)
 
-    all_articles = []
-    seen_keys = set()
+    def parse_item(item):
+        """Convert one RSS <item> into an article dict, or None if it falls outside the window."""
+        title = (item.findtext('title') or '').strip()
+        link = (item.findtext('link') or '').strip()
+        description = (item.findtext('description') or '').strip()
+        pub_raw = item.findtext('pubDate') or ''
+        # pubDate like: Wed, 13 Aug 2025 15:04:05 GMT
+        dt = eut.parsedate_to_datetime(pub_raw) if pub_raw else None
+        dt_date = dt.date() if dt else None
+
+        # Date filtering (inclusive)
+        if from_date and dt_date and dt_date < from_date:
+            return None
+        if to_date and dt_date and dt_date > to_date:
+            return None
 
-    for q in query_variants:
+        source_tag = item.find('source')
+        source_name = (source_tag.text.strip() if source_tag is not None and source_tag.text else 'Google News')
+
+        return {
+            'title': title,
+            'description': description,
+            'publishedAt': (dt.isoformat() if dt else datetime.utcnow().isoformat()),
+            'source': {'name': source_name},
+            'url': link,
+            'api_source': 'google_news_rss'
+        }
+
+    def fetch_variant(q):
+        """Stream one variant's feed, parsing items until max_items unique ones are collected."""
         qs = urllib.parse.quote(q)
         url = f"https://news.google.com/rss/search?q={qs}&hl=en-US&gl=US&ceid=US:en"
+        articles = []
+        keys = set()
+        resp = None
         try:
-            resp = requests.get(url, timeout=12, headers={
-                "User-Agent": "Mozilla/5.0 (compatible; InnateC3/1.0; +https://innatec3.com)"
-            })
+            resp = http_client.get(url, stream=True)
             resp.raise_for_status()
-            root = ET.fromstring(resp.text)
-        except Exception as e:
-            print(f"RSS fetch error for '{q}': {e}")
-            continue
-
-        channel = root.find('channel')
-        if channel is None:
-            continue
-
-        for item in channel.findall('item'):
-            try:
-                title = (item.findtext('title') or '').strip()
-                link = (item.findtext('link') or '').strip()
-                description = (item.findtext('description') or '').strip()
-                pub_raw = item.findtext('pubDate') or ''
-                # pubDate like: Wed, 13 Aug 2025 15:04:05 GMT
-                dt = eut.parsedate_to_datetime(pub_raw) if pub_raw else None
-                dt_date = dt.date() if dt else None
-
-                # Date filtering (inclusive)
-                if from_date and dt_date and dt_date < from_date:
+            resp.raw.decode_content = True
+            # Parse straight from the byte stream instead of decoding the whole body first
+            for _, elem in ET.iterparse(resp.raw, events=("end",)):
+                if elem.tag != 'item':
                     continue
-                if to_date and dt_date and dt_date > to_date:
+                try:
+                    article = parse_item(elem)
+                except Exception:
+                    article = None
+                elem.clear()
+                if not article:
                     continue
-
-                source_tag = item.find('source')
-                source_name = (source_tag.text.strip() if source_tag is not None and source_tag.text else 'Google News')
-
-                key = (title, link)
-                if key in seen_keys:
+                key = (article['title'], article['url'])
+                if key in keys:
                     continue
+                keys.add(key)
+                articles.append(article)
+                if len(articles) >= max_items:
+                    break
+        except Exception as e:
+            app.logger.warning("RSS fetch error for '%s': %s", q, e)
+        finally:
+            if resp is not None:
+                resp.close()
+        return articles
 
-                all_articles.append({
-                    'title': title,
-                    'description': description,
-                    'publishedAt': (dt.isoformat() if dt else datetime.utcnow().isoformat()),
-                    'source': {'name': source_name},
-                    'url': link,
-                    'api_source': 'google_news_rss'
-                })
-                seen_keys.add(key)
+    # Fetch all variants at once, then merge them in priority order
+    with ThreadPoolExecutor(max_workers=len(query_variants)) as executor:
+        variant_results = list(executor.map(fetch_variant, query_variants))
 
-                if len(all_articles) >= max_items:
-                    break
-            except Exception:
+    all_articles = []
+    seen_keys = set()
+    for articles in variant_results:
+        for article in articles:
+            key = (article['title'], article['url'])
+            if key in seen_keys:
                 continue
-
-        if len(all_articles) >= max_items:
-            break
+            seen_keys.add(key)
+            all_articles.append(article)
+            if len(all_articles) >= max_items:
+                return all_articles
 
     return all_articles
 
 
-def fetch_news_api_articles(query, from_date_str=None, to_date_str=None, language="en", sources=None, page_size=50):
+@STAGE_SECONDS.timer(stage="fetch")
+def fetch_news_api_articles(query, from_date_str=None, to_date_str=None, language="en", sources=None, max_articles=None):
+    """NewsAPI fetch, served from the upstream response cache when possible."""
+    if not query or not NEWS_API_KEY:
+        return []
+    max_articles = max_articles or NEWS_API_ARTICLE_BUDGET
+    cache_key = upstream_cache.make_key(
+        "newsapi",
+        query=normalize_query(query),
+        language=(language or "en"),
+        sources=sources or "",
+        from_date=from_date_str or "",
+        to_date=to_date_str or "",
+        max_articles=max_articles
+    )
+    return upstream_cache.fetch(
+        cache_key,
+        lambda: fetch_news_api_articles_uncached(query, from_date_str, to_date_str, language=language,
+                                                 sources=sources, max_articles=max_articles),
+        to_date_str=to_date_str
+    )
+
+def fetch_news_api_articles_uncached(query, from_date_str=None, to_date_str=None, language="en", sources=None, max_articles=None):
     """
-    Fetch recent articles from NewsAPI.org using the 'everything' endpoint.
+    Fetch recent articles from NewsAPI.org using the 'everything' endpoint, paging
+    until max_articles (default NEWS_API_ARTICLE_BUDGET) or the date window is reached.
     Returns a list of article dicts compatible with analyze_articles().
     """
+    max_articles = max_articles or NEWS_API_ARTICLE_BUDGET
     if not query:
         return []
     if not NEWS_API_KEY:
@@ -374,7 +587,6 @@ def fetch_news_api_articles(query, from_date_str=None, to_date_str=None, languag
         "q": query,
         "sortBy": "publishedAt",
         "language": (language or "en"),
-        "pageSize": max(1, min(100, page_size)),
         "apiKey": NEWS_API_KEY,
     }
     from_iso = to_iso(from_date_str, end=False)
@@ -387,17 +599,12 @@ def fetch_news_api_articles(query, from_date_str=None, to_date_str=None, languag
         # NewsAPI expects a comma-separated list of allowed sources
         params["sources"] = sources
 
-    url = "https://newsapi.org/v2/everything"
-    try:
-        resp = requests.get(url, params=params, timeout=12, headers={
-            "User-Agent": "Mozilla/5.0 (compatible; InnateC3/1.0; +https://innatec3.com)"
-        })
-        resp.raise_for_status()
-        data = resp.json()
-        items = data.get("articles", []) or []
-    except Exception as e:
-        print(f"NewsAPI fetch error for '{query}': {e}")
+    items, info = news_api_paginator.fetch(params, window_start=from_iso, max_articles=max_articles)
+    if not info["ok"]:
+        app.logger.warning("NewsAPI fetch error for '%s': %s", query, info['stopped'])
         return []
+    app.logger.info("NewsAPI '%s': %d articles from %d pages using %d upstream calls (stopped: %s)",
+                    query, len(items), info['pages'], info['upstream_calls'], info['stopped'])
 
     articles = []
     seen = set()
@@ -423,85 +630,203 @@ def fetch_news_api_articles(query, from_date_str=None, to_date_str=None, languag
                 "url": link,
                 "api_source": "newsapi"
             })
-            if len(articles) >= page_size:
+            if len(articles) >= max_articles:
                 break
         except Exception:
             continue
 
     return articles
 
+def fetch_live_articles(query, from_date_str, to_date_str, language, sources):
+    """Fetch one query from NewsAPI, falling back to Google News RSS if that returns nothing."""
+    try:
+        articles = fetch_news_api_articles(query, from_date_str, to_date_str, language=language, sources=sources)
+    except Exception as e:
+        app.logger.warning("NewsAPI error: %s", e)
+        articles = []
+    if not articles:
+        articles = fetch_rss_articles(query, from_date_str, to_date_str, max_items=60)
+    return articles
+
+def analyze_query_pair(articles1, query1, articles2, query2):
+    """Analyze the first query here while the second runs on the pipeline pool."""
+    analysis2_future = pipeline_executor.submit(analyze_articles, articles2, query2) if query2 else None
+    analysis1 = analyze_articles(articles1, query1)
+    analysis2 = analysis2_future.result() if analysis2_future else None
+    return analysis1, analysis2
+
 # File upload utility functions
+SUMMARY_TOPICS = 5
+# Query options for views that only need a result's summary columns
+SUMMARY_ONLY = (defer(SharedResult.payload), defer(SharedResult.payload_data))
+
+def _summary_columns(payload):
+    """SharedResult summary column values for a result payload."""
+    a1 = payload.get("analysis1") or {}
+    a2 = payload.get("analysis2") or {}
+    dr = a1.get("date_range") or {}
+    topics = [t.get("topic") for t in (a1.get("topics") or [])[:SUMMARY_TOPICS]
+              if isinstance(t, dict) and t.get("topic")]
+    return {
+        "query1": (payload.get("query1") or "")[:255] or None,
+        "query2": (payload.get("query2") or "")[:255] or None,
+        "total_articles1": int(a1.get("total_articles", 0) or 0),
+        "avg_sentiment1": float(a1.get("avg_sentiment", 0) or 0),
+        "total_articles2": int(a2.get("total_articles", 0) or 0) if a2 else None,
+        "avg_sentiment2": float(a2.get("avg_sentiment", 0) or 0) if a2 else None,
+        "date_start": str(dr.get("start") or "")[:32] or None,
+        "date_end": str(dr.get("end") or "")[:32] or None,
+        "top_topics": json.dumps(topics),
+    }
+
+def _save_shared_result(payload):
+    """Persist a result payload and return its new slug.
+    
+    Summary metrics go to indexed columns and the whole payload, articles
+    included, to one encoded blob so compression can use the redundancy
+    between articles.
+    """
+    slug = uuid.uuid4().hex[:10]
+    try:
+        with STAGE_SECONDS.timer(stage="db_write"):
+            db.session.add(SharedResult(slug=slug, payload="", payload_data=encode_payload(payload),
+                                        **_summary_columns(payload)))
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    # Render the share card now so the first crawler hit is already warm
+    try:
+        _store_og_image(slug, _summary_columns(payload))
+    except Exception as e:
+        app.logger.warning("Error pre-rendering OG image for %s: %s", slug, e)
+    return slug
+
+def _load_shared_result(rec):
+    """Full result payload: decoded payload_data, or plain JSON for rows saved before it."""
+    return decode_payload(rec.payload_data if rec.payload_data is not None else rec.payload)
+
+def _shared_result_summary(rec):
+    """Summary metrics for a result, read from its columns.
+    
+    Rows saved before the summary columns existed are backfilled from their
+    payload the first time they're read.
+    """
+    if rec.total_articles1 is None:
+        try:
+            columns = _summary_columns(_load_shared_result(rec))
+        except Exception as e:
+            app.logger.warning("Unreadable payload for shared result %s: %s", rec.slug, e)
+            columns = _summary_columns({})
+        try:
+            for key, value in columns.items():
+                setattr(rec, key, value)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.warning("Error backfilling shared result %s: %s", rec.slug, e)
+    try:
+        topics = json.loads(rec.top_topics) if rec.top_topics else []
+    except Exception:
+        topics = []
+    return {
+        "query1": rec.query1,
+        "query2": rec.query2,
+        "total_articles1": rec.total_articles1 or 0,
+        "avg_sentiment1": rec.avg_sentiment1 or 0,
+        "total_articles2": rec.total_articles2 or 0,
+        "avg_sentiment2": rec.avg_sentiment2 or 0,
+        "date_start": rec.date_start,
+        "date_end": rec.date_end,
+        "topics": topics,
+    }
+
 def allowed_file(filename):
     """Check if the uploaded file has an allowed extension."""
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 # File upload routes
-@app.route("/upload", methods=["GET", "POST"])
-def upload_files():
-    """Handle file uploads and process media coverage data."""
-    if request.method == "POST":
-        # Check if files were uploaded
-        if 'files' not in request.files:
-            flash('No files selected')
-            return redirect(request.url)
-        
-        files = request.files.getlist('files')
-        
-        if not files or all(file.filename == '' for file in files):
-            flash('No files selected')
-            return redirect(request.url)
-        
-        # Process uploaded files
-        all_articles = []
-        processed_files = []
-        
-        for file in files:
-            if file and file.filename != '' and allowed_file(file.filename):
-                try:
-                    # Secure the filename
-                    filename = secure_filename(file.filename)
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    filename = f"{timestamp}_{filename}"
-                    
-                    # Save the file
-                    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                    file.save(file_path)
-                    
-                    # Process the file
-                    articles = file_processor.process_file(file_path, file.filename)
-                    
-                    if articles:
-                        all_articles.extend(articles)
-                        processed_files.append({
-                            'filename': file.filename,
-                            'articles_count': len(articles)
-                        })
-                        print(f"Processed {file.filename}: {len(articles)} articles extracted")
-                    else:
-                        flash(f"No data could be extracted from {file.filename}")
-                    
-                    # Clean up the uploaded file
-                    try:
-                        os.remove(file_path)
-                    except:
-                        pass
-                        
-                except Exception as e:
-                    print(f"Error processing file {file.filename}: {str(e)}")
-                    flash(f"Error processing {file.filename}: {str(e)}")
-            else:
-                flash(f"File type not allowed: {file.filename}")
-        
-        if not all_articles:
-            flash("No articles could be extracted from the uploaded files")
-            return redirect(request.url)
-        
-        # Analyze the extracted articles
+def _update_upload_job(job_id, **fields):
+    """Persist job fields so any web worker can report progress."""
+    try:
+        job = db.session.get(UploadJob, job_id)
+        if job is None:
+            return
+        for key, value in fields.items():
+            setattr(job, key, value)
+        job.updated_at = datetime.utcnow()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        app.logger.warning("Error updating upload job %s: %s", job_id, e)
+
+def release_upload_sources(buffered_files):
+    """Remove temp files of uploads that spilled to disk; in-memory ones need nothing."""
+    for source, _ in buffered_files:
+        if isinstance(source, str):
+            try:
+                os.remove(source)
+            except OSError as e:
+                app.logger.warning("Error removing upload temp file %s: %s", source, e)
+
+def run_upload_job(job_id, buffered_files, messages):
+    """Background half of /upload: parse -> analyze -> narrative -> SharedResult."""
+    with app.app_context():
+        progress = {
+            'files': [{'filename': name, 'status': 'pending'} for _, name in buffered_files],
+            'messages': list(messages)
+        }
         try:
+            _update_upload_job(job_id, status='running', stage='processing_files', progress=json.dumps(progress))
+            files_done = 0
+            
+            def on_result(index, result):
+                nonlocal files_done
+                files_done += 1
+                progress['files'][index].update(
+                    status='error' if result['error'] else 'done',
+                    articles_count=len(result['articles']),
+                    seconds=result['seconds']
+                )
+                _update_upload_job(job_id, files_done=files_done, progress=json.dumps(progress))
+            
+            started = datetime.now()
+            results = upload_pipeline.process(buffered_files, on_result=on_result)
+            app.logger.info("Upload job %s: processed %d files in %.2fs", job_id, len(buffered_files),
+                            (datetime.now() - started).total_seconds())
+            
+            # Merge in upload order
+            all_articles = []
+            processed_files = []
+            for (_, original_filename), result in zip(buffered_files, results):
+                articles = result['articles']
+                if result['error']:
+                    progress['messages'].append(f"Error processing {original_filename}: {result['error']}")
+                elif articles:
+                    all_articles.extend(articles)
+                    processed_files.append({
+                        'filename': original_filename,
+                        'articles_count': len(articles),
+                        'seconds': result['seconds'],
+                        'parse_seconds': result['parse_seconds'],
+                        'extract_seconds': result['extract_seconds']
+                    })
+                    app.logger.debug("Processed %s: %d articles extracted in %.2fs", original_filename, len(articles), result['seconds'])
+                else:
+                    progress['messages'].append(f"No data could be extracted from {original_filename}")
+            
+            if not all_articles:
+                progress['messages'].append("No articles could be extracted from the uploaded files")
+                _update_upload_job(job_id, status='failed', stage='failed', progress=json.dumps(progress),
+                                   error="No articles could be extracted from the uploaded files")
+                return
+            
+            _update_upload_job(job_id, stage='analyzing', progress=json.dumps(progress))
             # Use a generic query for file-based analysis
             query = "Local File Analysis"
-            analysis = analyze_articles(all_articles, query)
+            # Sentiment and topics run alongside the narrative call
+            analysis_future = pipeline_executor.submit(analyze_articles, all_articles, query)
             
             # Generate analysis text
             def summarize_articles(articles):
@@ -523,20 +848,29 @@ Key points to address:
 
 Articles: {json.dumps(summarized_articles[:50])}"""
             
-            response = anthropic.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=1000,
-                messages=[{
-                    "role": "user",
-                    "content": analysis_prompt
-                }]
-            )
+            try:
+                with STAGE_SECONDS.timer(stage="narrative"):
+                    response = anthropic.messages.create(
+                        model="claude-3-haiku-20240307",
+                        max_tokens=1000,
+                        messages=[{
+                            "role": "user",
+                            "content": analysis_prompt
+                        }]
+                    )
+            except Exception:
+                LLM_ERRORS.inc(purpose="narrative")
+                raise
+            record_llm_usage("narrative", getattr(response, "usage", None))
             
             # Simple formatting for the response
             analysis_text = response.content[0].text.replace('\n\n', '</p><p>')
             analysis_text = '<p>' + analysis_text + '</p>'
             analysis_text = Markup(analysis_text)
             
+            analysis = analysis_future.result()
+            _update_upload_job(job_id, stage='saving')
+            
             # Create form data for template compatibility
             form_data = {
                 'analysis_type': 'file_upload',
@@ -556,38 +890,109 @@ Articles: {json.dumps(summarized_articles[:50])}"""
                 "articles2": [],
                 "form_data": form_data
             }
-            slug = uuid.uuid4().hex[:10]
-            try:
-                rec = SharedResult(slug=slug, payload=json.dumps(payload, default=str))
-                db.session.add(rec)
-                db.session.commit()
-            except Exception as e:
-                print(f"Error saving media upload share result to DB: {e}")
-            share_url = (request.url_root.rstrip('/') + f"/results/{slug}")
-            return render_template(
-                "result.html",
-                query1=payload["query1"],
-                query2=None,
-                enhanced_query1=payload["enhanced_query1"],
-                enhanced_query2=None,
-                textual_analysis=analysis_text,
-                analysis1=analysis,
-                analysis2=None,
-                articles1=all_articles,
-                articles2=[],
-                request=type('obj', (object,), {'form': form_data}),
-                ga_measurement_id=GA_MEASUREMENT_ID,
-                share_url=share_url,
-                slug=slug
-            )
-            
+            slug = _save_shared_result(payload)
+            _update_upload_job(job_id, status='done', stage='done', slug=slug, progress=json.dumps(progress))
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error("Error in upload job %s: %s", job_id, e)
+            _update_upload_job(job_id, status='failed', stage='failed', error=f"Error analyzing data: {str(e)}")
+        finally:
+            release_upload_sources(buffered_files)
+
+@app.route("/upload", methods=["GET", "POST"])
+def upload_files():
+    """Handle file uploads; processing runs as a background job the page polls."""
+    wants_json = request.accept_mimetypes.best == 'application/json'
+    
+    def reject(message):
+        if wants_json:
+            return jsonify({"ok": False, "error": message}), 400
+        flash(message)
+        return redirect(request.url)
+    
+    if request.method == "POST":
+        # Check if files were uploaded
+        if 'files' not in request.files:
+            return reject('No files selected')
+        
+        files = request.files.getlist('files')
+        
+        if not files or all(file.filename == '' for file in files):
+            return reject('No files selected')
+        
+        # Buffer uploads in memory (large ones spill to a temp file); the job processes them after the response is sent
+        buffered_files = []
+        messages = []
+        
+        for file in files:
+            if file and file.filename != '' and allowed_file(file.filename):
+                try:
+                    buffered_files.append((buffer_upload(file.stream), file.filename))
+                        
+                except Exception as e:
+                    app.logger.warning("Error reading file %s: %s", file.filename, e)
+                    messages.append(f"Error processing {file.filename}: {str(e)}")
+            else:
+                messages.append(f"File type not allowed: {file.filename}")
+        
+        if not buffered_files:
+            return reject('; '.join(messages) if messages else 'No files selected')
+        
+        job_id = uuid.uuid4().hex
+        try:
+            db.session.add(UploadJob(id=job_id, files_total=len(buffered_files)))
+            db.session.commit()
         except Exception as e:
-            print(f"Error analyzing articles: {str(e)}")
-            flash(f"Error analyzing data: {str(e)}")
-            return redirect(request.url)
+            db.session.rollback()
+            app.logger.error("Error creating upload job: %s", e)
+            release_upload_sources(buffered_files)
+            return reject("Unable to start processing, please try again")
+        upload_job_executor.submit(run_upload_job, job_id, buffered_files, messages)
+        
+        if wants_json:
+            return jsonify({
+                "ok": True,
+                "job_id": job_id,
+                "status_url": url_for('upload_job_status', job_id=job_id)
+            }), 202
+        return redirect(url_for('upload_files', job=job_id))
     
     return render_template("upload.html", ga_measurement_id=GA_MEASUREMENT_ID)
 
+@app.route("/api/upload_jobs/<job_id>")
+def upload_job_status(job_id):
+    """Report an upload job's stage and per-file progress."""
+    job = db.session.get(UploadJob, job_id)
+    if not job:
+        return jsonify({"ok": False, "error": "Job not found"}), 404
+    
+    status, stage, error = job.status, job.stage, job.error
+    # A job whose worker died (deploy, OOM) stops updating; report it instead of polling forever
+    if status in ('queued', 'running') and datetime.utcnow() - job.updated_at > timedelta(seconds=UPLOAD_JOB_TIMEOUT):
+        status, stage, error = 'failed', 'failed', "Processing timed out, please try again"
+    
+    try:
+        progress = json.loads(job.progress) if job.progress else {}
+    except Exception:
+        progress = {}
+    return jsonify({
+        "ok": True,
+        "job_id": job.id,
+        "status": status,
+        "stage": stage,
+        "files_total": job.files_total,
+        "files_done": job.files_done,
+        "files": progress.get('files', []),
+        "messages": progress.get('messages', []),
+        "error": error,
+        "result_url": url_for('view_shared_result', slug=job.slug) if job.slug else None
+    })
+
+def render_timed(template_name, **context):
+    """render_template, timed as the "render" stage."""
+    with STAGE_SECONDS.timer(stage="render"):
+        return render_template(template_name, **context)
+
 @app.route("/", methods=["GET", "POST"])
 def index():
     # Allow POST from the search form to avoid 405 Method Not Allowed
@@ -612,13 +1017,14 @@ def index():
 
         # If live news API isn't configured, try RSS fallback for a useful demo result
         if not NEWS_API_KEY:
-            articles1 = fetch_rss_articles(query1, from_date1, to_date1, max_items=60)
-            articles2 = fetch_rss_articles(query2, from_date2, to_date2, max_items=60) if query2 else []
+            rss1 = pipeline_executor.submit(fetch_rss_articles, query1, from_date1, to_date1, max_items=60)
+            rss2 = pipeline_executor.submit(fetch_rss_articles, query2, from_date2, to_date2, max_items=60) if query2 else None
+            articles1 = rss1.result()
+            articles2 = rss2.result() if rss2 else []
 
             if articles1 or articles2:
                 try:
-                    analysis1 = analyze_articles(articles1, query1)
-                    analysis2 = analyze_articles(articles2, query2) if query2 else None
+                    analysis1, analysis2 = analyze_query_pair(articles1, query1, articles2, query2)
                     info_html = Markup(
                         "<p><strong>Note:</strong> Using RSS fallback (no NEWS_API_KEY set). "
                         "Results are for demonstration and may be limited compared to premium sources.</p>"
@@ -641,17 +1047,11 @@ def index():
                         "articles1": articles1, "articles2": articles2,
                         "form_data": form_data
                     }
-                    slug = uuid.uuid4().hex[:10]
-                    try:
-                        rec = SharedResult(slug=slug, payload=json.dumps(payload, default=str))
-                        db.session.add(rec)
-                        db.session.commit()
-                    except Exception as e:
-                        print(f"Error saving media share result to DB: {e}")
+                    slug = _save_shared_result(payload)
                     share_url = (request.url_root.rstrip('/') + f"/results/{slug}")
                     return redirect(share_url)
                 except Exception as e:
-                    print(f"Error analyzing RSS fallback articles: {e}")
+                    app.logger.warning("Error analyzing RSS fallback articles: %s", e)
 
             # If RSS also found nothing, render a graceful guidance message
             info_html = Markup(
@@ -679,7 +1079,7 @@ def index():
                     "avg_sentiment": 0,
                 }
 
-            return render_template(
+            return render_timed(
                 "result.html",
                 query1=query1,
                 query2=query2,
@@ -699,26 +1099,18 @@ def index():
         sources1 = (request.form.get("source1") or "").strip() or None
         sources2 = (request.form.get("source2") or "").strip() if query2 else None
 
-        try:
-            articles1 = fetch_news_api_articles(query1, from_date1, to_date1, language=language1, sources=sources1, page_size=60)
-            articles2 = fetch_news_api_articles(query2, from_date2, to_date2, language=language2, sources=sources2, page_size=60) if query2 else []
-        except Exception as e:
-            print(f"NewsAPI error: {e}")
-            articles1, articles2 = [], []
-
-        # Fallback to RSS if NewsAPI returns nothing
-        if not articles1:
-            articles1 = fetch_rss_articles(query1, from_date1, to_date1, max_items=60)
-        if query2 and not articles2:
-            articles2 = fetch_rss_articles(query2, from_date2, to_date2, max_items=60)
+        # Fetch both queries concurrently; each falls back to RSS if NewsAPI returns nothing
+        fetch1 = pipeline_executor.submit(fetch_live_articles, query1, from_date1, to_date1, language1, sources1)
+        fetch2 = pipeline_executor.submit(fetch_live_articles, query2, from_date2, to_date2, language2, sources2) if query2 else None
+        articles1 = fetch1.result()
+        articles2 = fetch2.result() if fetch2 else []
 
         if not articles1 and (not query2 or not articles2):
             flash("No results found for the selected range and terms. Try broadening the date range or simplifying the query.")
             return render_template("index.html", ga_measurement_id=GA_MEASUREMENT_ID)
 
         # Analyze and render
-        analysis1 = analyze_articles(articles1, query1)
-        analysis2 = analyze_articles(articles2, query2) if query2 else None
+        analysis1, analysis2 = analyze_query_pair(articles1, query1, articles2, query2)
 
         # Persist sharable result with short slug
         form_data = {
@@ -736,13 +1128,12 @@ def index():
             "articles1": articles1, "articles2": (articles2 or []),
             "form_data": form_data
         }
-        slug = uuid.uuid4().hex[:10]
         try:
-            rec = SharedResult(slug=slug, payload=json.dumps(payload, default=str))
-            db.session.add(rec)
-            db.session.commit()
+            slug = _save_shared_result(payload)
         except Exception as e:
-            print(f"Error saving media share result to DB: {e}")
+            app.logger.error("Error saving media share result to DB: %s", e)
+            flash("Unable to save this analysis, please try again")
+            return render_template("index.html", ga_measurement_id=GA_MEASUREMENT_ID)
         share_url = (request.url_root.rstrip('/') + f"/results/{slug}")
         return redirect(share_url)
 
@@ -757,7 +1148,7 @@ def view_shared_result(slug):
         flash("Shared result not found or expired")
         return render_template("index.html", ga_measurement_id=GA_MEASUREMENT_ID)
     try:
-        data = json.loads(rec.payload)
+        data = _load_shared_result(rec)
     except Exception:
         flash("Unable to load shared result")
         return render_template("index.html", ga_measurement_id=GA_MEASUREMENT_ID)
@@ -769,7 +1160,7 @@ def view_shared_result(slug):
     ta = data.get("textual_analysis")
     ta_markup = Markup(ta) if ta else None
 
-    return render_template(
+    return render_timed(
         "result.html",
         query1=data.get("query1"),
         query2=data.get("query2"),
@@ -795,24 +1186,17 @@ def email_summary():
         if not email or not slug:
             return jsonify({"ok": False, "error": "Missing email or slug"}), 400
 
-        rec = SharedResult.query.filter_by(slug=slug).first()
+        rec = SharedResult.query.options(*SUMMARY_ONLY).filter_by(slug=slug).first()
         if not rec:
             return jsonify({"ok": False, "error": "Result not found"}), 404
 
-        payload = {}
-        try:
-            payload = json.loads(rec.payload)
-        except Exception:
-            pass
-
-        query1 = payload.get("query1") or "Analysis"
-        query2 = payload.get("query2")
-        a1 = payload.get("analysis1") or {}
-        a2 = payload.get("analysis2") or {}
-        total1 = a1.get("total_articles", 0) or 0
-        sent1 = a1.get("avg_sentiment", 0) or 0
-        total2 = a2.get("total_articles", 0) or 0
-        sent2 = a2.get("avg_sentiment", 0) or 0
+        summary = _shared_result_summary(rec)
+        query1 = summary["query1"] or "Analysis"
+        query2 = summary["query2"]
+        total1 = summary["total_articles1"]
+        sent1 = summary["avg_sentiment1"]
+        total2 = summary["total_articles2"]
+        sent2 = summary["avg_sentiment2"]
 
         share_url = request.url_root.rstrip('/') + f"/results/{slug}"
         summary_lines = [
@@ -826,45 +1210,35 @@ def email_summary():
         if query2:
             summary_lines.append(f"- {query2}: {total2} articles, Avg Sentiment {sent2:.2f}")
 
-        topics = (a1.get("topics") or [])[:5]
+        topics = summary["topics"][:5]
         if topics:
             summary_lines.append("")
             summary_lines.append("Top Topics:")
-            summary_lines.append(", ".join([t.get("topic") for t in topics if isinstance(t, dict) and t.get("topic")]))
+            summary_lines.append(", ".join(topics))
 
         text_body = "\n".join(summary_lines)
 
-        # Persist lead capture
+        # Lead and email are committed together; the outbox dispatcher sends it
+        sg_key = os.environ.get("SENDGRID_API_KEY")
         try:
-            lead = LeadCapture(email=email, slug=slug, app_name="media_analyzer")
-            db.session.add(lead)
+            db.session.add(LeadCapture(email=email, slug=slug, app_name="media_analyzer"))
+            if sg_key:
+                outbox.enqueue("email", {
+                    "to": email,
+                    "subject": f"Media Analysis: {query1}" + (f" vs {query2}" if query2 else ""),
+                    "text": text_body,
+                })
             db.session.commit()
         except Exception as e:
-            print(f"Lead save error: {e}")
+            db.session.rollback()
+            app.logger.error("Lead save error: %s", e)
+            return jsonify({"ok": False, "error": "Could not save your request"}), 500
 
-        sg_key = os.environ.get("SENDGRID_API_KEY")
         if not sg_key:
             return jsonify({"ok": True, "sent": False, "message": "SENDGRID_API_KEY not set; lead captured only"})
-
-        try:
-            from sendgrid import SendGridAPIClient
-            from sendgrid.helpers.mail import Mail
-            msg = Mail(
-                from_email=("no-reply@innatec3.com", "innate c3"),
-                to_emails=[email],
-                subject=f"Media Analysis: {query1}" + (f" vs {query2}" if query2 else ""),
-                plain_text_content=text_body,
-                html_content="<pre style='font-family:monospace'>" + html.escape(text_body) + "</pre>"
-            )
-            sg = SendGridAPIClient(sg_key)
-            resp = sg.send(msg)
-            print("SendGrid response:", resp.status_code)
-            return jsonify({"ok": True, "sent": True})
-        except Exception as e:
-            print("SendGrid error:", e)
-            return jsonify({"ok": True, "sent": False, "message": "Email not sent; lead captured"}), 200
+        return jsonify({"ok": True, "sent": False, "queued": True})
     except Exception as e:
-        print("email_summary error:", e)
+        app.logger.error("email_summary error: %s", e)
         return jsonify({"ok": False, "error": "Server error"}), 500
 
 @app.route("/api/lead", methods=["POST"])
@@ -876,44 +1250,35 @@ def api_lead():
         action = (data.get("action") or "").strip()
         app_name = (data.get("app_name") or "media_analyzer").strip()
         extra_payload = {"action": action} if action else {}
+        webhook = os.environ.get("LEADS_WEBHOOK_URL")
         try:
             lead = LeadCapture(email=email, slug=slug, app_name=app_name, extra=(json.dumps(extra_payload) if extra_payload else None))
             db.session.add(lead)
+            # Optional webhook forward to Google Sheets/Airtable bridge, delivered by the outbox
+            if webhook:
+                outbox.enqueue("webhook", {"url": webhook, "body": {"email": email, "slug": slug, "action": action, "app": app_name}})
             db.session.commit()
         except Exception as e:
-            print(f"Lead save error (/api/lead): {e}")
-        # Optional webhook forward to Google Sheets/Airtable bridge if configured
-        webhook = os.environ.get("LEADS_WEBHOOK_URL")
-        if webhook:
-            try:
-                requests.post(webhook, json={"email": email, "slug": slug, "action": action, "app": app_name}, timeout=5)
-            except Exception as e:
-                print(f"Webhook post error: {e}")
+            db.session.rollback()
+            app.logger.error("Lead save error (/api/lead): %s", e)
         return jsonify({"ok": True})
     except Exception as e:
-        print("api_lead error:", e)
+        app.logger.error("api_lead error: %s", e)
         return jsonify({"ok": False, "error": "Server error"}), 500
 
-@app.route("/og/<slug>.png")
-def og_image(slug):
-    try:
-        rec = SharedResult.query.filter_by(slug=slug).first()
-        data = json.loads(rec.payload) if rec else {}
-        query1 = data.get("query1") or "Media Analysis"
-        query2 = data.get("query2")
-        a1 = data.get("analysis1") or {}
-        total = a1.get("total_articles", 0) or 0
-        avg = a1.get("avg_sentiment", 0) or 0
-        dr = (a1.get("date_range") or {})
-        date_start = dr.get("start") or ""
-        date_end = dr.get("end") or ""
-    except Exception:
-        query1 = "Media Analysis"
-        query2 = None
-        total = 0
-        avg = 0
-        date_start = ""
-        date_end = ""
+# Bump when the card layout changes so stored OG images are re-rendered
+OG_IMAGE_VERSION = 1
+OG_IMAGE_MAX_AGE = int(os.environ.get("OG_IMAGE_MAX_AGE", 7 * 24 * 3600))
+OG_IMAGE_MISSING_MAX_AGE = 300  # generic card for unknown slugs, which may be saved shortly
+
+def render_og_image(summary):
+    """1200x630 PNG bytes for a result summary; an empty summary gives the generic card."""
+    query1 = summary.get("query1") or "Media Analysis"
+    query2 = summary.get("query2")
+    total = summary.get("total_articles1") or 0
+    avg = summary.get("avg_sentiment1") or 0
+    date_start = summary.get("date_start") or ""
+    date_end = summary.get("date_end") or ""
 
     title = f'{query1} vs {query2}' if query2 else query1
 
@@ -940,38 +1305,105 @@ def og_image(slug):
 
     buf = io.BytesIO()
     img.save(buf, format="PNG")
-    buf.seek(0)
-    return send_file(buf, mimetype="image/png")
+    return buf.getvalue()
+
+def _og_etag(png):
+    return hashlib.sha256(png).hexdigest()[:32]
+
+def _store_og_image(slug, summary):
+    """Render a result's OG image and save it to og_images; returns the OgImage.
+    
+    If the save fails (e.g. a concurrent request stored it first) the
+    rendered image is still returned so the caller can serve it.
+    """
+    png = render_og_image(summary)
+    image = OgImage(slug=slug, version=OG_IMAGE_VERSION, etag=_og_etag(png), png=png)
+    try:
+        db.session.merge(image)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        app.logger.warning("Error storing OG image for %s: %s", slug, e)
+    return image
+
+_default_og_png = None
+
+def _default_og_image_response():
+    """The generic card, rendered once per process, for unknown slugs and errors."""
+    global _default_og_png
+    if _default_og_png is None:
+        _default_og_png = render_og_image({})
+    return _og_image_response(_og_etag(_default_og_png), lambda: _default_og_png, max_age=OG_IMAGE_MISSING_MAX_AGE)
+
+def _og_image_response(etag, load_png, max_age=OG_IMAGE_MAX_AGE):
+    """PNG response with caching headers, or 304 when the client's copy is current.
+    
+    load_png is only called for a full response, so a revalidation never
+    reads the image bytes.
+    """
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(load_png(), mimetype="image/png")
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    return response
+
+@app.route("/og/<slug>.png")
+def og_image(slug):
+    """Share card for a result, rendered once and served from og_images.
+    
+    Warm requests read the stored PNG (or just its ETag, for a conditional
+    GET) without touching the payload or PIL.
+    """
+    try:
+        image = OgImage.query.options(defer(OgImage.png)).filter_by(slug=slug).first()
+        if image is None or image.version != OG_IMAGE_VERSION:
+            rec = SharedResult.query.options(*SUMMARY_ONLY).filter_by(slug=slug).first()
+            if rec is None:
+                return _default_og_image_response()
+            image = _store_og_image(slug, _shared_result_summary(rec))
+        return _og_image_response(image.etag, lambda: image.png)
+    except Exception as e:
+        app.logger.warning("Error serving OG image for %s: %s", slug, e)
+        return _default_og_image_response()
+
+EXAMPLES_PAGE_SIZE = 12
 
 @app.route("/examples")
 def examples():
-    """Public gallery of recent shared media analyses."""
-    # Fetch latest 12 shared results
+    """Public gallery of shared media analyses, newest first.
+    
+    Pages are keyset-paginated on the primary key (?before=<id of the last
+    card>), so every page is one index range scan over the summary columns
+    however many results exist.
+    """
+    before = request.args.get("before", type=int)
     try:
-        recs = SharedResult.query.order_by(SharedResult.created_at.desc()).limit(12).all()
+        query = SharedResult.query.options(*SUMMARY_ONLY)
+        if before:
+            query = query.filter(SharedResult.id < before)
+        # One extra row tells us whether there is an older page
+        recs = query.order_by(SharedResult.id.desc()).limit(EXAMPLES_PAGE_SIZE + 1).all()
     except Exception as e:
-        print(f"Error loading examples: {e}")
+        app.logger.warning("Error loading examples: %s", e)
         recs = []
+    next_cursor = recs[EXAMPLES_PAGE_SIZE - 1].id if len(recs) > EXAMPLES_PAGE_SIZE else None
+    recs = recs[:EXAMPLES_PAGE_SIZE]
 
     cards = []
     for rec in recs:
-        try:
-            data = json.loads(rec.payload)
-        except Exception:
-            data = {}
-
-        query1 = data.get("query1") or "Analysis"
-        query2 = data.get("query2")
+        summary = _shared_result_summary(rec)
+        query1 = summary["query1"] or "Analysis"
+        query2 = summary["query2"]
         title = f'{query1} vs {query2}' if query2 else query1
 
-        a1 = data.get("analysis1") or {}
-        total_articles = a1.get("total_articles", 0) or 0
-        avg_sent = a1.get("avg_sentiment", 0) or 0
-        dr = (a1.get("date_range") or {})
-        date_start = dr.get("start")
-        date_end = dr.get("end")
-        topics = (a1.get("topics") or [])[:3]
-        topics_list = [t.get("topic") for t in topics if isinstance(t, dict) and t.get("topic")]
+        total_articles = summary["total_articles1"]
+        avg_sent = summary["avg_sentiment1"]
+        date_start = summary["date_start"]
+        date_end = summary["date_end"]
+        topics_list = summary["topics"][:3]
 
         share_url = (request.url_root.rstrip('/') + f"/results/{rec.slug}")
 
@@ -987,7 +1419,27 @@ def examples():
             "created_at": rec.created_at.isoformat() if rec.created_at else None
         })
 
-    return render_template("examples.html", cards=cards, ga_measurement_id=GA_MEASUREMENT_ID)
+    return render_timed("examples.html", cards=cards, next_cursor=next_cursor, paged=bool(before),
+                        ga_measurement_id=GA_MEASUREMENT_ID)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=request.endpoint or "unmatched",
+                                method=request.method, status=response.status_code)
+    return response
+
+@app.route("/metrics")
+def metrics():
+    """Prometheus scrape endpoint; set METRICS_TOKEN to require it as a bearer token."""
+    if METRICS_TOKEN and not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {METRICS_TOKEN}"):
+        return app.response_class("Unauthorized\n", status=401, mimetype="text/plain")
+    return app.response_class(REGISTRY.render(), content_type=CONTENT_TYPE)
 
 
 if __name__ == "__main__":
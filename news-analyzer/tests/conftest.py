@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The app imports its helpers as utils.<module> from the news-analyzer directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
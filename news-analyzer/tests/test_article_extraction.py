@@ -0,0 +1,68 @@
+import json
+import re
+from types import SimpleNamespace
+
+from utils.article_extraction import ArticleExtractor
+
+
+class FakeClaude:
+    """Stands in for anthropic.Anthropic: lists one item per "Headline N" line in the prompt.
+
+    Replies for prompts with more than max_items headlines are cut off mid-array
+    with stop_reason "max_tokens", as a reply over the output cap would be.
+    """
+
+    def __init__(self, max_items=None):
+        self.max_items = max_items
+        self.calls = []
+        self.messages = SimpleNamespace(create=self.create)
+
+    def create(self, **kwargs):
+        text = kwargs["messages"][0]["content"].split("Text:\n", 1)[1]
+        titles = re.findall(r"^Headline \d+$", text, re.MULTILINE)
+        self.calls.append(titles)
+        reply = json.dumps([{"title": title, "source": "Paper", "date": None, "description": ""} for title in titles])
+        stop_reason = "end_turn"
+        if self.max_items is not None and len(titles) > self.max_items:
+            reply, stop_reason = reply[:len(reply) // 2], "max_tokens"
+        return SimpleNamespace(content=[SimpleNamespace(text=reply)], stop_reason=stop_reason,
+                               usage=SimpleNamespace(input_tokens=10, output_tokens=5))
+
+
+def pages(n):
+    return ["\n\n".join(f"Headline {i}\nBody of story {i}." for i in range(start, start + 4))
+            for start in range(0, n, 4)]
+
+
+def titles(items):
+    return [item["title"] for item in items]
+
+
+def test_chunk_is_extracted_in_one_call():
+    client = FakeClaude()
+    items, info = ArticleExtractor(client).extract(pages(8))
+
+    assert titles(items) == [f"Headline {i}" for i in range(8)]
+    assert len(client.calls) == 1
+    assert info["failed_chunks"] == 0
+
+
+def test_truncated_reply_is_split_and_retried():
+    client = FakeClaude(max_items=4)
+    items, info = ArticleExtractor(client).extract(pages(8))
+
+    assert titles(items) == [f"Headline {i}" for i in range(8)]
+    assert [len(call) for call in client.calls] == [8, 4, 4]
+    assert (info["chunks"], info["failed_chunks"]) == (1, 0)
+
+
+def test_chunk_still_truncated_after_splitting_counts_as_failed():
+    client = FakeClaude(max_items=1)
+    extractor = ArticleExtractor(client)
+    items, info = extractor.extract(pages(8))
+
+    # Halved twice: quarters of two headlines each are still over the cap
+    assert [len(call) for call in client.calls] == [8, 4, 2, 2, 4, 2, 2]
+    assert items == []
+    assert info["failed_chunks"] == info["chunks"] == 1
+    assert extractor.stats()["failed_chunks"] == 1
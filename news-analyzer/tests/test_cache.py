@@ -0,0 +1,101 @@
+import sqlite3
+
+import pytest
+
+from utils import cache as cache_module
+from utils.cache import SQLiteCache, acquire_lease
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "cache.db")
+
+
+def test_lease_is_exclusive_until_it_expires(path, clock):
+    assert acquire_lease(path, "sweep", "worker-a", 60)
+    assert not acquire_lease(path, "sweep", "worker-b", 60)
+
+    clock.now += 59
+    assert not acquire_lease(path, "sweep", "worker-b", 60)
+
+    clock.now += 1
+    assert acquire_lease(path, "sweep", "worker-b", 60)
+    assert not acquire_lease(path, "sweep", "worker-a", 60)
+
+
+def test_holder_renews_its_lease(path, clock):
+    assert acquire_lease(path, "sweep", "worker-a", 60)
+    clock.now += 50
+    assert acquire_lease(path, "sweep", "worker-a", 60)
+
+    # Renewed at +50, so still held at +100
+    clock.now += 50
+    assert not acquire_lease(path, "sweep", "worker-b", 60)
+    clock.now += 10
+    assert acquire_lease(path, "sweep", "worker-b", 60)
+
+
+def test_leases_are_independent_by_name(path, clock):
+    assert acquire_lease(path, "sweep", "worker-a", 60)
+    assert acquire_lease(path, "outbox", "worker-b", 60)
+
+
+def test_lease_error_means_not_held(tmp_path):
+    assert not acquire_lease(str(tmp_path), "sweep", "worker-a", 60)
+
+
+def shared_stats(path, namespace):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT hits, misses FROM cache_stats WHERE namespace = ?", (namespace,)).fetchone()
+
+
+def test_lookups_are_flushed_in_batches(path):
+    cache = SQLiteCache(path, "ns", flush_every=3, flush_interval=3600)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.get("missing") is None
+    assert shared_stats(path, "ns") is None
+
+    cache.get("a")
+    assert shared_stats(path, "ns") == (2, 1)
+
+
+def test_buffered_touches_keep_lru_order(path, clock):
+    cache = SQLiteCache(path, "ns", max_entries=2, flush_every=100, flush_interval=3600)
+    cache.set("old", 1)
+    clock.now += 1
+    cache.set("new", 2)
+    clock.now += 1
+    cache.get("old")
+
+    # The touch is written with the next write, before eviction picks a victim
+    clock.now += 1
+    cache.set("newest", 3)
+    assert set(cache.get_many(["old", "new", "newest"])) == {"old", "newest"}
+
+
+def test_stats_include_unflushed_lookups(path):
+    cache = SQLiteCache(path, "ns", flush_every=100, flush_interval=3600)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("b")
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+
+from utils.newsapi import NewsAPIPaginator
+
+
+class FakeHttp:
+    """Serves a NewsAPI /everything result of `total` articles, paged as requested."""
+
+    def __init__(self, total):
+        self.total = total
+        self.requests = []
+
+    def get(self, url, params):
+        self.requests.append((params["page"], params["pageSize"]))
+        start = (params["page"] - 1) * params["pageSize"]
+        articles = [{"url": f"https://example.com/{i}"} for i in range(start, min(self.total, start + params["pageSize"]))]
+        data = {"status": "ok", "totalResults": self.total, "articles": articles}
+        return SimpleNamespace(status_code=200, json=lambda: data)
+
+
+def test_small_budget_requests_a_page_of_that_size():
+    http = FakeHttp(total=500)
+    articles, info = NewsAPIPaginator(http, max_articles=60).fetch({"q": "x"})
+
+    assert len(articles) == 60
+    assert http.requests == [(1, 60)]
+    assert info["stopped"] == "budget"
+
+
+def test_large_budget_pages_at_the_api_maximum():
+    http = FakeHttp(total=500)
+    articles, info = NewsAPIPaginator(http, max_workers=2).fetch({"q": "x"}, max_articles=250)
+
+    assert [a["url"] for a in articles] == [f"https://example.com/{i}" for i in range(250)]
+    assert sorted(http.requests) == [(1, 100), (2, 100), (3, 100)]
+    assert info["pages"] == 3
@@ -0,0 +1,199 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+from utils import outbox as outbox_module
+from utils.outbox import DEAD, PENDING, SENDING, SENT, Outbox
+
+db = SQLAlchemy()
+
+
+# Same columns as app.OutboxMessage, without importing the app
+class OutboxMessage(db.Model):
+    __tablename__ = 'outbox_messages'
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(32), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'outbox.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+
+
+@pytest.fixture(autouse=True)
+def no_jitter(monkeypatch):
+    # Retry delays use the top of the jitter range so they can be asserted exactly
+    monkeypatch.setattr(outbox_module.random, "uniform", lambda low, high: high)
+
+
+class Handler:
+    """Records payloads; raises for the first `failures` calls."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = []
+
+    def __call__(self, payload):
+        self.calls.append(payload)
+        if len(self.calls) <= self.failures:
+            raise RuntimeError(f"boom {len(self.calls)}")
+
+
+def make_outbox(handler, **kwargs):
+    kwargs.setdefault("backoff", 30)
+    kwargs.setdefault("max_backoff", 3600)
+    return Outbox(db, OutboxMessage, handlers={"email": handler}, **kwargs)
+
+
+def enqueue(outbox, payload=None):
+    message = outbox.enqueue("email", payload or {"to": "a@example.com"})
+    db.session.commit()
+    return message.id
+
+
+def make_due(message_id):
+    """Move a message's next attempt into the past, as if its backoff had elapsed."""
+    message = db.session.get(OutboxMessage, message_id)
+    message.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+
+def test_enqueue_rejects_unknown_kind(app):
+    with pytest.raises(ValueError):
+        make_outbox(Handler()).enqueue("sms", {})
+
+
+def test_dispatch_sends_due_message_once(app):
+    handler = Handler()
+    outbox = make_outbox(handler)
+    message_id = enqueue(outbox, {"to": "a@example.com"})
+
+    assert outbox.dispatch() == (1, 0)
+    assert outbox.dispatch() == (0, 0)
+
+    message = db.session.get(OutboxMessage, message_id)
+    assert handler.calls == [{"to": "a@example.com"}]
+    assert message.status == SENT
+    assert message.attempts == 1
+    assert message.sent_at is not None
+    assert message.last_error is None
+
+
+def test_claim_is_won_by_one_worker(app):
+    outbox = make_outbox(Handler())
+    message_id = enqueue(outbox)
+    seen = db.session.get(OutboxMessage, message_id).next_attempt_at
+    now = datetime.utcnow()
+
+    # Two workers that read the same due row: only the first update matches it
+    assert outbox._claim(message_id, seen, now) is True
+    assert make_outbox(Handler())._claim(message_id, seen, now) is False
+
+    message = db.session.get(OutboxMessage, message_id)
+    assert message.status == SENDING
+    assert message.attempts == 1
+    assert message.next_attempt_at == now + timedelta(seconds=outbox.lease_seconds)
+
+
+def test_expired_lease_is_reclaimed(app):
+    handler = Handler()
+    outbox = make_outbox(handler, lease_seconds=60)
+    message_id = enqueue(outbox)
+    seen = db.session.get(OutboxMessage, message_id).next_attempt_at
+    # A worker claimed the message and died before delivering it
+    assert outbox._claim(message_id, seen, datetime.utcnow() - timedelta(seconds=120))
+
+    assert outbox.dispatch() == (1, 0)
+    message = db.session.get(OutboxMessage, message_id)
+    assert message.status == SENT
+    assert message.attempts == 2
+
+
+def test_unexpired_lease_is_left_alone(app):
+    outbox = make_outbox(Handler(), lease_seconds=60)
+    message_id = enqueue(outbox)
+    seen = db.session.get(OutboxMessage, message_id).next_attempt_at
+    assert outbox._claim(message_id, seen, datetime.utcnow())
+
+    assert outbox.dispatch() == (0, 0)
+    assert db.session.get(OutboxMessage, message_id).status == SENDING
+
+
+def test_failure_is_retried_with_exponential_backoff(app):
+    handler = Handler(failures=2)
+    outbox = make_outbox(handler, backoff=30, max_attempts=5)
+    message_id = enqueue(outbox)
+
+    for attempt, delay in ((1, 30), (2, 60)):
+        before = datetime.utcnow()
+        assert outbox.dispatch() == (0, 1)
+        message = db.session.get(OutboxMessage, message_id)
+        assert message.status == PENDING
+        assert message.attempts == attempt
+        assert message.last_error == f"boom {attempt}"
+        assert before + timedelta(seconds=delay) <= message.next_attempt_at
+        assert message.next_attempt_at <= datetime.utcnow() + timedelta(seconds=delay)
+        # Not due again until the backoff has passed
+        assert outbox.dispatch() == (0, 0)
+        make_due(message_id)
+
+    assert outbox.dispatch() == (1, 0)
+    message = db.session.get(OutboxMessage, message_id)
+    assert message.status == SENT
+    assert message.attempts == 3
+    assert message.last_error is None
+
+
+def test_backoff_is_capped(app):
+    outbox = make_outbox(Handler(), backoff=30, max_backoff=100)
+    assert [outbox._retry_delay(attempts) for attempts in range(1, 6)] == [30, 60, 100, 100, 100]
+
+
+def test_message_is_dead_lettered_after_max_attempts(app):
+    handler = Handler(failures=10)
+    outbox = make_outbox(handler, max_attempts=3)
+    message_id = enqueue(outbox)
+
+    for _ in range(3):
+        make_due(message_id)
+        assert outbox.dispatch() == (0, 1)
+
+    message = db.session.get(OutboxMessage, message_id)
+    assert message.status == DEAD
+    assert message.attempts == 3
+    assert message.last_error == "boom 3"
+    make_due(message_id)
+    assert outbox.dispatch() == (0, 0)
+    assert len(handler.calls) == 3
+
+
+def test_purge_removes_only_old_sent_messages(app):
+    outbox = make_outbox(Handler())
+    now = datetime.utcnow()
+    rows = {
+        "old_sent": OutboxMessage(kind="email", payload="{}", status=SENT, sent_at=now - timedelta(days=8)),
+        "new_sent": OutboxMessage(kind="email", payload="{}", status=SENT, sent_at=now - timedelta(hours=1)),
+        "dead": OutboxMessage(kind="email", payload="{}", status=DEAD, attempts=6),
+        "pending": OutboxMessage(kind="email", payload="{}", status=PENDING),
+    }
+    db.session.add_all(rows.values())
+    db.session.commit()
+    ids = {name: row.id for name, row in rows.items()}
+
+    assert outbox.purge(7 * 24 * 3600) == 1
+    remaining = {row.id for row in OutboxMessage.query.all()}
+    assert remaining == {ids["new_sent"], ids["dead"], ids["pending"]}
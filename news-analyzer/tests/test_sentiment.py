@@ -0,0 +1,140 @@
+import re
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from utils.cache import SQLiteCache
+from utils.sentiment import SentimentEngine, sentiment_cache_key
+
+
+def score_for(index):
+    return round(index / 100, 2)
+
+
+class FakeClaude:
+    """Stands in for anthropic.Anthropic: scores "item N" texts as N/100.
+
+    respond(indexes, attempt) can override the reply for a chunk: return a
+    list of scores, or raise.
+    """
+
+    def __init__(self, respond=None):
+        self.respond = respond
+        self.calls = []
+        self._lock = threading.Lock()
+        self.messages = SimpleNamespace(create=self.create)
+
+    def create(self, **kwargs):
+        indexes = [int(n) for n in re.findall(r"Text \d+:\nitem (\d+)", kwargs["messages"][0]["content"])]
+        with self._lock:
+            self.calls.append(indexes)
+            attempt = sum(1 for call in self.calls if call == indexes)
+        scores = [score_for(i) for i in indexes]
+        if self.respond is not None:
+            scores = self.respond(indexes, attempt)
+        return SimpleNamespace(content=[SimpleNamespace(text=f"{scores}")],
+                               usage=SimpleNamespace(input_tokens=10, output_tokens=5))
+
+
+def texts(n):
+    return [f"item {i}" for i in range(n)]
+
+
+def test_texts_are_scored_in_chunks_and_merged_in_order():
+    client = FakeClaude()
+    engine = SentimentEngine(client, chunk_size=20, max_workers=3)
+
+    assert engine.score_texts(texts(45)) == [score_for(i) for i in range(45)]
+    assert sorted(len(call) for call in client.calls) == [5, 20, 20]
+    assert sorted(i for call in client.calls for i in call) == list(range(45))
+
+
+def test_chunk_with_wrong_score_count_is_retried():
+    def respond(indexes, attempt):
+        if attempt == 1 and indexes[0] == 10:
+            return [0.5]  # too few scores to match up
+        return [score_for(i) for i in indexes]
+
+    client = FakeClaude(respond)
+    engine = SentimentEngine(client, chunk_size=10)
+
+    assert engine.score_texts(texts(30)) == [score_for(i) for i in range(30)]
+    assert len(client.calls) == 4
+    assert client.calls.count(list(range(10, 20))) == 2
+
+
+def test_chunk_that_raises_is_retried():
+    def respond(indexes, attempt):
+        if attempt == 1:
+            raise RuntimeError("overloaded")
+        return [score_for(i) for i in indexes]
+
+    engine = SentimentEngine(FakeClaude(respond), chunk_size=10)
+    assert engine.score_texts(texts(5)) == [score_for(i) for i in range(5)]
+
+
+def test_failed_chunk_scores_zero_without_losing_the_others():
+    def respond(indexes, attempt):
+        if indexes[0] == 10:
+            raise RuntimeError("overloaded")
+        return [score_for(i) for i in indexes]
+
+    client = FakeClaude(respond)
+    engine = SentimentEngine(client, chunk_size=10, max_workers=3)
+
+    scores = engine.score_texts(texts(30))
+    assert scores[10:20] == [0.0] * 10
+    assert scores[:10] + scores[20:] == [score_for(i) for i in list(range(10)) + list(range(20, 30))]
+    # Two attempts at the failing chunk, one each for the rest
+    assert len(client.calls) == 4
+
+
+def test_scores_are_clamped():
+    engine = SentimentEngine(FakeClaude(lambda indexes, attempt: [3, -7]), chunk_size=10)
+    assert engine.score_texts(texts(2)) == [1.0, -1.0]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SQLiteCache(str(tmp_path / "cache.db"), namespace="sentiment")
+
+
+def test_cached_texts_skip_claude(cache):
+    client = FakeClaude()
+    engine = SentimentEngine(client, chunk_size=10, cache=cache)
+
+    assert engine.score_texts(texts(15)) == [score_for(i) for i in range(15)]
+    calls = len(client.calls)
+    assert engine.score_texts(texts(15)) == [score_for(i) for i in range(15)]
+    assert len(client.calls) == calls
+
+    # Only the new texts are sent, and duplicates within a batch once
+    assert engine.score_texts(texts(17) + ["item 16"])[-3:] == [score_for(15), score_for(16), score_for(16)]
+    assert client.calls[calls:] == [[15, 16]]
+
+
+def test_failed_chunk_is_not_cached(cache):
+    def respond(indexes, attempt):
+        if indexes[0] == 10 and attempt <= 2:
+            raise RuntimeError("overloaded")
+        return [score_for(i) for i in indexes]
+
+    client = FakeClaude(respond)
+    engine = SentimentEngine(client, chunk_size=10, cache=cache)
+
+    first = engine.score_texts(texts(20))
+    assert first[10:] == [0.0] * 10
+    assert set(cache.get_many([sentiment_cache_key(t) for t in texts(20)])) == \
+        {sentiment_cache_key(t) for t in texts(10)}
+
+    # The next request retries just the failed texts
+    assert engine.score_texts(texts(20)) == [score_for(i) for i in range(20)]
+    assert client.calls[-1] == list(range(10, 20))
+
+
+def test_score_articles_sets_sentiment():
+    articles = [{"title": "item 3", "description": None}, {"title": "item", "description": "4"}]
+    engine = SentimentEngine(FakeClaude(), chunk_size=10)
+    assert engine.score_articles(articles) == [0.03, 0.04]
+    assert [article["sentiment"] for article in articles] == [0.03, 0.04]
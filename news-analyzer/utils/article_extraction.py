@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.metrics import LLM_ERRORS, record_llm_usage
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_MODEL = "claude-3-haiku-20240307"
+
+# Input tokens per Claude call, calls in flight per document, and a cap on calls per document
+ARTICLE_CHUNK_TOKENS = int(os.environ.get("ARTICLE_CHUNK_TOKENS", 6000))
+ARTICLE_EXTRACT_WORKERS = int(os.environ.get("ARTICLE_EXTRACT_WORKERS", 4))
+ARTICLE_MAX_CHUNKS = int(os.environ.get("ARTICLE_MAX_CHUNKS", 40))
+# The extraction model's output limit; a 6000-token chunk can list more items than 2000 tokens hold
+ARTICLE_MAX_OUTPUT_TOKENS = 4096
+# Times a chunk whose reply hit ARTICLE_MAX_OUTPUT_TOKENS is halved and re-sent before it counts as failed
+ARTICLE_MAX_SPLITS = 2
+
+# Rough English average; good enough to keep chunks under budget
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def split_oversized(text, budget_chars):
+    """Split one page that alone exceeds the budget on paragraph, then line, boundaries."""
+    pieces, current = [], ""
+    for block in re.split(r'(\n\s*\n|\n)', text):
+        if len(current) + len(block) > budget_chars and current.strip():
+            pieces.append(current)
+            current = ""
+        while len(block) > budget_chars:
+            pieces.append(block[:budget_chars])
+            block = block[budget_chars:]
+        current += block
+    if current.strip():
+        pieces.append(current)
+    return pieces
+
+
+def chunk_pages(pages, chunk_tokens=ARTICLE_CHUNK_TOKENS):
+    """Pack consecutive pages/slides into chunks of at most chunk_tokens.
+
+    Chunks only break between pages unless a single page is over budget,
+    so an article rarely straddles two prompts.
+    """
+    budget_chars = chunk_tokens * CHARS_PER_TOKEN
+    chunks, current = [], []
+    current_tokens = 0
+    for page in pages:
+        if not page or not page.strip():
+            continue
+        for piece in (split_oversized(page, budget_chars) if len(page) > budget_chars else [page]):
+            tokens = estimate_tokens(piece)
+            if current and current_tokens + tokens > chunk_tokens:
+                chunks.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def build_extraction_prompt(text, part, parts):
+    return f"""Extract every distinct media coverage item (article, clipping, broadcast or online mention) from this text.
+This is part {part} of {parts} of a longer document; ignore fragments that are cut off at the edges.
+
+Return ONLY a JSON array, one object per item, like this:
+[{{"title": "Headline", "source": "Publication name or null", "date": "YYYY-MM-DD or null", "description": "One or two sentence summary"}}]
+
+Return [] if the text contains no coverage items.
+
+Text:
+{text}"""
+
+
+def parse_extracted_items(response_text):
+    """Pull the list of item dicts out of Claude's response."""
+    array_match = re.search(r'\[.*\]', response_text or "", re.DOTALL)
+    if not array_match:
+        return []
+    try:
+        items = json.loads(array_match.group(0))
+    except ValueError:
+        return []
+    return [item for item in items if isinstance(item, dict) and str(item.get('title') or '').strip()]
+
+
+def title_key(title):
+    """Normalized headline used to spot the same item extracted from two chunks."""
+    return " ".join(re.findall(r'\w+', str(title).lower()))
+
+
+def merge_items(chunk_results):
+    """Dedupe items across chunks by headline, keeping first-seen order and filling gaps."""
+    merged = {}
+    for items in chunk_results:
+        for item in items:
+            key = title_key(item['title'])
+            if not key:
+                continue
+            if key not in merged:
+                merged[key] = dict(item)
+                continue
+            existing = merged[key]
+            for field in ('source', 'date'):
+                if not existing.get(field) and item.get(field):
+                    existing[field] = item[field]
+            if len(str(item.get('description') or '')) > len(str(existing.get('description') or '')):
+                existing['description'] = item['description']
+    return list(merged.values())
+
+
+class ArticleExtractor:
+    """Map-reduce article extraction for long documents.
+
+    Page/slide texts are packed into token-budgeted chunks, each chunk is
+    sent to Claude concurrently (max_workers calls at a time), and the
+    per-chunk item lists are merged and deduped by headline. Chunk latency
+    is logged and aggregated in stats().
+    """
+
+    def __init__(self, client, chunk_tokens=ARTICLE_CHUNK_TOKENS, max_workers=ARTICLE_EXTRACT_WORKERS,
+                 max_chunks=ARTICLE_MAX_CHUNKS, model=EXTRACTION_MODEL):
+        self.client = client
+        self.chunk_tokens = chunk_tokens
+        self.max_workers = max(1, max_workers)
+        self.max_chunks = max(1, max_chunks)
+        self.model = model
+        self._lock = threading.Lock()
+        self._stats = {"documents": 0, "chunks": 0, "failed_chunks": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+
+    def _extract_chunk(self, text, part, parts, splits=ARTICLE_MAX_SPLITS):
+        """Return (items, seconds, error) for one chunk.
+
+        A reply cut off at ARTICLE_MAX_OUTPUT_TOKENS ends mid-array, so the
+        chunk is split in half and each half extracted, up to `splits` times.
+        """
+        started = time.time()
+        try:
+            response = self.client.messages.create(
+                model=self.model,
+                max_tokens=ARTICLE_MAX_OUTPUT_TOKENS,
+                messages=[{"role": "user", "content": build_extraction_prompt(text, part, parts)}]
+            )
+            record_llm_usage("extraction", getattr(response, "usage", None))
+        except Exception as e:
+            LLM_ERRORS.inc(purpose="extraction")
+            return [], time.time() - started, str(e)
+        if getattr(response, "stop_reason", None) != "max_tokens":
+            return parse_extracted_items(response.content[0].text), time.time() - started, None
+
+        halves = split_oversized(text, len(text) // 2 + 1) if splits > 0 else []
+        if len(halves) < 2:
+            return [], time.time() - started, f"output truncated at {ARTICLE_MAX_OUTPUT_TOKENS} tokens"
+        items, error = [], None
+        for half in halves:
+            half_items, _, half_error = self._extract_chunk(half, part, parts, splits - 1)
+            items.extend(half_items)
+            error = error or half_error
+        return items, time.time() - started, error
+
+    def extract(self, pages, name="document"):
+        """Extract items from a list of page/slide texts.
+
+        Returns (items, info); items are dicts with title, source, date and
+        description, and info reports chunk counts, failures and latencies.
+        """
+        chunks = chunk_pages(pages, self.chunk_tokens)
+        if len(chunks) > self.max_chunks:
+            logger.warning("Extraction of %s: %d chunks, only the first %d are sent", name, len(chunks), self.max_chunks)
+            chunks = chunks[:self.max_chunks]
+        info = {"chunks": len(chunks), "failed_chunks": 0, "chunk_seconds": [], "seconds": 0.0}
+        if not chunks:
+            return [], info
+
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+            results = list(executor.map(lambda args: self._extract_chunk(*args),
+                                        [(chunk, i + 1, len(chunks)) for i, chunk in enumerate(chunks)]))
+        info["seconds"] = round(time.time() - started, 3)
+
+        for i, (_, seconds, error) in enumerate(results):
+            info["chunk_seconds"].append(round(seconds, 3))
+            if error:
+                info["failed_chunks"] += 1
+                logger.warning("Extraction of %s: chunk %d/%d failed after %.2fs: %s", name, i + 1, len(chunks), seconds, error)
+        items = merge_items(items for items, _, _ in results)
+        logger.info("Extraction of %s: %d items from %d chunks in %.2fs (slowest chunk %.2fs)",
+                    name, len(items), len(chunks), info['seconds'], max(info['chunk_seconds']))
+
+        with self._lock:
+            self._stats["documents"] += 1
+            self._stats["chunks"] += len(chunks)
+            self._stats["failed_chunks"] += info["failed_chunks"]
+            self._stats["total_seconds"] += sum(info["chunk_seconds"])
+            self._stats["max_seconds"] = max(self._stats["max_seconds"], max(info["chunk_seconds"]))
+        return items, info
+
+    def stats(self):
+        """Aggregate chunk counts and latency, with mean chunk latency added."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["mean_seconds"] = stats["total_seconds"] / stats["chunks"] if stats["chunks"] else 0.0
+        return stats
@@ -0,0 +1,286 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# SQLite caps the number of bound parameters per statement
+SQLITE_BATCH_SIZE = 500
+
+# Lookups buffer last_access touches and hit/miss counts in memory and write them
+# once this many lookups or seconds have accumulated
+CACHE_FLUSH_EVERY = int(os.environ.get("CACHE_FLUSH_EVERY", 200))
+CACHE_FLUSH_INTERVAL = float(os.environ.get("CACHE_FLUSH_INTERVAL", 30))
+
+
+@contextmanager
+def sqlite_connection(path):
+    """Yield a connection that commits on success and is always closed."""
+    conn = sqlite3.connect(path, timeout=10)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def acquire_lease(path, name, owner, duration):
+    """Try to hold a named lease in the cache database for `duration` seconds.
+
+    Returns True if `owner` now holds the lease (newly acquired or renewed).
+    Used so that periodic jobs run in one gunicorn worker rather than all of them.
+    """
+    now = time.time()
+    try:
+        with sqlite_connection(path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "INSERT INTO cache_leases (name, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE cache_leases.owner = excluded.owner OR cache_leases.expires_at <= ?",
+                (name, owner, now + duration, now)
+            )
+            row = conn.execute("SELECT owner FROM cache_leases WHERE name = ?", (name,)).fetchone()
+        return bool(row and row[0] == owner)
+    except Exception as e:
+        logger.warning("Lease error (%s): %s", name, e)
+        return False
+
+
+class SQLiteCache:
+    """Small persistent key/value cache backed by a SQLite file.
+
+    Entries live in a shared table partitioned by namespace, expire after a
+    TTL and are evicted least-recently-used once a namespace grows past
+    max_entries. Values are stored as JSON. Hit/miss/eviction counters are
+    kept both per instance and in the database, so stats() reflects every
+    worker sharing the file.
+
+    Lookups only read. The LRU timestamps of hit keys and the shared hit/miss
+    counters are buffered per instance and flushed in one write transaction
+    every flush_every lookups or flush_interval seconds (and with any write
+    this instance makes anyway), so workers don't queue on SQLite's write
+    lock on the hot read path. LRU order and shared counters therefore lag
+    by at most one unflushed batch per worker.
+    """
+
+    def __init__(self, path, namespace, ttl=3600, max_entries=10000,
+                 flush_every=CACHE_FLUSH_EVERY, flush_interval=CACHE_FLUSH_INTERVAL):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._pending_access = {}
+        self._pending_counts = {"hits": 0, "misses": 0}
+        self._pending_lookups = 0
+        self._last_flush = time.time()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS cache_entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )"""
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_cache_entries_lru ON cache_entries (namespace, last_access)"
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS cache_stats (
+                    namespace TEXT PRIMARY KEY,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    misses INTEGER NOT NULL DEFAULT 0,
+                    evictions INTEGER NOT NULL DEFAULT 0
+                )"""
+            )
+
+    def _connect(self):
+        return sqlite_connection(self.path)
+
+    def _count(self, conn, evictions):
+        """Add evictions to the local counter and, on the open write connection, the shared one."""
+        with self._lock:
+            self._stats["evictions"] += evictions
+        if evictions:
+            conn.execute(
+                "INSERT INTO cache_stats (namespace, hits, misses, evictions) VALUES (?, 0, 0, ?) "
+                "ON CONFLICT(namespace) DO UPDATE SET evictions = evictions + excluded.evictions",
+                (self.namespace, evictions)
+            )
+
+    def _buffer_lookups(self, found_keys, misses, now):
+        """Record hits and misses locally; returns True when a flush is due."""
+        with self._lock:
+            self._stats["hits"] += len(found_keys)
+            self._stats["misses"] += misses
+            self._pending_counts["hits"] += len(found_keys)
+            self._pending_counts["misses"] += misses
+            for key in found_keys:
+                self._pending_access[key] = now
+            self._pending_lookups += len(found_keys) + misses
+            return (self._pending_lookups >= self.flush_every
+                    or now - self._last_flush >= self.flush_interval)
+
+    def _write_pending(self, conn):
+        """Write buffered LRU touches and hit/miss counts on an open write connection."""
+        with self._lock:
+            access, self._pending_access = self._pending_access, {}
+            counts, self._pending_counts = self._pending_counts, {"hits": 0, "misses": 0}
+            self._pending_lookups = 0
+            self._last_flush = time.time()
+        if access:
+            conn.executemany(
+                "UPDATE cache_entries SET last_access = MAX(last_access, ?) WHERE namespace = ? AND key = ?",
+                [(at, self.namespace, key) for key, at in access.items()]
+            )
+        if counts["hits"] or counts["misses"]:
+            conn.execute(
+                "INSERT INTO cache_stats (namespace, hits, misses, evictions) VALUES (?, ?, ?, 0) "
+                "ON CONFLICT(namespace) DO UPDATE SET hits = hits + excluded.hits, misses = misses + excluded.misses",
+                (self.namespace, counts["hits"], counts["misses"])
+            )
+
+    def flush(self):
+        """Write buffered LRU touches and hit/miss counts now."""
+        try:
+            with self._connect() as conn:
+                self._write_pending(conn)
+        except Exception as e:
+            logger.warning("Cache flush error (%s): %s", self.namespace, e)
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired."""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """Return a dict of the keys that are present and unexpired."""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+
+        now = time.time()
+        found = {}
+        try:
+            with self._connect() as conn:
+                for i in range(0, len(keys), SQLITE_BATCH_SIZE):
+                    batch = keys[i:i + SQLITE_BATCH_SIZE]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = conn.execute(
+                        f"SELECT key, value FROM cache_entries "
+                        f"WHERE namespace = ? AND expires_at > ? AND key IN ({placeholders})",
+                        [self.namespace, now, *batch]
+                    ).fetchall()
+                    for key, value in rows:
+                        found[key] = json.loads(value)
+        except Exception as e:
+            logger.warning("Cache read error (%s): %s", self.namespace, e)
+            found = {}
+
+        if self._buffer_lookups(found.keys(), len(keys) - len(found), now):
+            self.flush()
+        return found
+
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl=ttl)
+
+    def set_many(self, items, ttl=None):
+        """Store a dict of key -> value, then enforce the size bound."""
+        if not items:
+            return
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        rows = [(self.namespace, key, json.dumps(value, default=str), now, expires_at, now)
+                for key, value in items.items()]
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO cache_entries "
+                    "(namespace, key, value, created_at, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._write_pending(conn)
+                self._evict_lru(conn)
+        except Exception as e:
+            logger.warning("Cache write error (%s): %s", self.namespace, e)
+
+    def delete(self, key):
+        try:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+        except Exception as e:
+            logger.warning("Cache delete error (%s): %s", self.namespace, e)
+
+    def _evict_lru(self, conn):
+        """Drop the least recently used entries over max_entries."""
+        count = conn.execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow <= 0:
+            return 0
+        removed = conn.execute(
+            "DELETE FROM cache_entries WHERE rowid IN ("
+            "SELECT rowid FROM cache_entries WHERE namespace = ? ORDER BY last_access LIMIT ?)",
+            (self.namespace, overflow)
+        ).rowcount
+        self._count(conn, evictions=removed)
+        return removed
+
+    def sweep(self):
+        """Remove expired entries and trim to max_entries. Returns the number removed."""
+        try:
+            with self._connect() as conn:
+                removed = conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?",
+                    (self.namespace, time.time())
+                ).rowcount
+                self._count(conn, evictions=removed)
+                self._write_pending(conn)
+                return removed + self._evict_lru(conn)
+        except Exception as e:
+            logger.warning("Cache sweep error (%s): %s", self.namespace, e)
+            return 0
+
+    def stats(self):
+        """Counters for this namespace across all processes, plus this process's own."""
+        self.flush()
+        with self._lock:
+            local = dict(self._stats)
+        shared = {"hits": 0, "misses": 0, "evictions": 0, "entries": 0}
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT hits, misses, evictions FROM cache_stats WHERE namespace = ?", (self.namespace,)
+                ).fetchone()
+                if row:
+                    shared["hits"], shared["misses"], shared["evictions"] = row
+                shared["entries"] = conn.execute(
+                    "SELECT COUNT(*) FROM cache_entries WHERE namespace = ? AND expires_at > ?",
+                    (self.namespace, time.time())
+                ).fetchone()[0]
+        except Exception as e:
+            logger.warning("Cache stats error (%s): %s", self.namespace, e)
+
+        lookups = shared["hits"] + shared["misses"]
+        shared["hit_rate"] = (shared["hits"] / lookups) if lookups else 0.0
+        shared["process"] = local
+        return shared
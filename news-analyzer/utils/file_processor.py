@@ -1,7 +1,5 @@
 import os
 import pandas as pd
-import PyPDF2
-import pdfplumber
 from pptx import Presentation
 import chardet
 import re
@@ -9,10 +7,40 @@ from datetime import datetime
 from dateutil.parser import parse
 from anthropic import Anthropic
 import json
+import hashlib
+import warnings
+from utils.article_extraction import ArticleExtractor
+from utils.cache import SQLiteCache
+from utils.pdf_text import extract_pdf_pages
+
+# Column mappings learned per export format (Meltwater, Cision, ...) live alongside the app's other caches
+COLUMN_MAPPING_CACHE_PATH = os.environ.get(
+    "CACHE_DB_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "cache.db")
+)
+COLUMN_MAPPING_CACHE_TTL = int(os.environ.get("COLUMN_MAPPING_CACHE_TTL", 90 * 24 * 3600))
+
+MAPPING_FIELDS = ["headline", "date", "outlet", "description", "url", "author", "topic"]
+
+
+def header_signature(headers):
+    """Stable key for a sheet's header row; case, spacing and sample data don't matter."""
+    normalized = [" ".join(str(h).lower().split()) for h in headers]
+    return hashlib.sha256(json.dumps(normalized).encode("utf-8")).hexdigest()
+
 
 class MediaFileProcessor:
-    def __init__(self, anthropic_api_key):
+    def __init__(self, anthropic_api_key, mapping_cache=None):
         self.anthropic = Anthropic(api_key=anthropic_api_key)
+        self.extractor = ArticleExtractor(self.anthropic)
+        self._mapping_cache = mapping_cache
+    
+    @property
+    def mapping_cache(self):
+        # Opened on first spreadsheet so PDF/PPTX-only use never touches the cache file
+        if self._mapping_cache is None:
+            self._mapping_cache = SQLiteCache(COLUMN_MAPPING_CACHE_PATH, namespace="column_mapping",
+                                              ttl=COLUMN_MAPPING_CACHE_TTL, max_entries=5000)
+        return self._mapping_cache
         
     def process_file(self, file_path, filename):
         """Process a file based on its extension and return standardized data."""
@@ -34,20 +62,20 @@ class MediaFileProcessor:
     def process_excel(self, file_path):
         """Process Excel files with intelligent column mapping."""
         try:
-            # Read all sheets
-            excel_file = pd.ExcelFile(file_path)
             all_data = []
             
-            for sheet_name in excel_file.sheet_names:
-                df = pd.read_excel(file_path, sheet_name=sheet_name)
-                
-                # Skip empty sheets
-                if df.empty:
-                    continue
-                
-                # Detect and map columns using AI
-                mapped_data = self.intelligent_column_mapping(df)
-                all_data.extend(mapped_data)
+            # Open and parse the workbook once; each sheet is read from the loaded book
+            with pd.ExcelFile(file_path) as excel_file:
+                for sheet_name in excel_file.sheet_names:
+                    df = excel_file.parse(sheet_name)
+                    
+                    # Skip empty sheets
+                    if df.empty:
+                        continue
+                    
+                    # Detect and map columns using AI
+                    mapped_data = self.intelligent_column_mapping(df)
+                    all_data.extend(mapped_data)
             
             return all_data
         except Exception as e:
@@ -55,7 +83,36 @@ class MediaFileProcessor:
             return []
     
     def intelligent_column_mapping(self, df):
-        """Use AI to intelligently map Excel columns to standard format."""
+        """Use AI to intelligently map Excel columns to standard format.
+        
+        Mappings are cached by header signature, so recurring export formats
+        skip the Claude call entirely.
+        """
+        headers = list(df.columns)
+        signature = header_signature(headers)
+        
+        mapping = self.cached_column_mapping(signature, headers)
+        if mapping is None:
+            mapping = self.ai_column_mapping(df, signature)
+        
+        # Convert DataFrame to standardized format
+        return self.convert_to_standard_format(df, mapping)
+    
+    def cached_column_mapping(self, signature, headers):
+        """Rebuild a cached mapping against this sheet's own header names, or None on a miss."""
+        try:
+            cached = self.mapping_cache.get(signature)
+        except Exception as e:
+            print(f"Column mapping cache read failed: {str(e)}")
+            return None
+        if cached is None:
+            return None
+        # Stored as column positions since the same format may vary in header case/spacing
+        return {field: headers[index] if isinstance(index, int) and 0 <= index < len(headers) else None
+                for field, index in cached.items()}
+    
+    def ai_column_mapping(self, df, signature):
+        """Ask Claude for a mapping; cache it only when it names real columns."""
         # Get column headers and sample data
         headers = list(df.columns)
         sample_rows = df.head(3).to_dict('records')
@@ -105,14 +162,24 @@ class MediaFileProcessor:
                 mapping = json.loads(json_match.group(0))
             else:
                 # Fallback to basic mapping
-                mapping = self.basic_column_mapping(headers)
+                return self.basic_column_mapping(headers)
                 
         except Exception as e:
             print(f"AI mapping failed, using basic mapping: {str(e)}")
-            mapping = self.basic_column_mapping(headers)
+            return self.basic_column_mapping(headers)
         
-        # Convert DataFrame to standardized format
-        return self.convert_to_standard_format(df, mapping)
+        # Keep only fields that name a real column, as positions into the header row
+        positions = {str(h): i for i, h in enumerate(headers)}
+        indexes = {field: positions.get(str(mapping.get(field))) if mapping.get(field) is not None else None
+                   for field in MAPPING_FIELDS}
+        if not any(index is not None for index in indexes.values()):
+            return self.basic_column_mapping(headers)
+        
+        try:
+            self.mapping_cache.set(signature, indexes)
+        except Exception as e:
+            print(f"Column mapping cache write failed: {str(e)}")
+        return {field: headers[index] if index is not None else None for field, index in indexes.items()}
     
     def basic_column_mapping(self, headers):
         """Fallback basic column mapping based on common patterns."""
@@ -151,31 +218,72 @@ class MediaFileProcessor:
         return mapping
     
     def convert_to_standard_format(self, df, mapping):
-        """Convert DataFrame to standardized article format."""
-        articles = []
+        """Convert DataFrame to standardized article format, column-wise."""
+        titles = self.text_column(df, mapping.get("headline"), "No Title")
+        descriptions = self.text_column(df, mapping.get("description"), "")
         
-        for _, row in df.iterrows():
-            try:
-                article = {
-                    "source": {"name": self.safe_get_value(row, mapping["outlet"], "Unknown Source")},
-                    "title": self.safe_get_value(row, mapping["headline"], "No Title"),
-                    "description": self.safe_get_value(row, mapping["description"], ""),
-                    "url": self.safe_get_value(row, mapping["url"], ""),
-                    "author": self.safe_get_value(row, mapping["author"], ""),
-                    "publishedAt": self.parse_date(self.safe_get_value(row, mapping["date"], "")),
-                    "content": self.safe_get_value(row, mapping["description"], ""),
-                    "api_source": "Local File"
-                }
-                
-                # Skip rows without essential data
-                if article["title"] and article["title"] != "No Title":
-                    articles.append(article)
-                    
-            except Exception as e:
-                print(f"Error processing row: {str(e)}")
-                continue
+        standard = pd.DataFrame({
+            "source": [{"name": name} for name in self.text_column(df, mapping.get("outlet"), "Unknown Source")],
+            "title": titles,
+            "description": descriptions,
+            "url": self.text_column(df, mapping.get("url"), ""),
+            "author": self.text_column(df, mapping.get("author"), ""),
+            "publishedAt": self.date_column(df, mapping.get("date")),
+            "content": descriptions,
+            "api_source": "Local File"
+        }, index=df.index)
         
-        return articles
+        # Skip rows without essential data
+        standard = standard[(titles != "") & (titles != "No Title")]
+        # All columns are already Python objects, so skip to_dict's per-cell boxing
+        columns = list(standard.columns)
+        return [dict(zip(columns, values)) for values in standard.itertuples(index=False, name=None)]
+    
+    def text_column(self, df, column_name, default=""):
+        """A column as strings with missing values (or a missing column) replaced by default."""
+        if not column_name or column_name not in df.columns:
+            return pd.Series(default, index=df.index, dtype=object)
+        values = df[column_name]
+        if isinstance(values, pd.DataFrame):
+            # Duplicate header names: keep the first, as row[column_name] lookups effectively did
+            values = values.iloc[:, 0]
+        return values.astype(str).where(values.notna(), default)
+    
+    def date_column(self, df, column_name):
+        """Vectorized parse_date: ISO strings, with now() for missing or unparseable dates."""
+        now = datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ")
+        if not column_name or column_name not in df.columns:
+            return pd.Series(now, index=df.index, dtype=object)
+        values = df[column_name]
+        if isinstance(values, pd.DataFrame):
+            values = values.iloc[:, 0]
+        
+        retry = None
+        if pd.api.types.is_datetime64_any_dtype(values):
+            parsed = values
+        else:
+            raw = values.astype(str).where(values.notna())
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", UserWarning)
+                try:
+                    # Fast path: one inferred format for the whole column
+                    parsed = pd.to_datetime(raw, errors="coerce")
+                except (ValueError, TypeError):
+                    parsed = None
+            if parsed is None or not pd.api.types.is_datetime64_any_dtype(parsed):
+                # e.g. mixed UTC offsets, which can't share one datetime dtype
+                parsed = pd.Series(pd.NaT, index=raw.index, dtype="datetime64[ns]")
+            retry = parsed.isna() & raw.notna()
+        
+        if getattr(parsed.dt, "tz", None) is not None:
+            # Keep the local wall time, as strftime on a parsed datetime did
+            parsed = parsed.dt.tz_localize(None)
+        published = parsed.dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+        
+        if retry is not None and retry.any():
+            # Rows in other formats fall back to per-value parsing
+            published = published.mask(retry, raw[retry].map(self.parse_date))
+        return published.fillna(now)
     
     def safe_get_value(self, row, column_name, default=""):
         """Safely get value from row, handling missing columns."""
@@ -204,24 +312,12 @@ class MediaFileProcessor:
         articles = []
         
         try:
-            # Try pdfplumber first (better for complex layouts)
-            with pdfplumber.open(file_path) as pdf:
-                full_text = ""
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        full_text += text + "\n"
-            
-            # If pdfplumber fails, try PyPDF2
-            if not full_text.strip():
-                with open(file_path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                    for page in pdf_reader.pages:
-                        full_text += page.extract_text() + "\n"
+            # PyPDF2 per page, pdfplumber only for empty or garbled pages; long files in parallel
+            pages = extract_pdf_pages(file_path)
             
             # Use AI to structure the extracted text
-            if full_text.strip():
-                structured_articles = self.structure_pdf_content(full_text)
+            if any(page.strip() for page in pages):
+                structured_articles = self.structure_pdf_content(pages)
                 articles.extend(structured_articles)
                 
         except Exception as e:
@@ -229,56 +325,14 @@ class MediaFileProcessor:
         
         return articles
     
-    def structure_pdf_content(self, text):
-        """Use AI to identify and structure articles from PDF text."""
-        prompt = f"""
-        Analyze this text extracted from a PDF and identify individual media coverage items or articles.
-        
-        Text content:
-        {text[:4000]}  # Limit text to avoid token limits
-        
-        Please identify and extract:
-        1. Individual articles or media mentions
-        2. Headlines or titles
-        3. Publication dates (if mentioned)
-        4. Source publications (if mentioned)
-        5. Main content or summaries
+    def structure_pdf_content(self, pages):
+        """Use AI to identify and structure articles from PDF page texts."""
+        articles_data, info = self.extractor.extract(pages, "PDF Document")
         
-        Return a JSON array of articles in this format:
-        [
-            {{
-                "title": "Article headline or title",
-                "source": "Publication name or Unknown",
-                "date": "Date in YYYY-MM-DD format or null",
-                "content": "Main article content or summary",
-                "description": "Brief description or summary"
-            }}
-        ]
-        
-        If the text appears to be one continuous document, create a single article entry.
-        If you can identify multiple distinct articles, create separate entries.
-        """
-        
-        try:
-            response = self.anthropic.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=1000,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            response_text = response.content[0].text
-            json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-            
-            if json_match:
-                articles_data = json.loads(json_match.group(0))
-                return self.convert_pdf_to_standard_format(articles_data)
-            else:
-                # Fallback: create single article from all text
-                return self.create_single_article_from_text(text)
-                
-        except Exception as e:
-            print(f"AI structuring failed: {str(e)}")
-            return self.create_single_article_from_text(text)
+        if not articles_data and info['failed_chunks'] == info['chunks']:
+            # Fallback: create single article from all text
+            return self.create_single_article_from_text("\n".join(pages))
+        return self.convert_pdf_to_standard_format(articles_data)
     
     def convert_pdf_to_standard_format(self, articles_data):
         """Convert AI-structured PDF data to standard format."""
@@ -287,13 +341,13 @@ class MediaFileProcessor:
         for article_data in articles_data:
             try:
                 article = {
-                    "source": {"name": article_data.get("source", "PDF Document")},
+                    "source": {"name": article_data.get("source") or "PDF Document"},
                     "title": article_data.get("title", "PDF Content"),
-                    "description": article_data.get("description", article_data.get("content", "")[:200]),
+                    "description": article_data.get("description") or (article_data.get("content") or "")[:200],
                     "url": "",
                     "author": "",
                     "publishedAt": self.parse_date(article_data.get("date", "")),
-                    "content": article_data.get("content", ""),
+                    "content": article_data.get("content") or article_data.get("description") or "",
                     "api_source": "Local File"
                 }
                 articles.append(article)
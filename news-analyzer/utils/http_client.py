@@ -0,0 +1,155 @@
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_AGENT = "Mozilla/5.0 (compatible; InnateC3/1.0; +https://innatec3.com)"
+
+# (connect, read) seconds; the read timeout applies between bytes, not to the whole body
+DEFAULT_TIMEOUT = (3.05, 12)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class HttpClient:
+    """Shared outbound HTTP client for upstream APIs and webhooks.
+
+    Wraps one requests.Session so connections (and TLS sessions) are kept
+    alive and reused across calls and threads. Every call gets a default
+    connect/read timeout, at most per_host_limit requests run against the
+    same host at once, and 429/5xx responses or connection errors are
+    retried with jittered exponential backoff. Idempotent methods retry by
+    default; other methods only when retries is passed explicitly.
+
+    A stream=True response keeps its host slot until it is closed, so the
+    per-host limit also covers reading the body; callers must close it (or
+    use it as a context manager).
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, retries=2, backoff=0.5, max_backoff=8.0,
+                 per_host_limit=8, pool_maxsize=20, user_agent=DEFAULT_USER_AGENT):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.per_host_limit = per_host_limit
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["User-Agent"] = user_agent
+
+        self._lock = threading.Lock()
+        self._host_slots = {}
+        self._stats = {}
+
+    def _slot(self, host):
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_slots[host]
+
+    @staticmethod
+    def _release_on_close(response, slot):
+        """Make response.close() also give back its host slot, once."""
+        close = response.close
+        held = [True]
+
+        def close_and_release():
+            try:
+                close()
+            finally:
+                if held[0]:
+                    held[0] = False
+                    slot.release()
+
+        response.close = close_and_release
+
+    def _record(self, host, elapsed, error=False, retried=False):
+        with self._lock:
+            stats = self._stats.setdefault(host, {
+                "calls": 0, "errors": 0, "retries": 0, "total_seconds": 0.0, "max_seconds": 0.0
+            })
+            stats["calls"] += 1
+            stats["total_seconds"] += elapsed
+            stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+            if error:
+                stats["errors"] += 1
+            if retried:
+                stats["retries"] += 1
+
+    def _sleep_before_retry(self, attempt, response=None):
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = min(self.max_backoff, float(retry_after))
+        # Full jitter so concurrent workers don't retry in lockstep
+        time.sleep(random.uniform(0, delay))
+
+    def request(self, method, url, retries=None, **kwargs):
+        """Send a request; returns the final Response or raises the last connection error."""
+        method = method.upper()
+        host = urlsplit(url).netloc
+        kwargs.setdefault("timeout", self.timeout)
+        if retries is None:
+            retries = self.retries if method in IDEMPOTENT_METHODS else 0
+
+        attempt = 0
+        while True:
+            started = time.time()
+            slot = self._slot(host)
+            slot.acquire()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except BaseException as e:
+                slot.release()
+                if not isinstance(e, (requests.ConnectionError, requests.Timeout)):
+                    raise
+                elapsed = time.time() - started
+                retry = attempt < retries
+                self._record(host, elapsed, error=True, retried=retry)
+                logger.warning("HTTP %s %s failed in %.2fs: %s", method, host, elapsed, e)
+                if not retry:
+                    raise
+                self._sleep_before_retry(attempt)
+                attempt += 1
+                continue
+
+            if kwargs.get("stream"):
+                # The body hasn't been read yet; hold the slot until the caller closes it
+                self._release_on_close(response, slot)
+            else:
+                slot.release()
+
+            elapsed = time.time() - started
+            retry = response.status_code in RETRY_STATUSES and attempt < retries
+            self._record(host, elapsed, error=response.status_code >= 400, retried=retry)
+            logger.log(logging.WARNING if response.status_code >= 400 else logging.INFO,
+                       "HTTP %s %s %d in %.2fs", method, host, response.status_code, elapsed)
+            if not retry:
+                return response
+            response.close()
+            self._sleep_before_retry(attempt, response)
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def stats(self):
+        """Per-host call counts and latency, with mean latency added."""
+        with self._lock:
+            stats = {host: dict(values) for host, values in self._stats.items()}
+        for values in stats.values():
+            values["mean_seconds"] = values["total_seconds"] / values["calls"] if values["calls"] else 0.0
+        return stats
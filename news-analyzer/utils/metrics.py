@@ -0,0 +1,223 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Prometheus text exposition format served by /metrics
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans a warm cache lookup up to a slow multi-page fetch or Claude call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _sample_line(name, labels, value):
+    if labels:
+        pairs = ",".join(f'{key}="{_escape(label)}"' for key, label in labels)
+        return f"{name}{{{pairs}}} {_format_value(value)}"
+    return f"{name} {_format_value(value)}"
+
+
+def _family_lines(name, kind, documentation, samples):
+    """HELP/TYPE header plus one line per (sample name, label pairs, value)."""
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    lines.extend(_sample_line(sample_name, labels, value) for sample_name, labels, value in samples)
+    return lines
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _snapshot(self):
+        with self._lock:
+            return sorted((key, self._copy(value)) for key, value in self._values.items())
+
+    def _copy(self, value):
+        return value
+
+    def expose(self):
+        return _family_lines(self.name, self.kind, self.documentation, self.samples())
+
+
+class Counter(_Metric):
+    """Monotonic count per label set; by convention the name ends in _total."""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Counters only go up")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        for key, value in self._snapshot():
+            yield self.name, list(zip(self.labelnames, key)), value
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (usually seconds) in fixed buckets per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _copy(self, value):
+        return list(value[0]), value[1][0]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)  # first bucket with bound >= value, or +Inf
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            state[0][index] += 1
+            state[1][0] += value
+
+    @contextmanager
+    def timer(self, **labels):
+        """Observe wall-clock seconds spent in a with block or decorated call, including when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        for key, (counts, total) in self._snapshot():
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", labels + [("le", _format_value(float(bound)))], cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class Registry:
+    """Named metrics plus scrape-time collectors, rendered in Prometheus text format.
+
+    Collectors are callables returning (name, kind, documentation, samples)
+    families, where samples are (labels dict, value) pairs; they let
+    components that already keep their own stats (caches, the HTTP client)
+    be exported without a second set of counters on the hot path.
+
+    Values live in this process. Under several gunicorn workers each one
+    reports its own, except for collectors reading shared state.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._collectors = []
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collect):
+        with self._lock:
+            self._collectors.append(collect)
+        return collect
+
+    def render(self):
+        """Every metric and collector family as one text/plain exposition."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.expose())
+        for collect in collectors:
+            for name, kind, documentation, samples in collect():
+                lines.extend(_family_lines(name, kind, documentation,
+                                           ((name, sorted(labels.items()), value) for labels, value in samples)))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Pipeline stages: fetch (upstream or its cache), parse (dates, sources and topics
+# into the coverage summary), sentiment, narrative, db_write and render
+STAGE_SECONDS = REGISTRY.histogram("news_stage_seconds", "Seconds spent in each pipeline stage", ["stage"])
+REQUEST_SECONDS = REGISTRY.histogram("news_request_seconds", "Seconds to build each HTTP response",
+                                     ["endpoint", "method", "status"])
+LLM_TOKENS = REGISTRY.counter("news_llm_tokens_total", "Claude tokens used, by call purpose and direction",
+                              ["purpose", "direction"])
+LLM_ERRORS = REGISTRY.counter("news_llm_errors_total", "Claude calls that raised, by call purpose", ["purpose"])
+
+
+def record_llm_usage(purpose, usage):
+    """Count the input/output tokens of one Claude response's usage block."""
+    if usage is None:
+        return
+    LLM_TOKENS.inc(getattr(usage, "input_tokens", 0) or 0, purpose=purpose, direction="input")
+    LLM_TOKENS.inc(getattr(usage, "output_tokens", 0) or 0, purpose=purpose, direction="output")
+
+
+def cache_collector(caches):
+    """Collector for SQLiteCache hit/miss/eviction counters, shared by every worker."""
+    def collect():
+        stats = [(cache.namespace, cache.stats()) for cache in caches]
+        for field, documentation in (("hits", "Cache lookups that found a live entry"),
+                                     ("misses", "Cache lookups that found nothing"),
+                                     ("evictions", "Cache entries expired or evicted")):
+            yield (f"news_cache_{field}_total", "counter", f"{documentation}, across all workers",
+                   [({"cache": namespace}, values[field]) for namespace, values in stats])
+        yield ("news_cache_entries", "gauge", "Live entries per cache namespace",
+               [({"cache": namespace}, values["entries"]) for namespace, values in stats])
+    return collect
+
+
+def http_client_collector(client):
+    """Collector for HttpClient's per-host call, error and retry counts."""
+    def collect():
+        stats = client.stats()
+        for field, name, documentation in (
+                ("calls", "news_upstream_requests_total", "Outbound HTTP attempts per host"),
+                ("errors", "news_upstream_errors_total", "Outbound HTTP attempts that failed or returned 4xx/5xx"),
+                ("retries", "news_upstream_retries_total", "Outbound HTTP attempts that were retried"),
+                ("total_seconds", "news_upstream_seconds_total", "Seconds spent waiting on each host")):
+            yield name, "counter", documentation, [({"host": host}, values[field]) for host, values in stats.items()]
+    return collect
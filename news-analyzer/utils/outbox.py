@@ -0,0 +1,115 @@
+import json
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Outbox message states; "sending" rows whose lease has expired are retried
+PENDING, SENDING, SENT, DEAD = "pending", "sending", "sent", "dead"
+
+
+class Outbox:
+    """Durable outbox for side effects (emails, webhooks) that run after a request.
+
+    Request handlers call enqueue() to add a message to the same session as
+    the rows it belongs to, so both are committed together or not at all.
+    dispatch() runs in the background: it claims a batch of due messages,
+    calls handlers[kind](payload) for each, and records the outcome. A
+    handler that raises is retried with jittered exponential backoff until
+    max_attempts, after which the message is dead-lettered (kept, with its
+    last error, for inspection).
+
+    Claims are optimistic updates on (id, next_attempt_at), so several app
+    workers can dispatch the same table without sending a message twice;
+    a claim holds the message for lease_seconds in case the worker dies.
+    """
+
+    def __init__(self, db, model, handlers, batch_size=20, max_attempts=6,
+                 backoff=30, max_backoff=3600, lease_seconds=300):
+        self.db = db
+        self.model = model
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self.max_attempts = max(1, max_attempts)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lease_seconds = lease_seconds
+
+    def enqueue(self, kind, payload):
+        """Add a message to the current session; the caller commits it."""
+        if kind not in self.handlers:
+            raise ValueError(f"No outbox handler for {kind!r}")
+        message = self.model(kind=kind, payload=json.dumps(payload, default=str), status=PENDING,
+                             attempts=0, next_attempt_at=datetime.utcnow())
+        self.db.session.add(message)
+        return message
+
+    def _claim(self, message_id, seen_next_attempt_at, now):
+        claimed = (self.model.query
+                   .filter_by(id=message_id, next_attempt_at=seen_next_attempt_at)
+                   .update({"status": SENDING, "attempts": self.model.attempts + 1,
+                            "next_attempt_at": now + timedelta(seconds=self.lease_seconds)},
+                           synchronize_session=False))
+        self.db.session.commit()
+        return claimed == 1
+
+    def _retry_delay(self, attempts):
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _deliver(self, message_id):
+        message = self.db.session.get(self.model, message_id)
+        started = time.time()
+        try:
+            self.handlers[message.kind](json.loads(message.payload))
+        except Exception as e:
+            message.last_error = str(e)[:2000]
+            if message.attempts >= self.max_attempts:
+                message.status = DEAD
+                logger.error("Outbox %s #%s dead-lettered after %d attempts: %s", message.kind, message.id, message.attempts, e)
+            else:
+                message.status = PENDING
+                message.next_attempt_at = datetime.utcnow() + timedelta(seconds=self._retry_delay(message.attempts))
+                logger.warning("Outbox %s #%s attempt %d failed, retrying: %s", message.kind, message.id, message.attempts, e)
+            self.db.session.commit()
+            return False
+        message.status = SENT
+        message.sent_at = datetime.utcnow()
+        message.last_error = None
+        self.db.session.commit()
+        logger.info("Outbox %s #%s sent in %.2fs", message.kind, message.id, time.time() - started)
+        return True
+
+    def dispatch(self):
+        """Deliver one batch of due messages; returns (sent, failed). Needs an app context."""
+        now = datetime.utcnow()
+        # Plain (id, next_attempt_at) tuples: ORM objects would refresh after each commit
+        due = (self.db.session.query(self.model.id, self.model.next_attempt_at)
+               .filter(self.model.status.in_((PENDING, SENDING)), self.model.next_attempt_at <= now)
+               .order_by(self.model.next_attempt_at)
+               .limit(self.batch_size)
+               .all())
+        sent = failed = 0
+        for message_id, next_attempt_at in due:
+            try:
+                if not self._claim(message_id, next_attempt_at, now):
+                    continue  # another worker got it first
+                if self._deliver(message_id):
+                    sent += 1
+                else:
+                    failed += 1
+            except Exception as e:
+                self.db.session.rollback()
+                logger.error("Outbox dispatch error on #%s: %s", message_id, e)
+        return sent, failed
+
+    def purge(self, older_than):
+        """Delete messages sent more than older_than seconds ago; dead letters are kept."""
+        cutoff = datetime.utcnow() - timedelta(seconds=older_than)
+        removed = (self.model.query
+                   .filter(self.model.status == SENT, self.model.sent_at < cutoff)
+                   .delete(synchronize_session=False))
+        self.db.session.commit()
+        return removed
@@ -0,0 +1,105 @@
+import json
+import logging
+import os
+import struct
+import threading
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # optional; zlib is always available
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Encoded payloads start with MAGIC, a format version byte and a codec byte
+MAGIC = b"NAP"
+FORMAT_VERSION = 1
+HEADER = struct.Struct(">3sBB")
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODEC_NAMES = {"none": CODEC_NONE, "zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+
+# Bodies smaller than this aren't worth a compressor's framing overhead
+PAYLOAD_COMPRESS_MIN_BYTES = int(os.environ.get("PAYLOAD_COMPRESS_MIN_BYTES", 128))
+PAYLOAD_ZSTD_LEVEL = int(os.environ.get("PAYLOAD_ZSTD_LEVEL", 3))
+PAYLOAD_ZLIB_LEVEL = int(os.environ.get("PAYLOAD_ZLIB_LEVEL", 6))
+
+
+def default_codec():
+    """Codec for new writes: PAYLOAD_CODEC if set, else zstd when installed, else zlib."""
+    name = os.environ.get("PAYLOAD_CODEC", "zstd" if zstandard else "zlib").lower()
+    if name not in CODEC_NAMES:
+        raise ValueError(f"Unknown PAYLOAD_CODEC {name!r}")
+    if name == "zstd" and zstandard is None:
+        logger.warning("PAYLOAD_CODEC=zstd but zstandard is not installed; using zlib")
+        return CODEC_ZLIB
+    return CODEC_NAMES[name]
+
+
+PAYLOAD_CODEC = default_codec()
+
+# zstd contexts aren't thread-safe but are costly to create per row, so keep one per thread
+_zstd = threading.local()
+
+
+def zstd_compressor():
+    if not hasattr(_zstd, "compressor"):
+        _zstd.compressor = zstandard.ZstdCompressor(level=PAYLOAD_ZSTD_LEVEL)
+    return _zstd.compressor
+
+
+def zstd_decompressor():
+    if not hasattr(_zstd, "decompressor"):
+        _zstd.decompressor = zstandard.ZstdDecompressor()
+    return _zstd.decompressor
+
+
+def encode_json(obj):
+    """Compact UTF-8 JSON; non-JSON values (datetimes etc.) become strings."""
+    return json.dumps(obj, default=str, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def compress(body, codec):
+    if codec == CODEC_ZSTD:
+        return zstd_compressor().compress(body)
+    if codec == CODEC_ZLIB:
+        return zlib.compress(body, PAYLOAD_ZLIB_LEVEL)
+    return body
+
+
+def decompress(body, codec):
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("Payload is zstd-compressed but zstandard is not installed")
+        return zstd_decompressor().decompress(body)
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(body)
+    if codec == CODEC_NONE:
+        return body
+    raise ValueError(f"Unknown payload codec {codec}")
+
+
+def encode_payload(obj, codec=None):
+    """Encode a JSON-serialisable object as header + (compressed) compact JSON."""
+    codec = PAYLOAD_CODEC if codec is None else codec
+    body = encode_json(obj)
+    if len(body) < PAYLOAD_COMPRESS_MIN_BYTES:
+        codec = CODEC_NONE
+    return HEADER.pack(MAGIC, FORMAT_VERSION, codec) + compress(body, codec)
+
+
+def decode_payload(data):
+    """Decode what encode_payload wrote, or a legacy plain-JSON string/bytes."""
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    if isinstance(data, str):
+        return json.loads(data)
+    if not data.startswith(MAGIC):
+        return json.loads(data.decode("utf-8"))
+    _, version, codec = HEADER.unpack_from(data)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported payload format version {version}")
+    return json.loads(decompress(data[HEADER.size:], codec))
@@ -0,0 +1,157 @@
+import io
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Documents shorter than this are read in-process; pool start-up would cost more than it saves
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", 8))
+PDF_PAGES_PER_SHARD = int(os.environ.get("PDF_PAGES_PER_SHARD", 8))
+PDF_TEXT_WORKERS = int(os.environ.get("PDF_TEXT_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Imported once by the fork server so each parse worker starts warm
+WORKER_PRELOAD = ["utils.simple_file_processor", "utils.pdf_text", "PyPDF2", "pdfplumber", "openpyxl", "pptx"]
+
+# Unmapped glyphs from fonts without a ToUnicode table
+CID_RE = re.compile(r'\(cid:\d+\)')
+
+
+def worker_context():
+    """Multiprocessing context for parse pools.
+
+    Forking the threaded web process can hand a worker a lock (imports,
+    stdout) held by some other thread, hanging it forever; a fork server
+    forks workers from a clean single-threaded process instead.
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    # Replaces the default ['__main__'] so the app module isn't re-imported in the server
+    context.set_forkserver_preload(WORKER_PRELOAD)
+    return context
+
+
+def _exit_with_parent():
+    multiprocessing.parent_process().join()
+    os._exit(0)
+
+
+def worker_init():
+    """Parse pool initializer: exit when the web process goes away.
+
+    A worker whose parent is killed (gunicorn's timeout SIGKILL, OOM) would
+    otherwise wait on its task queue forever, along with the fork server.
+    """
+    threading.Thread(target=_exit_with_parent, daemon=True).start()
+
+
+def looks_garbled(text):
+    """True when a page's text layer is empty or unlikely to be readable text."""
+    text = text.strip() if text else ""
+    if not text:
+        return True
+    if CID_RE.search(text) or text.count('�') > len(text) * 0.01:
+        return True
+    readable = sum(1 for ch in text if ch.isalnum() or ch.isspace() or ch in ".,;:!?'\"()-$%&/")
+    if readable < len(text) * 0.85:
+        return True
+    # Layout-free extraction sometimes drops every space and runs words together
+    return len(text) > 200 and text.count(' ') < len(text) * 0.05
+
+
+def pdf_file(source):
+    """A readable binary file for a PDF path or the PDF's raw bytes."""
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    return open(source, 'rb')
+
+
+def source_name(source):
+    return "upload" if isinstance(source, (bytes, bytearray)) else os.path.basename(source)
+
+
+def extract_page_range(source, start, stop):
+    """Text of pages [start, stop), PyPDF2 first and pdfplumber for pages that need it.
+
+    source is a path or the PDF's bytes. Module-level so shards can be sent
+    to a process pool.
+    """
+    import PyPDF2
+
+    texts = []
+    with pdf_file(source) as f:
+        reader = PyPDF2.PdfReader(f)
+        for index in range(start, min(stop, len(reader.pages))):
+            try:
+                texts.append(reader.pages[index].extract_text() or "")
+            except Exception as e:
+                logger.warning("PyPDF2 failed on page %d of %s: %s", index + 1, source_name(source), e)
+                texts.append("")
+
+    escalate = [i for i, text in enumerate(texts) if looks_garbled(text)]
+    if escalate:
+        import pdfplumber
+
+        with pdf_file(source) as f, pdfplumber.open(f) as pdf:
+            for i in escalate:
+                try:
+                    text = pdf.pages[start + i].extract_text() or ""
+                except Exception as e:
+                    logger.warning("pdfplumber failed on page %d of %s: %s", start + i + 1, source_name(source), e)
+                    continue
+                if text.strip():
+                    texts[i] = text
+    return texts
+
+
+def pdf_page_count(source):
+    import PyPDF2
+
+    with pdf_file(source) as f:
+        return len(PyPDF2.PdfReader(f).pages)
+
+
+def extract_pdf_pages(source, executor=None, max_workers=PDF_TEXT_WORKERS):
+    """Per-page text for a whole PDF, in page order.
+
+    source is a path, the PDF's bytes, or a binary file object. Pages are
+    split into contiguous shards so each worker opens the file once per
+    shard. Shards go to executor when given (e.g. a shared
+    ProcessPoolExecutor); otherwise long documents get a temporary pool of
+    max_workers and short ones are read in-process.
+    """
+    if hasattr(source, 'read'):
+        source = source.read()
+    page_count = pdf_page_count(source)
+    if page_count == 0:
+        return []
+
+    if executor is None and (page_count < PDF_PARALLEL_MIN_PAGES or max_workers <= 1):
+        return extract_page_range(source, 0, page_count)
+
+    shard_size = PDF_PAGES_PER_SHARD
+    if isinstance(source, (bytes, bytearray)):
+        # In-memory PDFs are copied to each shard's worker, so use one shard per worker
+        shard_size = -(-page_count // max_workers)
+    elif executor is None:
+        # Spread short-but-parallel documents across every worker
+        shard_size = max(1, min(shard_size, -(-page_count // max_workers)))
+    shards = [(start, min(start + shard_size, page_count)) for start in range(0, page_count, shard_size)]
+
+    pool = executor or ProcessPoolExecutor(max_workers=min(max_workers, len(shards)), mp_context=worker_context(),
+                                           initializer=worker_init)
+    try:
+        futures = [pool.submit(extract_page_range, source, start, stop) for start, stop in shards]
+        return [text for future in futures for text in future.result()]
+    finally:
+        if executor is None:
+            pool.shutdown()
+
+
+def extract_pdf_text(source, executor=None, max_workers=PDF_TEXT_WORKERS):
+    """Whole-document text, one line break between pages, empty pages skipped."""
+    return "".join(text + "\n" for text in extract_pdf_pages(source, executor, max_workers) if text)
@@ -1,162 +1,173 @@
+import io
+import logging
 import os
 import re
+import shutil
+import tempfile
 from datetime import datetime
+from itertools import chain, islice
 from anthropic import Anthropic
+from utils.article_extraction import ArticleExtractor
+from utils.pdf_text import extract_pdf_pages
+
+logger = logging.getLogger(__name__)
+
+# Spreadsheet uploads are capped at this many articles
+MAX_EXCEL_ARTICLES = 100
+
+# Uploads up to this size are kept in memory; larger ones spill to a temp file
+UPLOAD_SPOOL_THRESHOLD = int(os.environ.get("UPLOAD_SPOOL_THRESHOLD", 8 * 1024 * 1024))
+
+# Cell text that marks a header row in a spreadsheet
+HEADER_KEYWORDS = ['title', 'headline', 'article', 'date', 'source', 'publication']
+
+# Header words that identify each article field, matched as substrings of the column name
+FIELD_KEYWORDS = {
+    'title': ['title', 'headline', 'article', 'subject'],
+    'date': ['date', 'time', 'published'],
+    'source': ['source', 'publication', 'outlet', 'media'],
+}
 
 class SimpleMediaFileProcessor:
     def __init__(self, anthropic_api_key):
-        self.anthropic = Anthropic(api_key=anthropic_api_key)
+        self.anthropic_api_key = anthropic_api_key
+        self._anthropic = None
+        self._extractor = None
     
-    def process_file(self, file_path, original_filename):
-        """Process uploaded files and extract media coverage data."""
+    @property
+    def anthropic(self):
+        # Created on first use so parse-only instances (e.g. in worker processes) need no client
+        if self._anthropic is None:
+            self._anthropic = Anthropic(api_key=self.anthropic_api_key)
+        return self._anthropic
+    
+    @property
+    def extractor(self):
+        if self._extractor is None:
+            self._extractor = ArticleExtractor(self.anthropic)
+        return self._extractor
+    
+    def process_file(self, source, original_filename):
+        """Process uploaded files and extract media coverage data.
+        
+        source is a path, the file's bytes, or a binary file-like object.
+        """
         try:
-            file_extension = original_filename.lower().split('.')[-1]
-            
-            if file_extension in ['xlsx', 'xls']:
-                return self._process_excel_simple(file_path, original_filename)
-            elif file_extension == 'pdf':
-                return self._process_pdf_simple(file_path, original_filename)
-            elif file_extension == 'pptx':
-                return self._process_pptx_simple(file_path, original_filename)
-            else:
-                print(f"Unsupported file type: {file_extension}")
-                return []
+            return self.articles_from_parsed(self.parse_file(source, original_filename), original_filename)
                 
-        except Exception as e:
-            print(f"Error processing file {original_filename}: {str(e)}")
+        except Exception:
+            logger.exception("Error processing file %s", original_filename)
             return []
     
-    def _process_excel_simple(self, file_path, filename):
-        """Simple Excel processing without pandas."""
+    def parse_file(self, source, original_filename, executor=None):
+        """CPU-bound half of processing: read the file without calling the API.
+        
+        Returns {'articles': [...]} for spreadsheets, whose rows map straight to
+        articles, or {'pages': [...]} (one text per page/slide) for documents
+        that still need AI extraction.
+        PDF pages are sharded onto executor when one is given.
+        """
+        file_extension = original_filename.lower().split('.')[-1]
+        
+        if file_extension in ['xlsx', 'xls']:
+            return {'articles': self._process_excel_simple(source, original_filename)}
+        elif file_extension == 'pdf':
+            return {'pages': extract_pdf_pages(source, executor=executor)}
+        elif file_extension == 'pptx':
+            return {'pages': self._pptx_slides(source)}
+        else:
+            logger.warning("Unsupported file type: %s", file_extension)
+            return {'articles': []}
+    
+    def articles_from_parsed(self, parsed, original_filename):
+        """IO-bound half of processing: turn parse_file output into articles."""
+        if parsed.get('pages'):
+            return self._extract_articles_from_pages(parsed['pages'], original_filename)
+        return parsed.get('articles') or []
+    
+    def _process_excel_simple(self, source, filename):
+        """Simple Excel processing without pandas; stops reading once the article limit is hit."""
         try:
-            import openpyxl
+            return list(islice(self.iter_excel_articles(source, filename), MAX_EXCEL_ARTICLES))
             
-            workbook = openpyxl.load_workbook(file_path)
-            articles = []
-            
-            for sheet_name in workbook.sheetnames:
-                sheet = workbook[sheet_name]
-                
-                # Try to find header row
-                headers = []
-                data_start_row = 1
+        except Exception:
+            logger.exception("Error processing Excel file %s", filename)
+            return []
+    
+    def iter_excel_articles(self, source, filename):
+        """Yield articles lazily from every sheet using read-only, values-only row iteration."""
+        import openpyxl
+        
+        workbook = openpyxl.load_workbook(as_file(source), read_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                rows = sheet.iter_rows(values_only=True)
                 
-                for row in range(1, min(6, sheet.max_row + 1)):  # Check first 5 rows for headers
-                    row_values = [cell.value for cell in sheet[row] if cell.value]
-                    if any(header in str(cell.value).lower() if cell.value else '' 
-                          for cell in sheet[row] 
-                          for header in ['title', 'headline', 'article', 'date', 'source', 'publication']):
-                        headers = [cell.value for cell in sheet[row]]
-                        data_start_row = row + 1
+                # Try to find header row in the first 5 rows
+                head = list(islice(rows, 5))
+                headers = None
+                data_rows = head
+                for i, row in enumerate(head):
+                    if any(header in str(value).lower()
+                           for value in row if value
+                           for header in HEADER_KEYWORDS):
+                        headers = list(row)
+                        data_rows = head[i + 1:]
                         break
                 
-                if not headers:
-                    # No clear headers found, assume first row is data
-                    headers = [f"Column_{i+1}" for i in range(sheet.max_column)]
-                    data_start_row = 1
+                # Match header names to fields once per sheet rather than once per row
+                fields = field_columns(str(header) for header in headers) if headers is not None else None
                 
-                # Process data rows
-                for row in range(data_start_row, sheet.max_row + 1):
-                    row_data = {}
-                    has_content = False
-                    
-                    for col, header in enumerate(headers, 1):
-                        if col <= sheet.max_column:
-                            cell_value = sheet.cell(row=row, column=col).value
-                            if cell_value:
-                                row_data[str(header)] = str(cell_value)
-                                has_content = True
+                # Process data rows; without a header row every row is data
+                for row in chain(data_rows, rows):
+                    if headers is None:
+                        row_data = {f"Column_{col}": str(value) for col, value in enumerate(row, 1) if value}
+                    else:
+                        row_data = {str(header): str(value) for header, value in zip(headers, row) if value}
                     
-                    if has_content:
-                        article = self._extract_article_from_row(row_data, filename)
+                    if row_data:
+                        article = self._extract_article_from_row(row_data, filename, fields)
                         if article:
-                            articles.append(article)
-            
-            return articles[:100]  # Limit to 100 articles
-            
-        except Exception as e:
-            print(f"Error processing Excel file: {str(e)}")
-            return []
+                            yield article
+        finally:
+            workbook.close()
     
-    def _process_pdf_simple(self, file_path, filename):
-        """Simple PDF processing."""
-        try:
-            import pdfplumber
-            
-            articles = []
-            text_content = ""
-            
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages[:10]:  # Limit to first 10 pages
-                    page_text = page.extract_text()
-                    if page_text:
-                        text_content += page_text + "\n"
-            
-            if text_content:
-                # Try to extract articles using AI
-                articles = self._extract_articles_from_text(text_content, filename)
-            
-            return articles
-            
-        except Exception as e:
-            print(f"Error processing PDF file: {str(e)}")
-            return []
+    def _pptx_slides(self, source):
+        """Text of each non-empty slide in a PowerPoint deck."""
+        from pptx import Presentation
+        
+        slides = []
+        prs = Presentation(as_file(source))
+        
+        for slide in prs.slides:
+            slide_text = ""
+            for shape in slide.shapes:
+                if hasattr(shape, "text"):
+                    slide_text += shape.text + "\n"
+            
+            if slide_text.strip():
+                slides.append(slide_text)
+        return slides
     
-    def _process_pptx_simple(self, file_path, filename):
-        """Simple PowerPoint processing."""
+    def _extract_article_from_row(self, row_data, filename, fields=None):
+        """Extract article information from a spreadsheet row.
+        
+        fields is field_columns() of the sheet's headers; without it the row's
+        own keys are matched.
+        """
         try:
-            from pptx import Presentation
+            if fields is None:
+                fields = field_columns(row_data)
             
-            articles = []
-            text_content = ""
-            
-            prs = Presentation(file_path)
-            
-            for slide in prs.slides:
-                slide_text = ""
-                for shape in slide.shapes:
-                    if hasattr(shape, "text"):
-                        slide_text += shape.text + "\n"
-                
-                if slide_text.strip():
-                    text_content += slide_text + "\n\n"
-            
-            if text_content:
-                articles = self._extract_articles_from_text(text_content, filename)
-            
-            return articles
-            
-        except Exception as e:
-            print(f"Error processing PowerPoint file: {str(e)}")
-            return []
-    
-    def _extract_article_from_row(self, row_data, filename):
-        """Extract article information from a spreadsheet row."""
-        try:
-            # Try to identify title/headline
-            title = ""
-            for key in row_data.keys():
-                if any(word in key.lower() for word in ['title', 'headline', 'article', 'subject']):
-                    title = row_data[key]
-                    break
+            # The first matching column with a value in this row wins
+            title = next((row_data[key] for key in fields['title'] if key in row_data), "")
             
             if not title:
                 # Use first non-empty value as title
                 title = next(iter(row_data.values()), "")
             
-            # Try to identify date
-            date_str = ""
-            for key in row_data.keys():
-                if any(word in key.lower() for word in ['date', 'time', 'published']):
-                    date_str = row_data[key]
-                    break
-            
-            # Try to identify source
-            source = ""
-            for key in row_data.keys():
-                if any(word in key.lower() for word in ['source', 'publication', 'outlet', 'media']):
-                    source = row_data[key]
-                    break
+            date_str = next((row_data[key] for key in fields['date'] if key in row_data), "")
+            source = next((row_data[key] for key in fields['source'] if key in row_data), "")
             
             if not source:
                 source = filename
@@ -175,70 +186,32 @@ class SimpleMediaFileProcessor:
             return None
             
         except Exception as e:
-            print(f"Error extracting article from row: {str(e)}")
+            logger.warning("Error extracting article from a row of %s: %s", filename, e)
             return None
     
-    def _extract_articles_from_text(self, text_content, filename):
-        """Use AI to extract articles from text content."""
-        try:
-            # Limit text length for API call
-            if len(text_content) > 10000:
-                text_content = text_content[:10000]
-            
-            prompt = f"""
-            Extract media coverage information from the following text. 
-            Return a list of articles with title, description, and any dates mentioned.
-            Format as simple text with each article separated by "---".
-            
-            Text:
-            {text_content}
-            """
-            
-            response = self.anthropic.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=1000,
-                messages=[{
-                    "role": "user",
-                    "content": prompt
-                }]
-            )
-            
-            # Parse AI response into articles
-            articles = []
-            response_text = response.content[0].text
-            
-            # Simple parsing - split by "---" and extract basic info
-            article_blocks = response_text.split("---")
-            
-            for i, block in enumerate(article_blocks[:10]):  # Limit to 10 articles
-                block = block.strip()
-                if len(block) > 20:  # Minimum content length
-                    lines = block.split('\n')
-                    title = lines[0][:200] if lines else f"Article {i+1}"
-                    description = ' '.join(lines[1:])[:300] if len(lines) > 1 else block[:300]
-                    
-                    articles.append({
-                        'title': title,
-                        'description': description,
-                        'publishedAt': datetime.now().isoformat(),
-                        'source': {'name': filename},
-                        'url': f"file://{filename}",
-                        'sentiment': 0
-                    })
-            
-            return articles
-            
-        except Exception as e:
-            print(f"Error extracting articles from text: {str(e)}")
+    def _extract_articles_from_pages(self, pages, filename):
+        """Use AI to extract articles from page/slide texts, chunk by chunk."""
+        items, info = self.extractor.extract(pages, filename)
+        
+        if not items and info['failed_chunks'] and info['failed_chunks'] == info['chunks']:
             # Fallback: create a single article from the text
             return [{
                 'title': f"Content from {filename}",
-                'description': text_content[:300],
+                'description': "\n".join(pages)[:300],
                 'publishedAt': datetime.now().isoformat(),
                 'source': {'name': filename},
                 'url': f"file://{filename}",
                 'sentiment': 0
             }]
+        
+        return [{
+            'title': str(item['title'])[:200],
+            'description': str(item.get('description') or '')[:300],
+            'publishedAt': self._parse_date(item.get('date')),
+            'source': {'name': str(item.get('source') or filename)[:50]},
+            'url': f"file://{filename}",
+            'sentiment': 0
+        } for item in items]
     
     def _parse_date(self, date_str):
         """Parse date string into ISO format."""
@@ -258,3 +231,43 @@ class SimpleMediaFileProcessor:
             
         except:
             return datetime.now().isoformat()
+
+
+def field_columns(column_names):
+    """Column names matching each FIELD_KEYWORDS field, in column order."""
+    column_names = list(dict.fromkeys(column_names))
+    return {field: [name for name in column_names if any(word in name.lower() for word in words)]
+            for field, words in FIELD_KEYWORDS.items()}
+
+
+_parser = None
+
+
+def parse_upload(source, original_filename):
+    """Module-level parse entry point so it can be sent to a process pool."""
+    global _parser
+    if _parser is None:
+        _parser = SimpleMediaFileProcessor(None)
+    return _parser.parse_file(source, original_filename)
+
+
+def as_file(source):
+    """What the parsers open: paths and file objects as-is, raw bytes wrapped in BytesIO."""
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    return source
+
+
+def buffer_upload(stream, threshold=UPLOAD_SPOOL_THRESHOLD):
+    """Read an upload stream into memory, spilling to a temp file past threshold.
+    
+    Returns the bytes, or the path of a temp file the caller must remove.
+    Either can be sent to a worker process, unlike an open stream.
+    """
+    data = stream.read(threshold + 1)
+    if len(data) <= threshold:
+        return data
+    with tempfile.NamedTemporaryFile(prefix="upload_", delete=False) as spool:
+        spool.write(data)
+        shutil.copyfileobj(stream, spool)
+    return spool.name
@@ -0,0 +1,101 @@
+import re
+from collections import Counter
+
+# Function words shared by both apps' topic extraction
+BASIC_STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to',
+    'for', 'of', 'with', 'by', 'from', 'up', 'about', 'into', 'over',
+    'after', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
+    'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would',
+    'should', 'can', 'could', 'may', 'might', 'must', 'it', 'its',
+})
+
+# Extended vocabulary: pronouns, adverbs, prepositions and common verb forms
+STOP_WORDS = BASIC_STOP_WORDS | frozenset({
+    'during', 'while', 'before', 'after', 'under', 'over',
+    # Additional common words that should be filtered out
+    'this', 'that', 'these', 'those', 'they', 'them', 'their', 'theirs',
+    'he', 'him', 'his', 'she', 'her', 'hers', 'we', 'us', 'our', 'ours',
+    'you', 'your', 'yours', 'i', 'me', 'my', 'mine', 'who', 'whom', 'whose',
+    'which', 'what', 'where', 'when', 'why', 'how', 'all', 'any', 'both',
+    'each', 'few', 'more', 'most', 'some', 'such', 'no', 'nor', 'not',
+    'only', 'own', 'same', 'so', 'than', 'too', 'very', 'just', 'one',
+    'even', 'here', 'there', 'now', 'then', 'also', 'get', 'got', 'gets',
+    'say', 'says', 'said', 'see', 'sees', 'seen', 'like', 'well', 'back',
+    'much', 'many', 'make', 'makes', 'made', 'take', 'takes', 'took', 'taken',
+    # Additional prepositions, adverbs, and common verbs
+    'off', 'out', 'down', 'away', 'through', 'across', 'between', 'among',
+    'around', 'along', 'behind', 'beyond', 'near', 'within', 'without',
+    'above', 'below', 'beside', 'against', 'despite', 'except', 'until',
+    'upon', 'via', 'toward', 'towards', 'onto', 'inside', 'outside',
+    'ago', 'yet', 'still', 'ever', 'never', 'always', 'often', 'sometimes',
+    'rarely', 'usually', 'already', 'soon', 'later', 'early', 'late',
+    'again', 'once', 'twice', 'thrice', 'further', 'rather', 'quite',
+    'almost', 'nearly', 'hardly', 'scarcely', 'barely', 'merely',
+    'else', 'otherwise', 'instead', 'anyway', 'anyhow', 'however',
+    'thus', 'therefore', 'hence', 'consequently', 'accordingly',
+    'meanwhile', 'moreover', 'furthermore', 'additionally', 'besides',
+    'come', 'comes', 'coming', 'came', 'go', 'goes', 'going', 'went', 'gone',
+    'give', 'gives', 'giving', 'gave', 'given', 'put', 'puts', 'putting',
+    'set', 'sets', 'setting', 'let', 'lets', 'letting', 'run', 'runs', 'running',
+    'ran', 'use', 'uses', 'using', 'used', 'try', 'tries', 'trying', 'tried',
+    'seem', 'seems', 'seeming', 'seemed', 'appear', 'appears', 'appearing',
+    'appeared', 'look', 'looks', 'looking', 'looked', 'think', 'thinks',
+    'thinking', 'thought', 'know', 'knows', 'knowing', 'knew', 'known',
+    'want', 'wants', 'wanting', 'wanted', 'need', 'needs', 'needing', 'needed',
+    'find', 'finds', 'finding', 'found', 'show', 'shows', 'showing', 'showed',
+    'shown', 'tell', 'tells', 'telling', 'told', 'ask', 'asks', 'asking', 'asked',
+    'work', 'works', 'working', 'worked', 'call', 'calls', 'calling', 'called',
+    'turn', 'turns', 'turning', 'turned', 'help', 'helps', 'helping', 'helped',
+    'talk', 'talks', 'talking', 'talked', 'move', 'moves', 'moving', 'moved',
+    'live', 'lives', 'living', 'lived', 'play', 'plays', 'playing', 'played',
+    'feel', 'feels', 'feeling', 'felt', 'become', 'becomes', 'becoming', 'became',
+    'leave', 'leaves', 'leaving', 'left', 'stay', 'stays', 'staying', 'stayed',
+    'start', 'starts', 'starting', 'started', 'end', 'ends', 'ending', 'ended',
+    'keep', 'keeps', 'keeping', 'kept', 'hold', 'holds', 'holding', 'held',
+    'bring', 'brings', 'bringing', 'brought', 'carry', 'carries', 'carrying',
+    'carried', 'continue', 'continues', 'continuing', 'continued',
+    'change', 'changes', 'changing', 'changed', 'lead', 'leads', 'leading', 'led',
+    'stand', 'stands', 'standing', 'stood', 'follow', 'follows', 'following',
+    'followed', 'stop', 'stops', 'stopping', 'stopped', 'create', 'creates',
+    'creating', 'created', 'speak', 'speaks', 'speaking', 'spoke', 'spoken',
+    'read', 'reads', 'reading', 'wrote', 'written', 'write', 'writes', 'writing',
+    'lose', 'loses', 'losing', 'lost', 'pay', 'pays', 'paying', 'paid',
+    'hear', 'hears', 'hearing', 'heard', 'meet', 'meets', 'meeting', 'met',
+    'include', 'includes', 'including', 'included', 'allow', 'allows', 'allowing',
+    'allowed', 'add', 'adds', 'adding', 'added', 'spend', 'spends', 'spending',
+    'spent', 'grow', 'grows', 'growing', 'grew', 'grown', 'open', 'opens',
+    'opening', 'opened', 'walk', 'walks', 'walking', 'walked', 'win', 'wins',
+    'winning', 'won', 'offer', 'offers', 'offering', 'offered', 'remember',
+    'remembers', 'remembering', 'remembered', 'consider', 'considers',
+    'considering', 'considered', 'expect', 'expects', 'expecting', 'expected',
+    'suggest', 'suggests', 'suggesting', 'suggested', 'report', 'reports',
+    'reporting', 'reported'
+})
+
+# Topic words: whole \w+ tokens of three or more characters with no digits, so
+# "covid19" and "2024" are skipped entirely rather than partly matched
+TOPIC_WORD_RE = re.compile(r'(?<!\w)[^\W\d]{3,}(?!\w)')
+
+
+def extract_topics(articles, query="", stop_words=STOP_WORDS, limit=30, min_count=3):
+    """Most frequent topic words across article titles and descriptions.
+
+    Tokenizes the text once with a precompiled pattern that only matches
+    topic-shaped words and counts them in a single C-level pass; stop words
+    and search terms are then dropped from the (much smaller) set of
+    distinct words.
+    Returns [{'topic': word, 'count': n}] for up to `limit` words mentioned
+    at least `min_count` times.
+    """
+    text = " ".join(f"{article['title']} {article.get('description') or ''}" for article in articles).lower()
+    counts = Counter(TOPIC_WORD_RE.findall(text))
+
+    query_terms = frozenset((query or "").lower().split())
+    for word in list(counts):
+        if word in stop_words or word in query_terms:
+            del counts[word]
+
+    return [{'topic': topic, 'count': count}
+            for topic, count in counts.most_common(limit)
+            if count >= min_count]
@@ -0,0 +1,90 @@
+import logging
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.pdf_text import worker_context, worker_init
+from utils.simple_file_processor import parse_upload
+
+logger = logging.getLogger(__name__)
+
+
+class UploadPipeline:
+    """Processes the files of one upload concurrently.
+
+    Parsing (pdfplumber, openpyxl, python-pptx) is CPU-bound and runs in a
+    process pool of parse_workers; the Claude extraction call that follows
+    for documents is IO-bound and runs in a thread pool of extract_workers,
+    which also bounds how many files are in flight. Results come back in
+    upload order, each with its own timings, so a batch takes roughly as
+    long as its slowest file.
+    """
+
+    def __init__(self, processor, parse_workers=2, extract_workers=4):
+        self.processor = processor
+        self.parse_workers = max(1, parse_workers)
+        self._extract_executor = ThreadPoolExecutor(max_workers=max(1, extract_workers))
+        self._parse_executor = None
+        self._lock = threading.Lock()
+
+    def _parse_pool(self):
+        # Started lazily so importing the app doesn't fork workers
+        with self._lock:
+            if self._parse_executor is None:
+                self._parse_executor = ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=worker_context(),
+                                                           initializer=worker_init)
+            return self._parse_executor
+
+    def _reset_parse_pool(self, pool):
+        with self._lock:
+            if self._parse_executor is pool:
+                self._parse_executor = None
+        pool.shutdown(wait=False)
+
+    def _parse(self, source, filename):
+        pool = self._parse_pool()
+        try:
+            if filename.lower().endswith('.pdf'):
+                # Long PDFs are split into page shards that share the pool with other files
+                return self.processor.parse_file(source, filename, executor=pool)
+            return pool.submit(parse_upload, source, filename).result()
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM on a huge file); start a fresh pool next time
+            # and parse this file in-thread rather than failing the upload
+            logger.warning("Parse pool broken while processing %s; parsing in-process", filename)
+            self._reset_parse_pool(pool)
+            return parse_upload(source, filename)
+
+    def _process_one(self, source, filename):
+        result = {'filename': filename, 'articles': [], 'error': None,
+                  'parse_seconds': 0.0, 'extract_seconds': 0.0}
+        started = time.time()
+        try:
+            parsed = self._parse(source, filename)
+            result['parse_seconds'] = round(time.time() - started, 3)
+            extract_started = time.time()
+            result['articles'] = self.processor.articles_from_parsed(parsed, filename)
+            result['extract_seconds'] = round(time.time() - extract_started, 3)
+        except Exception as e:
+            logger.error("Error processing file %s: %s", filename, e)
+            result['error'] = str(e)
+        result['seconds'] = round(time.time() - started, 3)
+        return result
+
+    def process(self, files, on_result=None):
+        """Process [(source, original_filename), ...]; returns one result dict per file, in order.
+
+        Each source is a path or the file's bytes, so it can reach a worker
+        process. on_result(index, result) is called from the calling thread
+        as each file finishes.
+        """
+        futures = {self._extract_executor.submit(self._process_one, source, filename): index
+                   for index, (source, filename) in enumerate(files)}
+        results = [None] * len(futures)
+        for future in as_completed(futures):
+            index = futures[future]
+            results[index] = future.result()
+            if on_result:
+                on_result(index, results[index])
+        return results
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamCache:
+    """Caches upstream news responses with stale-while-revalidate.
+
+    Windows that reach today or later get a short freshness TTL because new
+    coverage keeps arriving; fully historical windows get a long one. Past
+    freshness an entry is still served for a further stale period while a
+    background refresh replaces it, so only a cold key waits on the upstream.
+    """
+
+    def __init__(self, cache, live_ttl=600, live_stale_ttl=3600,
+                 historical_ttl=86400, historical_stale_ttl=7 * 86400, refresh_workers=2):
+        self.cache = cache
+        self.live_ttl = live_ttl
+        self.live_stale_ttl = live_stale_ttl
+        self.historical_ttl = historical_ttl
+        self.historical_stale_ttl = historical_stale_ttl
+        self._refresh_executor = ThreadPoolExecutor(max_workers=refresh_workers)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(source, **parts):
+        """Stable key for an upstream request from its normalized parameters."""
+        raw = json.dumps([source, parts], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def ttls_for(self, to_date_str):
+        """(fresh, stale) seconds for a window ending on to_date_str (YYYY-MM-DD)."""
+        try:
+            to_date = datetime.strptime(to_date_str[:10], "%Y-%m-%d").date() if to_date_str else None
+        except ValueError:
+            to_date = None
+        if to_date is None or to_date >= datetime.utcnow().date():
+            return self.live_ttl, self.live_stale_ttl
+        return self.historical_ttl, self.historical_stale_ttl
+
+    def _store(self, key, value, to_date_str):
+        fresh_ttl, stale_ttl = self.ttls_for(to_date_str)
+        self.cache.set(key, {"value": value, "fresh_until": time.time() + fresh_ttl}, ttl=fresh_ttl + stale_ttl)
+
+    def _refresh(self, key, loader, to_date_str, cacheable):
+        try:
+            value = loader()
+            if cacheable(value):
+                self._store(key, value, to_date_str)
+        except Exception as e:
+            logger.warning("Upstream cache refresh failed: %s", e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def fetch(self, key, loader, to_date_str=None, cacheable=bool):
+        """Return the cached value for key, calling loader() on a miss.
+
+        Stale hits are returned immediately and refreshed in the background.
+        Results for which cacheable(value) is false (errors, empty responses)
+        are returned but not stored.
+        """
+        entry = self.cache.get(key)
+        if entry is not None:
+            if time.time() >= entry.get("fresh_until", 0):
+                with self._lock:
+                    start_refresh = key not in self._refreshing
+                    self._refreshing.add(key)
+                if start_refresh:
+                    self._refresh_executor.submit(self._refresh, key, loader, to_date_str, cacheable)
+            return entry["value"]
+
+        value = loader()
+        if cacheable(value):
+            self._store(key, value, to_date_str)
+        return value
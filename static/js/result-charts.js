@@ -1,5 +1,5 @@
-// Initialize charts when DOM is ready
-document.addEventListener('DOMContentLoaded', function() {
+// Draw charts and wire up the share buttons; the streaming results page calls this once its data arrives
+function initResultPage() {
     // Helper function to get sentiment color
     function getSentimentColor(sentiment) {
         if (sentiment < -0.33) return 'rgba(220, 53, 69, 0.7)'; // Negative - red
@@ -678,4 +678,9 @@ document.addEventListener('DOMContentLoaded', function() {
             alert('Failed to copy to clipboard. Please try again.');
         });
     });
+}
+
+// Server-rendered results have their data inline, so initialize when the DOM is ready
+document.addEventListener('DOMContentLoaded', function() {
+    if (!window.resultStreaming) initResultPage();
 });
@@ -0,0 +1,39 @@
+import logging
+import os
+import random
+
+# DEBUG for per-article detail; INFO keeps per-request and per-call lines
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# Fraction of records below WARNING that are written; warnings and errors always are
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", 1.0))
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
+
+
+class SampleFilter(logging.Filter):
+    """Pass every record at min_level or above and a random sample_rate fraction of the rest."""
+
+    def __init__(self, sample_rate, min_level=logging.WARNING):
+        super().__init__()
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self.min_level = min_level
+
+    def filter(self, record):
+        return record.levelno >= self.min_level or random.random() < self.sample_rate
+
+
+def configure_logging(level=LOG_LEVEL, sample_rate=LOG_SAMPLE_RATE):
+    """Log to stderr at `level`, sampling chatty records; call once before the app logs anything.
+
+    The root logger gets the handler, so app.logger and the utils modules'
+    loggers share it and Flask doesn't add its own. A root logger that
+    already has handlers (gunicorn --log-config) only has its level set.
+    """
+    root = logging.getLogger()
+    root.setLevel(level)
+    # APScheduler logs every job run at INFO, which for the outbox poll is every few seconds
+    logging.getLogger("apscheduler").setLevel(logging.WARNING)
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handler.addFilter(SampleFilter(sample_rate))
+        root.addHandler(handler)
@@ -0,0 +1,98 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+NEWS_API_URL = "https://newsapi.org/v2/everything"
+NEWS_API_MAX_PAGE_SIZE = 100
+
+
+class NewsAPIPaginator:
+    """Fetches NewsAPI /everything results across pages up to an article budget.
+
+    Page 1 is fetched first to learn totalResults; the remaining pages are
+    fetched concurrently, max_workers at a time. Pages are consumed in order
+    and articles deduped by URL as they stream in, so fetching stops as soon
+    as the budget is met, a page comes back short or errors (the developer
+    plan caps results at 100), or, for sortBy=publishedAt, a page reaches
+    articles older than the start of the date window. Pages are no larger
+    than the budget, so a small budget doesn't download articles it drops.
+    """
+
+    def __init__(self, http_client, max_articles=200, page_size=NEWS_API_MAX_PAGE_SIZE, max_workers=4):
+        self.http_client = http_client
+        self.max_articles = max(1, max_articles)
+        self.page_size = max(1, min(NEWS_API_MAX_PAGE_SIZE, page_size))
+        self.max_workers = max(1, max_workers)
+
+    def _fetch_page(self, params, page, page_size):
+        """Return (articles, totalResults, error) for one page."""
+        try:
+            response = self.http_client.get(NEWS_API_URL, params={**params, "page": page, "pageSize": page_size})
+            data = response.json()
+        except Exception as e:
+            return [], 0, str(e)
+        if response.status_code != 200 or data.get("status") != "ok":
+            return [], 0, data.get("message") or f"HTTP {response.status_code}"
+        return data.get("articles") or [], data.get("totalResults") or 0, None
+
+    def fetch(self, params, window_start=None, max_articles=None):
+        """Fetch up to max_articles (default: the paginator's budget) unique articles for params.
+
+        window_start is an ISO date/time string; with sortBy=publishedAt,
+        paging stops once a page reaches articles older than it.
+        Returns (articles, info) where info reports success, upstream calls,
+        pages used, totalResults and why fetching stopped.
+        """
+        budget = max(1, max_articles or self.max_articles)
+        # Fixed for the whole fetch: NewsAPI numbers pages by pageSize
+        page_size = min(self.page_size, budget)
+        info = {"ok": False, "upstream_calls": 1, "pages": 0, "total_results": 0, "stopped": None}
+        articles, total, error = self._fetch_page(params, 1, page_size)
+        if error:
+            info["stopped"] = f"error: {error}"
+            return [], info
+
+        info.update(ok=True, total_results=total)
+        newest_first = params.get("sortBy") == "publishedAt"
+        target = min(budget, total)
+        last_page = max(1, math.ceil(target / page_size))
+
+        collected = []
+        seen_urls = set()
+
+        def consume(page_articles):
+            """Add a page's new articles; return a stop reason or None."""
+            info["pages"] += 1
+            for article in page_articles:
+                url = article.get("url")
+                if not url or url in seen_urls:
+                    continue
+                seen_urls.add(url)
+                collected.append(article)
+                if len(collected) >= budget:
+                    return "budget"
+            if len(page_articles) < page_size:
+                return "exhausted"
+            if newest_first and window_start and page_articles:
+                oldest = page_articles[-1].get("publishedAt") or ""
+                if oldest and oldest < window_start:
+                    return "date window"
+            return None
+
+        stopped = consume(articles)
+        next_page = 2
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while not stopped and next_page <= last_page:
+                pages = list(range(next_page, min(last_page, next_page + self.max_workers - 1) + 1))
+                results = list(executor.map(lambda page: self._fetch_page(params, page, page_size), pages))
+                info["upstream_calls"] += len(pages)
+                next_page = pages[-1] + 1
+                for page_articles, _, page_error in results:
+                    if page_error:
+                        stopped = f"error: {page_error}"
+                        break
+                    stopped = consume(page_articles)
+                    if stopped:
+                        break
+
+        info["stopped"] = stopped or "last page"
+        return collected, info
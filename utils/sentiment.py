@@ -0,0 +1,161 @@
+import hashlib
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.metrics import LLM_ERRORS, record_llm_usage
+
+logger = logging.getLogger(__name__)
+
+SENTIMENT_MODEL = "claude-3-haiku-20240307"
+
+# Articles per Claude call and number of calls in flight at once
+SENTIMENT_CHUNK_SIZE = int(os.environ.get("SENTIMENT_CHUNK_SIZE", 20))
+SENTIMENT_MAX_WORKERS = int(os.environ.get("SENTIMENT_MAX_WORKERS", 5))
+
+# Room for a JSON array of chunk-size scores, with headroom for stray commentary
+SENTIMENT_TOKENS_PER_ARTICLE = 12
+SENTIMENT_MIN_TOKENS = 200
+
+
+def article_text(article):
+    """Text that gets scored for a single article."""
+    return f"{article['title']} {article.get('description') or ''}"
+
+
+def sentiment_cache_key(text):
+    """Content hash of the normalized article text, shared across queries."""
+    normalized = " ".join(text.lower().split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def build_sentiment_prompt(texts):
+    """Build the numbered sentiment prompt for one chunk of texts."""
+    numbered_texts = "\n\n".join(f"Text {i+1}:\n{text}" for i, text in enumerate(texts))
+    return f"""Analyze the sentiment of each numbered text and respond with a JSON array of sentiment scores between -1 (most negative) and 1 (most positive).
+
+For each text:
+- Consider the overall tone, word choice, and context
+- Score negative news/criticism closer to -1
+- Score positive news/achievements closer to +1
+- Score neutral/factual content closer to 0
+
+IMPORTANT: Your response must be a valid JSON array containing exactly {len(texts)} numbers, one per text and in the same order, like this:
+[-0.8, 0.5, 0.2, -0.4, 0.1]
+
+Do not include any explanations.
+
+Here are the texts to analyze:
+
+{numbered_texts}"""
+
+
+def parse_sentiment_scores(response_text):
+    """Pull the list of scores out of Claude's response, clamped to [-1, 1]."""
+    array_match = re.search(r'\[(.*?)\]', response_text or "", re.DOTALL)
+    if not array_match:
+        return []
+    scores = []
+    for value in re.findall(r'-?\d+(?:\.\d+)?', array_match.group(1)):
+        try:
+            scores.append(max(-1.0, min(1.0, float(value))))
+        except ValueError:
+            continue
+    return scores
+
+
+class SentimentEngine:
+    """Scores article sentiment in fixed-size chunks on a bounded thread pool.
+
+    Each chunk is a separate Claude call, so a large result set no longer
+    overflows a single response; scores are merged back by article index.
+    When a cache is given, only texts it has not seen are sent to Claude.
+    """
+
+    def __init__(self, client, chunk_size=SENTIMENT_CHUNK_SIZE, max_workers=SENTIMENT_MAX_WORKERS, cache=None):
+        self.client = client
+        self.cache = cache
+        self.chunk_size = max(1, chunk_size)
+        self.max_workers = max(1, max_workers)
+
+    def _request_scores(self, texts):
+        response = self.client.messages.create(
+            model=SENTIMENT_MODEL,
+            max_tokens=max(SENTIMENT_MIN_TOKENS, SENTIMENT_TOKENS_PER_ARTICLE * len(texts)),
+            messages=[{
+                "role": "user",
+                "content": build_sentiment_prompt(texts)
+            }]
+        )
+        record_llm_usage("sentiment", getattr(response, "usage", None))
+        return parse_sentiment_scores(response.content[0].text)
+
+    def _score_chunk(self, start, texts):
+        """Score one chunk, retrying once if Claude returns the wrong number of scores."""
+        started = time.time()
+        scores = []
+        for attempt in range(2):
+            try:
+                scores = self._request_scores(texts)
+            except Exception as e:
+                LLM_ERRORS.inc(purpose="sentiment")
+                logger.warning("Sentiment chunk %d-%d failed (attempt %d): %s", start, start + len(texts) - 1, attempt + 1, e)
+                scores = []
+            if len(scores) == len(texts):
+                break
+            logger.warning("Sentiment chunk %d: expected %d scores, got %d", start, len(texts), len(scores))
+
+        if len(scores) != len(texts):
+            # Scores can't be matched to texts reliably, so report the chunk as unscored
+            scores = [None] * len(texts)
+        logger.debug("Sentiment chunk %d: %d articles in %.2fs", start, len(texts), time.time() - started)
+        return start, scores
+
+    def score_texts(self, texts):
+        """Return one score per text, in input order."""
+        if not texts:
+            return []
+        if self.cache is None:
+            return [0.0 if score is None else score for score in self._score_uncached(texts)]
+
+        keys = [sentiment_cache_key(text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        # Score each distinct uncached text once
+        misses = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in misses:
+                misses[key] = text
+        if misses:
+            fresh = dict(zip(misses.keys(), self._score_uncached(list(misses.values()))))
+            # Only cache real scores so failed chunks are retried next time
+            self.cache.set_many({key: score for key, score in fresh.items() if score is not None})
+            cached.update({key: (0.0 if score is None else score) for key, score in fresh.items()})
+
+        logger.info("Sentiment cache: %d of %d articles served from cache", len(texts) - len(misses), len(texts))
+        return [cached[key] for key in keys]
+
+    def _score_uncached(self, texts):
+        """Score texts with Claude, chunked and in parallel; None marks unscored texts."""
+        chunks = [(start, texts[start:start + self.chunk_size])
+                  for start in range(0, len(texts), self.chunk_size)]
+        scores = [None] * len(texts)
+
+        if len(chunks) == 1:
+            results = [self._score_chunk(*chunks[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+                results = list(executor.map(lambda chunk: self._score_chunk(*chunk), chunks))
+
+        for start, chunk_scores in results:
+            scores[start:start + len(chunk_scores)] = chunk_scores
+        return scores
+
+    def score_articles(self, articles):
+        """Set article['sentiment'] on every article and return the scores."""
+        scores = self.score_texts([article_text(article) for article in articles])
+        for article, score in zip(articles, scores):
+            article['sentiment'] = score
+        return scores